@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import pandas as pd
+
+from agents import replay
+from agents.router import arouter
+from agents.task_executor import async_main, build_dependency_graph, prepare_plan
+from agents.result_store import ResultStore, SpilledFrame
+from agents.chunked_dataset import ChunkedDataset
+from agents.latency_model import LatencyModel
+from agents.task_cache import TaskCache
+from agents.tracing import Tracer, use_tracer
+
+
+DEFAULT_CONCURRENCY = 8
+
+
+def read_requests(input_path):
+    """
+    Read user requests from a JSONL file.
+    Each line is either a JSON string or an object with a "request" field and an optional "id".
+    """
+    requests = []
+    with open(input_path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"request": entry}
+            if "request" not in entry:
+                raise ValueError(f"{input_path}:{line_number}: missing 'request' field")
+            entry.setdefault("id", line_number)
+            requests.append(entry)
+    return requests
+
+
+def to_jsonable(value):
+    """
+    Convert a task result into something json.dumps accepts; frames are summarized, not dumped.
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return {"type": type(value).__name__, "shape": list(value.shape), "columns": [str(c) for c in value.columns]}
+    if isinstance(value, SpilledFrame):
+        return {"type": "SpilledFrame", "shape": list(value.shape), "columns": value.columns}
+    if isinstance(value, ChunkedDataset):
+        return {"type": "ChunkedDataset", "path": value.path, "columns": value.columns, "batch_size": value.batch_size}
+    return repr(value)
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def run_request(entry, latency_model, cache):
+    """
+    Plan and execute one request. Returns the output record for the JSONL file.
+    """
+    start = time.perf_counter()
+    record = {"id": entry["id"], "request": entry["request"]}
+    try:
+        tasks = prepare_plan(await arouter(entry["request"]))
+        record["tasks"] = tasks["tasks"]
+        graph, _, _ = build_dependency_graph(tasks["tasks"])
+        with ResultStore(graph) as store:
+            results = await async_main(tasks, store=store, latency_model=latency_model, cache=cache, optimize=False)
+            record["results"] = {str(task_id): to_jsonable(result) for task_id, result in results.items()}
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+async def arun_batch(input_path, output_path, concurrency=DEFAULT_CONCURRENCY, use_cache=True, trace_path=None):
+    """
+    Run every request in input_path through router + executor, at most 'concurrency' at a time,
+    appending each record to output_path as soon as it completes.
+    With trace_path, the whole batch is traced and exported as Chrome trace-event JSON.
+    Returns a summary with throughput and latency percentiles.
+    """
+    requests = read_requests(input_path)
+    latency_model = LatencyModel.load()
+    cache = TaskCache(enabled=use_cache and replay.caching_enabled())
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(entry):
+        async with semaphore:
+            return await run_request(entry, latency_model, cache)
+
+    latencies = []
+    errors = 0
+    tracer = Tracer() if trace_path else None
+    start = time.perf_counter()
+    try:
+        with open(output_path, "w") as out, use_tracer(tracer):
+            for finished in asyncio.as_completed([bounded(entry) for entry in requests]):
+                record = await finished
+                latencies.append(record["latency_s"])
+                errors += "error" in record
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        latency_model.save()
+        cache.close()
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "requests": len(requests),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(requests) / elapsed, 3) if elapsed else None,
+        "p50_latency_s": percentile(latencies, 50),
+        "p95_latency_s": percentile(latencies, 95),
+    }
+    print("\nBatch Summary:")
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    if tracer is not None:
+        print(f"\nTrace written to {tracer.export_chrome(trace_path)}")
+        tracer.print_summary()
+    return summary
+
+
+def run_batch(input_path, output_path, concurrency=DEFAULT_CONCURRENCY, use_cache=True, trace_path=None):
+    return asyncio.run(arun_batch(input_path, output_path, concurrency=concurrency, use_cache=use_cache, trace_path=trace_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan and execute many CityLLM requests from a JSONL file.")
+    parser.add_argument("input", help="JSONL file of requests")
+    parser.add_argument("output", help="JSONL file to stream results to")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight at once")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the cross-run task cache")
+    parser.add_argument("--trace", help="Write a Chrome trace-event JSON timeline to this path")
+    args = parser.parse_args()
+
+    run_batch(args.input, args.output, concurrency=args.concurrency, use_cache=not args.no_cache, trace_path=args.trace)
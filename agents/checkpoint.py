@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from agents.paths import state_path
+
+
+def file_stamp(file_path):
+    """
+    Size and modification time of an input file, so edits to the file invalidate reads of it.
+    """
+    try:
+        stat = os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns]
+    except (OSError, TypeError):
+        return None
+
+
+def task_fingerprint(task, dep_fingerprints):
+    """
+    Hash a task's type, arguments and its dependencies' fingerprints.
+    Because each fingerprint folds in the ones upstream of it, a change anywhere in a task's
+    ancestry changes the task's fingerprint too.
+    """
+    args = task.get("args", {})
+    payload = {
+        "task_type": task["task_type"],
+        "args": args,
+        "deps": dep_fingerprints,
+    }
+    if task["task_type"] == "file_io" and args.get("operation") == "read":
+        payload["file"] = file_stamp(args.get("file_path"))
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def plan_fingerprints(task_map):
+    """
+    Fingerprint every task in a plan. Returns {task_id: fingerprint}.
+    """
+    fingerprints = {}
+
+    def visit(task_id):
+        if task_id not in fingerprints:
+            task = task_map[task_id]
+            fingerprints[task_id] = task_fingerprint(task, [visit(dep) for dep in task["dep"]])
+        return fingerprints[task_id]
+
+    for task_id in task_map:
+        visit(task_id)
+    return fingerprints
+
+
+def is_checkpointable(task):
+    """
+    Only LLM and search work is checkpointed. File writes are side effects that must happen
+    on every run, and reads are cheaper to redo than to pickle (their fingerprint still
+    tracks the file's size and mtime, so dependents are invalidated when it changes).
+    """
+    return task["task_type"] != "file_io"
+
+
+class Checkpoint:
+    """
+    SQLite-backed store of completed task results, keyed by task fingerprint.
+
+    Rerunning a plan restores every task whose fingerprint is already stored and
+    executes only the tasks downstream of whatever changed or failed.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or state_path("checkpoints.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS task_results (
+                fingerprint TEXT PRIMARY KEY,
+                task_type TEXT NOT NULL,
+                result BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load(self, fingerprint):
+        """
+        Returns (True, result) if the fingerprint was checkpointed, else (False, None).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM task_results WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        try:
+            return True, pickle.loads(row[0])
+        except Exception as e:
+            print(f"Ignoring unreadable checkpoint {fingerprint[:12]}: {e}")
+            return False, None
+
+    def save(self, fingerprint, task_type, result):
+        try:
+            blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Could not checkpoint {task_type} result: {e}")
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO task_results (fingerprint, task_type, result, created_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, task_type, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM task_results")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
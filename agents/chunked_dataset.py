@@ -0,0 +1,206 @@
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # Streams record batches without materializing the file
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from agents.checkpoint import file_stamp
+
+
+DEFAULT_BATCH_SIZE = int(os.environ.get("CITYLLM_BATCH_SIZE", 100_000))
+
+# Bytes pyarrow's CSV reader parses per block; batches are re-sliced to batch_size rows afterwards.
+# The reader keeps a few dozen blocks in flight, so peak memory scales with this, not the file size.
+CSV_BLOCK_SIZE = 1024 * 1024
+
+_COLUMNAR_EXTENSIONS = (".parquet", ".geoparquet", ".feather", ".arrow", ".ipc")
+
+STREAMABLE_EXTENSIONS = (
+    ".csv", ".parquet", ".geoparquet", ".feather", ".arrow", ".ipc", ".jsonl", ".ndjson",
+    ".xlsx", ".geojson", ".shp", ".fgb", ".gpkg",
+)
+
+
+def _to_geodataframe(batch, geo):
+    """
+    Decode the WKB geometry columns of a GeoParquet/GeoArrow record batch.
+    """
+    import geopandas
+    frame = batch.to_pandas()
+    for name, meta in geo.get("columns", {}).items():
+        if name in frame.columns:
+            frame[name] = geopandas.GeoSeries.from_wkb(frame[name], crs=meta.get("crs", "OGC:CRS84"))
+    return geopandas.GeoDataFrame(frame, geometry=geo.get("primary_column", "geometry"))
+
+
+def _rebatch(batches, batch_size):
+    """
+    Re-slice a stream of record batches into batches of exactly batch_size rows (the last may be shorter).
+    """
+    pending, pending_rows = [], 0
+    for batch in batches:
+        while batch.num_rows:
+            take = min(batch.num_rows, batch_size - pending_rows)
+            pending.append(batch.slice(0, take))
+            pending_rows += take
+            batch = batch.slice(take)
+            if pending_rows == batch_size:
+                yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+
+
+class ChunkedDataset:
+    """
+    Lazy, re-iterable handle to a large file that is read in chunks of batch_size rows.
+
+    Iterating yields DataFrame chunks (GeoDataFrames for spatial formats); iter_batches() yields
+    Arrow record batches for columnar formats. Each pass re-opens the file, so only one chunk is
+    held in memory at a time and the handle itself can be passed to any number of tasks.
+
+    Usage:
+        total = 0
+        for chunk in dataset:
+            total += chunk["fare"].sum()
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, columns=None):
+        self.path = path
+        self.batch_size = int(batch_size)
+        self.columns = list(columns) if columns else None
+        self.extension = os.path.splitext(path)[1].lower()
+        # Part of the pickled handle, so cached results keyed on it change when the file does
+        self.stamp = file_stamp(path)
+
+    def geo_metadata(self):
+        """
+        The GeoParquet/GeoArrow "geo" schema metadata of a Parquet or Arrow IPC file, or None.
+        """
+        if pa is None or self.extension not in _COLUMNAR_EXTENSIONS:
+            return None
+        if self.extension in (".parquet", ".geoparquet"):
+            schema = pq.read_schema(self.path)
+        else:
+            with pa.memory_map(self.path) as source:
+                schema = pa_ipc.open_file(source).schema
+        if not schema.metadata or b"geo" not in schema.metadata:
+            return None
+        return json.loads(schema.metadata[b"geo"])
+
+    def _projection(self, geo):
+        """
+        The columns to decode; geometry columns are always kept so chunks stay GeoDataFrames.
+        """
+        if self.columns is None or geo is None:
+            return self.columns
+        return self.columns + [name for name in geo.get("columns", {}) if name not in self.columns]
+
+    def iter_batches(self, geo=None):
+        """
+        Yield pyarrow RecordBatches of at most batch_size rows (CSV, Parquet and Arrow IPC files).
+        """
+        if pa is None:
+            raise ImportError("Streaming record batches requires pyarrow")
+        columns = self._projection(geo if geo is not None else self.geo_metadata())
+        if self.extension == ".csv":
+            # Given a path, pyarrow buffers its read-ahead in its own memory pool; a file object doesn't
+            with open(self.path, "rb") as source:
+                reader = pa_csv.open_csv(
+                    source,
+                    read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+                    convert_options=pa_csv.ConvertOptions(include_columns=columns),
+                )
+                yield from _rebatch(reader, self.batch_size)
+        elif self.extension in (".parquet", ".geoparquet"):
+            yield from pq.ParquetFile(self.path).iter_batches(batch_size=self.batch_size, columns=columns)
+        elif self.extension in (".feather", ".arrow", ".ipc"):
+            with pa.memory_map(self.path) as source:
+                reader = pa_ipc.open_file(source)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+                yield from _rebatch((batch.select(columns) if columns else batch for batch in batches), self.batch_size)
+        else:
+            raise ValueError(f"No record batch reader for {self.extension} files; iterate for DataFrame chunks")
+
+    def __iter__(self):
+        if self.extension in (".geojson", ".shp", ".fgb", ".gpkg"):
+            yield from self._iter_vector()
+        elif self.extension in (".jsonl", ".ndjson"):
+            with pd.read_json(self.path, lines=True, chunksize=self.batch_size) as reader:
+                for chunk in reader:
+                    yield chunk[self.columns] if self.columns else chunk
+        elif self.extension == ".xlsx":
+            yield from self._iter_excel()
+        elif pa is None:
+            if self.extension != ".csv":
+                raise ImportError(f"Streaming {self.extension} files requires pyarrow")
+            yield from pd.read_csv(self.path, usecols=self.columns, chunksize=self.batch_size)
+        else:
+            geo = self.geo_metadata()
+            for batch in self.iter_batches(geo):
+                yield _to_geodataframe(batch, geo) if geo else batch.to_pandas()
+
+    def _iter_vector(self):
+        """
+        Page through a GDAL vector file batch_size features at a time.
+        """
+        import pyogrio
+        offset = 0
+        while True:
+            chunk = pyogrio.read_dataframe(
+                self.path, columns=self.columns, skip_features=offset, max_features=self.batch_size,
+                use_arrow=pa is not None,
+            )
+            if chunk.empty:
+                return
+            yield chunk
+            offset += len(chunk)
+            if len(chunk) < self.batch_size:
+                return
+
+    def _iter_excel(self):
+        """
+        Stream rows with openpyxl's read-only mode; the first row is the header.
+        """
+        import openpyxl
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(name) for name in next(rows, ())]
+            keep = [i for i, name in enumerate(header) if self.columns is None or name in self.columns]
+            names = [header[i] for i in keep]
+            chunk = []
+            for row in rows:
+                chunk.append([row[i] if i < len(row) else None for i in keep])
+                if len(chunk) == self.batch_size:
+                    yield pd.DataFrame(chunk, columns=names)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=names)
+        finally:
+            workbook.close()
+
+    def load(self):
+        """
+        Materialize the whole dataset as one DataFrame; only for consumers that really need it.
+        """
+        chunks = list(self)
+        if not chunks:
+            return pd.DataFrame(columns=self.columns)
+        if type(chunks[0]).__name__ == "GeoDataFrame":
+            import geopandas
+            return geopandas.GeoDataFrame(pd.concat(chunks, ignore_index=True), crs=chunks[0].crs)
+        return pd.concat(chunks, ignore_index=True)
+
+    def __repr__(self):
+        return (
+            f"ChunkedDataset(path={self.path!r}, columns={self.columns}, batch_size={self.batch_size}, "
+            f"size_bytes={self.stamp[0] if self.stamp else None})"
+        )
@@ -1,62 +1,38 @@
 import os
 import sys
-from langchain_openai import ChatOpenAI  # OpenAI model
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import API_KEYS
 
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
 
 from workflow.state import State, FileIOArgs, CodeWriterArgs, SearchWebArgs
+from agents import llm_gateway
+from agents.streaming import FenceFilter
+from agents.doc_index import relevant_docs
+from agents.chunked_dataset import ChunkedDataset
 
 
-# GeoPandas Documentation Reference
-geo_docs = """
-GeoPandas Documentation:
-
-1. **Reading and Writing Files:**
-- `geopandas.read_file(filepath)`: Reads a file and returns a GeoDataFrame.
-- `GeoDataFrame.to_file(filename, driver="ESRI Shapefile")`: Writes a GeoDataFrame to a file.
-
-2. **Data Structures:**
-- `GeoDataFrame`: A tabular data structure that contains a collection of geometries and associated data.
-- `GeoSeries`: A Series object designed to store shapely geometry objects.
-
-3. **Geometric Operations:**
-- `GeoSeries.buffer(distance)`: Returns a GeoSeries with buffered geometries.
-- `GeoSeries.centroid`: Returns a GeoSeries of centroids for each geometry.
-- `GeoSeries.convex_hull`: Returns the convex hull of each geometry.
-- `GeoSeries.plot()`: Plots the GeoSeries geometries.
-
-4. **Spatial Joins:**
-- `geopandas.sjoin(left_df, right_df, how="inner", op="intersects")`: Spatial join between two GeoDataFrames.
-
-5. **Coordinate Reference Systems (CRS):**
-- `GeoDataFrame.set_crs(crs, allow_override=False)`: Sets the CRS for the GeoDataFrame.
-- `GeoDataFrame.to_crs(crs)`: Transforms geometries to a new CRS.
-
-6. **Aggregation and Dissolve:**
-- `GeoDataFrame.dissolve(by=None, aggfunc="first")`: Aggregates geometries by a specified column.
-
-7. **Plotting:**
-- `GeoDataFrame.plot(column=None, cmap=None, legend=False)`: Plots the GeoDataFrame.
-
-8. **Miscellaneous:**
-- `geopandas.overlay(df1, df2, how="intersection")`: Performs spatial overlay between two GeoDataFrames.
-- `geopandas.clip(gdf, mask, keep_geom_type=False)`: Clips points, lines, or polygon geometries to the mask extent.
-"""
-
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4-turbo", api_key=API_KEYS["openai"])
-
-def code_writer(state: State):
+def build_code_prompt(state: State):
+    """
+    Build the code generation prompt from the task state.
+    """
     user_message = state["messages"][-1]["content"]
     language = state["task_args"]["language"]
     requirements = state["task_args"]["requirements"]
     dep = state["dep_results"]
+    # Only the reference sections relevant to this request go into the prompt
+    geo_docs = relevant_docs(f"{user_message} {requirements}")
+    # Streamed inputs are too large to load at once; ask for code that aggregates chunk by chunk
+    chunked = [value for value in dep if isinstance(value, ChunkedDataset)] if isinstance(dep, list) else []
+    streaming_note = "".join(
+        f"\n    - `{value.path}` is too large to load at once: read it in chunks of {value.batch_size} rows "
+        f"(e.g. `pd.read_csv(path, chunksize=...)` or `pyarrow.parquet.ParquetFile(path).iter_batches(...)`) "
+        f"and aggregate incrementally."
+        for value in chunked
+    )
     # Prompt Formatting
-    prompt = f"""
+    return f"""
     You are a Python function generator specialized in geospatial data processing.
     Return only valid and executable Python code with no explanations.
     
@@ -67,23 +43,48 @@ def code_writer(state: State):
     {geo_docs}
     
     Never generate responses outside this documentation.
-    Create a Python function that **returns the final result instead of printing it**.
+    Create a Python function that **returns the final result instead of printing it**.{streaming_note}
 
     Analyze the user request below and provide function code back:
 
     **Request:** "{user_message}" using {language} with the requirement {requirements} given the information {dep}
     """
 
-    # Get Response from LLM
-    response = llm.invoke(prompt).content
-
-    # Remove code block formatting if present
+def clean_code_response(response):
+    """
+    Remove code block formatting if present.
+    """
     if response.startswith("```python"):
         response = response[9:]
     if response.endswith("```"):
         response = response[:-3]
+    return response.strip()
+
+def code_writer(state: State, on_token=None):
+    """
+    Generate code for the task. With on_token, code is streamed to the callback as it is
+    generated (without the surrounding code fence); the return value is the same either way.
+    """
+    prompt = build_code_prompt(state)
+
+    # Get Response from LLM
+    response = llm_gateway.invoke(
+        prompt, agent="code_writer", on_token=on_token and FenceFilter(on_token, "```python")
+    )
+
+    return {"code_results": clean_code_response(response)}  # Return as dictionary
+
+async def acode_writer(state: State, on_token=None):
+    """
+    Async counterpart of code_writer().
+    """
+    prompt = build_code_prompt(state)
+
+    response = await llm_gateway.ainvoke(
+        prompt, agent="code_writer", on_token=on_token and FenceFilter(on_token, "```python")
+    )
 
-    return {"code_results": response.strip()}  # Return as dictionary
+    return {"code_results": clean_code_response(response)}
 
 '''
 #TEST SCRIPT
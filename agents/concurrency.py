@@ -0,0 +1,56 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from agents.tracing import current_span
+
+
+# Maximum number of in-flight calls per backend, shared by every DAG on an event loop
+PROVIDER_LIMITS = {
+    "openai": 8,
+    "tavily": 4,
+    "filesystem": 8,
+}
+
+DEFAULT_PROVIDER_LIMIT = 4
+
+# One set of semaphores per running event loop: {loop: {provider: Semaphore}}
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_provider_limit(provider, limit):
+    """
+    Change the concurrency cap for a backend.
+    Only affects event loops that have not used the provider yet.
+    """
+    if limit < 1:
+        raise ValueError(f"Concurrency limit for {provider} must be at least 1, got {limit}")
+    PROVIDER_LIMITS[provider] = limit
+
+
+def _get_semaphore(provider):
+    loop = asyncio.get_running_loop()
+    loop_semaphores = _semaphores.setdefault(loop, {})
+    semaphore = loop_semaphores.get(provider)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PROVIDER_LIMITS.get(provider, DEFAULT_PROVIDER_LIMIT))
+        loop_semaphores[provider] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def provider_slot(provider):
+    """
+    Hold one of the provider's concurrency slots for the duration of the block.
+
+    Usage:
+        async with provider_slot("openai"):
+            response = await llm.ainvoke(prompt)
+    """
+    semaphore = _get_semaphore(provider)
+    waited_from = time.perf_counter()
+    async with semaphore:
+        # Time spent waiting for a slot shows up as queue wait on the enclosing span
+        current_span().add("queue_wait_s", time.perf_counter() - waited_from)
+        yield
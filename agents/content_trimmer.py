@@ -0,0 +1,146 @@
+import re
+import zlib
+
+from agents import llm_gateway
+from agents.doc_index import DocIndex
+
+
+# Trims raw page content from web search results before extraction. Passages flow through a
+# pipeline of generators: boilerplate lines are dropped, pages are cut into passages, passages that
+# near-duplicate an earlier one (MinHash over word shingles) are removed, and the rest are ranked
+# with BM25 against the task's instructions and query and kept until the token budget is spent.
+
+CONTENT_TOKEN_BUDGET = 3000
+PASSAGE_TOKENS = 150
+
+# MinHash: NUM_HASHES signatures split into BANDS bands for locality-sensitive bucketing
+SHINGLE_WORDS = 5
+NUM_HASHES = 64
+BANDS = 16
+DUPLICATE_SIMILARITY = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_HASH_PARAMS = [
+    ((i * 0x9E3779B97F4A7C15 + 1) % _MERSENNE_PRIME, (i * 0xC2B2AE3D27D4EB4F + 7) % _MERSENNE_PRIME)
+    for i in range(1, NUM_HASHES + 1)
+]
+
+_BOILERPLATE_RE = re.compile(
+    r"\b(cookies?|privacy policy|terms of (use|service)|all rights reserved|copyright|sign (in|up)|log ?in|"
+    r"subscribe|newsletter|skip to (main )?content|share (on|this)|follow us|advertisement|breadcrumb)\b|©",
+    re.IGNORECASE,
+)
+# Lines that are nothing but a navigation control
+_NAV_LINE_RE = re.compile(r"^\W*(home|menu|search|back to top|next|previous|more|close|top)\W*$", re.IGNORECASE)
+_LINK_ONLY_RE = re.compile(r"^\W*(!?\[[^\]]*\]\([^)]*\)\W*)+$")
+
+
+def is_boilerplate(line):
+    """
+    Navigation, footer, cookie-banner and link-only lines. Other short lines (station names,
+    table cells) are content and are kept.
+    """
+    words = line.split()
+    if not words or _LINK_ONLY_RE.match(line) or _NAV_LINE_RE.match(line):
+        return True
+    return len(words) < 12 and bool(_BOILERPLATE_RE.search(line))
+
+
+def iter_passages(results):
+    """
+    Yield (result_index, passage) for the main text of every result, in result order.
+    Consecutive kept lines are packed into passages of about PASSAGE_TOKENS tokens.
+    """
+    for index, result in enumerate(results):
+        if not isinstance(result, dict) or not result.get("raw_content"):
+            continue
+        current, current_tokens = [], 0
+        for line in str(result["raw_content"]).splitlines():
+            line = " ".join(line.split())
+            if is_boilerplate(line):
+                continue
+            current.append(line)
+            current_tokens += llm_gateway.estimate_tokens(line)
+            if current_tokens >= PASSAGE_TOKENS:
+                yield index, "\n".join(current)
+                current, current_tokens = [], 0
+        if current:
+            yield index, "\n".join(current)
+
+
+def minhash(text):
+    words = text.lower().split()
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _HASH_PARAMS]
+
+
+def drop_near_duplicates(passages):
+    """
+    Yield passages whose estimated Jaccard similarity to every earlier passage is below DUPLICATE_SIMILARITY.
+    Candidates are found through LSH bands, so each passage is only compared with likely duplicates.
+    """
+    rows = NUM_HASHES // BANDS
+    buckets = {}
+    signatures = []
+    for index, passage in passages:
+        signature = minhash(passage)
+        band_keys = [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+        candidates = {candidate for key in band_keys for candidate in buckets.get(key, ())}
+        if any(
+            sum(x == y for x, y in zip(signature, signatures[candidate])) / NUM_HASHES >= DUPLICATE_SIMILARITY
+            for candidate in candidates
+        ):
+            continue
+        for key in band_keys:
+            buckets.setdefault(key, []).append(len(signatures))
+        signatures.append(signature)
+        yield index, passage
+
+
+def trim_results(results, query, token_budget=CONTENT_TOKEN_BUDGET):
+    """
+    Replace each result's raw_content with its most relevant, non-duplicate passages, keeping
+    at most token_budget tokens of page text overall. Results without raw_content pass through.
+    """
+    if not isinstance(results, list):
+        return results
+    passages = list(drop_near_duplicates(iter_passages(results)))
+    if not passages:
+        return results
+
+    scores = passage_scores([passage for _, passage in passages], query)
+    # Stable sort: passages scoring the same keep their page and position order
+    order = sorted(range(len(passages)), key=lambda position: -scores[position])
+
+    selected = set()
+    used = 0
+    for position in order:
+        tokens = llm_gateway.count_tokens(passages[position][1])
+        if used + tokens > token_budget:
+            continue
+        selected.add(position)
+        used += tokens
+
+    kept = {}
+    for position, (result_index, passage) in enumerate(passages):
+        if position in selected:
+            kept.setdefault(result_index, []).append(passage)
+
+    trimmed = []
+    for result_index, result in enumerate(results):
+        if isinstance(result, dict) and result.get("raw_content"):
+            result = {**result, "raw_content": "\n\n".join(kept.get(result_index, []))}
+        trimmed.append(result)
+    before = sum(llm_gateway.estimate_tokens(r.get("raw_content", "")) for r in results if isinstance(r, dict))
+    print(f"Trimmed search content from ~{before} to ~{used} tokens ({len(selected)} of {len(passages)} passages)")
+    return trimmed
+
+
+def passage_scores(passages, query):
+    """
+    BM25 score of every passage against the query (0 for passages sharing no terms with it).
+    """
+    index = DocIndex([{"title": "", "text": passage} for passage in passages])
+    scores = {id(section): score for score, section in index.search(query, k=len(passages))}
+    return [scores.get(id(section), 0.0) for section in index.sections]
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # Parsed tables are stored as uncompressed Arrow IPC so they can be memory-mapped
+    import pyarrow.feather as feather
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+from agents.paths import state_path
+
+
+DEFAULT_MAX_BYTES = int(os.environ.get("CITYLLM_DATASET_CACHE_MB", 2048)) * 1024 * 1024
+
+
+def _is_geodataframe(value):
+    return type(value).__name__ == "GeoDataFrame"
+
+
+def dataset_key(path, columns):
+    payload = json.dumps({"path": os.path.abspath(path), "columns": list(columns) if columns else None})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DatasetCache:
+    """
+    Cache of parsed source files (CSV, Excel, GeoJSON, Shapefile, ...) as Arrow IPC files.
+
+    A cached table is loaded by memory-mapping its IPC file instead of parsing the source again.
+    GeoDataFrames are stored with WKB geometry and GeoParquet-style "geo" metadata, so they come back with the
+    same geometry columns and CRS. An entry is only valid for the source's current size and mtime;
+    a changed source is re-parsed and replaces its entry. The files are kept under max_bytes by
+    evicting the least recently used entries.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.enabled = enabled and pa is not None
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if not self.enabled:
+            return
+        self.directory = directory or os.path.dirname(state_path("datasets", "index.sqlite"))
+        os.makedirs(self.directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                columns TEXT,
+                source_size INTEGER NOT NULL,
+                source_mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+
+    def _file(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def get(self, path, columns=None):
+        """
+        Return the cached frame for this version of the source, or None on a miss.
+        A projected read is also served from an entry holding every column.
+        """
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        for key in dict.fromkeys([dataset_key(path, columns), dataset_key(path, None)]):
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT source_size, source_mtime_ns FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                if tuple(row) != (stat.st_size, stat.st_mtime_ns):
+                    # The source changed since it was cached
+                    self._remove(key)
+                    continue
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            try:
+                schema = self._schema(self._file(key))
+                if columns and not set(columns) <= set(schema.names):
+                    # Not a column of this table: the reader reports the error, the entry stays valid
+                    continue
+                frame = self._read(self._file(key), schema, columns)
+            except (OSError, pa.ArrowInvalid) as e:
+                # The Arrow file is missing or corrupt
+                print(f"Dropping unreadable cached copy of {path}: {e}")
+                with self._lock:
+                    self._remove(key)
+                continue
+            self.hits += 1
+            return frame
+        self.misses += 1
+        return None
+
+    def _schema(self, file):
+        with pa.memory_map(file) as source:
+            return pa.ipc.open_file(source).schema
+
+    def _read(self, file, schema, columns):
+        metadata = schema.metadata or {}
+        if b"geo" in metadata:
+            import geopandas
+            if columns:
+                geometry_columns = json.loads(metadata[b"geo"]).get("columns", {})
+                columns = list(columns) + [name for name in geometry_columns if name not in columns]
+            return geopandas.read_feather(file, columns=columns, memory_map=True)
+        return feather.read_table(file, columns=columns, memory_map=True).to_pandas()
+
+    def put(self, path, columns, frame):
+        """
+        Store a parsed frame for the source's current version. Frames that Arrow can't hold
+        (mixed-type object columns, for instance) are skipped.
+        """
+        if not self.enabled or not isinstance(frame, pd.DataFrame):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        key = dataset_key(path, columns)
+        file = self._file(key)
+        tmp_file = f"{file}.{threading.get_ident()}.tmp"
+        try:
+            if _is_geodataframe(frame):
+                # Geometry is written as WKB with GeoParquet-style "geo" metadata
+                frame.to_feather(tmp_file, compression="uncompressed")
+            else:
+                feather.write_feather(pa.Table.from_pandas(frame), tmp_file, compression="uncompressed")
+            os.replace(tmp_file, file)
+        except Exception as e:
+            print(f"Could not cache parsed {path}: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, path, columns, source_size, source_mtime_ns, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, os.path.abspath(path), json.dumps(columns), stat.st_size, stat.st_mtime_ns,
+                 os.path.getsize(file), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def load(self, path, reader, columns=None):
+        """
+        Return the frame for path, parsing it with reader(path, columns) only on a miss.
+        """
+        frame = self.get(path, columns)
+        if frame is None:
+            frame = reader(path, columns)
+            self.put(path, columns, frame)
+        return frame
+
+    def _remove(self, key):
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._conn.commit()
+        if os.path.exists(self._file(key)):
+            os.remove(self._file(key))
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            self._remove(key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            for (key,) in self._conn.execute("SELECT key FROM entries").fetchall():
+                self._remove(key)
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_dataset_cache():
+    """
+    Process-wide cache used by file_io reads; disable with CITYLLM_DATASET_CACHE=0.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DatasetCache(enabled=os.environ.get("CITYLLM_DATASET_CACHE", "1") != "0")
+        return _default_cache
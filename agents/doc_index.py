@@ -0,0 +1,143 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from agents.paths import state_path
+
+
+# BM25 retrieval over the sectioned API reference in agents/docs, so code generation prompts carry
+# only the few sections relevant to the request instead of the whole reference. The index is built
+# once per version of the reference file, saved under the state directory and loaded on first use.
+
+DOCS_PATH = os.path.join(os.path.dirname(__file__), "docs", "geopandas_reference.md")
+DEFAULT_TOP_K = int(os.environ.get("CITYLLM_DOC_TOP_K", 6))
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Unicode-aware, so non-Latin text (Japanese, Cyrillic, accented names) is tokenized too
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens; identifiers like sjoin_nearest or to_crs also contribute their parts.
+    """
+    tokens = []
+    for word in re.findall(r"\w+", text.lower()):
+        parts = _WORD_RE.findall(word)
+        tokens.extend(parts)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+    return tokens
+
+
+def load_sections(path=DOCS_PATH):
+    """
+    Split a markdown reference into [{"title", "text"}] on its "## " headings.
+    """
+    sections = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("## "):
+                sections.append({"title": line[3:].strip(), "lines": []})
+            elif sections:
+                sections[-1]["lines"].append(line.rstrip())
+    return [{"title": s["title"], "text": "\n".join(s["lines"]).strip()} for s in sections]
+
+
+class DocIndex:
+    """
+    BM25 index over reference sections. search() returns the top-k sections for a query.
+    """
+
+    def __init__(self, sections, doc_freqs=None, lengths=None, term_freqs=None):
+        self.sections = sections
+        if term_freqs is None:
+            term_freqs = [dict(Counter(tokenize(f"{s['title']} {s['title']} {s['text']}"))) for s in sections]
+            lengths = [sum(tf.values()) for tf in term_freqs]
+            doc_freqs = dict(Counter(token for tf in term_freqs for token in tf))
+        self.term_freqs = term_freqs
+        self.lengths = lengths
+        self.doc_freqs = doc_freqs
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        n = len(sections)
+        self.idf = {token: math.log(1 + (n - df + 0.5) / (df + 0.5)) for token, df in doc_freqs.items()}
+
+    @classmethod
+    def build(cls, path=DOCS_PATH):
+        return cls(load_sections(path))
+
+    @classmethod
+    def load(cls, path=DOCS_PATH, index_path=None):
+        """
+        Load the saved index for this version of the reference, building and saving it if needed.
+        """
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        index_path = index_path or state_path("doc_index.json")
+        try:
+            with open(index_path) as f:
+                saved = json.load(f)
+            if saved["digest"] == digest:
+                return cls(saved["sections"], saved["doc_freqs"], saved["lengths"], saved["term_freqs"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(path)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "digest": digest, "sections": index.sections, "doc_freqs": index.doc_freqs,
+                "lengths": index.lengths, "term_freqs": index.term_freqs,
+            }, f)
+        os.replace(tmp_path, index_path)
+        return index
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """
+        Return up to k (score, section) pairs, best first; sections sharing no terms with the query are skipped.
+        """
+        query_tokens = set(tokenize(query))
+        if not self.avg_length:
+            # No section has any tokens, so nothing can match
+            return []
+        scored = []
+        for i, tf in enumerate(self.term_freqs):
+            score = 0.0
+            norm = K1 * (1 - B + B * self.lengths[i] / self.avg_length)
+            for token in query_tokens:
+                freq = tf.get(token)
+                if freq:
+                    score += self.idf[token] * freq * (K1 + 1) / (freq + norm)
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [(score, self.sections[i]) for score, i in scored[:k]]
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_doc_index():
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = DocIndex.load()
+        return _default_index
+
+
+def relevant_docs(query, k=DEFAULT_TOP_K):
+    """
+    Format the k reference sections most relevant to 'query' for inclusion in a prompt.
+    """
+    index = get_default_doc_index()
+    sections = [section for _, section in index.search(query, k)] or index.sections[:k]
+    body = "\n\n".join(f"**{section['title']}:**\n{section['text']}" for section in sections)
+    return f"GeoPandas Documentation:\n\n{body}\n"
@@ -12,24 +12,131 @@ from workflow.state import State, FileIOArgs, CodeWriterArgs, SearchWebArgs
 
 
 
+import json
+
 import pandas as pd
 
-def read_file_as_dataframe(file_path):
+try:
+    import pyarrow as pa  # Arrow-backed readers for columnar formats
+    import pyarrow.feather as feather
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from agents.tracing import span
+from agents.result_store import SpilledFrame
+from agents.chunked_dataset import ChunkedDataset, DEFAULT_BATCH_SIZE, STREAMABLE_EXTENSIONS
+from agents.dataset_cache import get_default_dataset_cache
+
+# Extensions read through GDAL (pyogrio) as GeoDataFrames, and Arrow IPC extensions
+VECTOR_EXTENSIONS = (".geojson", ".shp", ".fgb", ".gpkg")
+ARROW_IPC_EXTENSIONS = (".feather", ".arrow", ".ipc")
+
+# Text and GDAL formats whose parsed tables are kept in the dataset cache; columnar formats
+# are already cheap to load
+CACHED_EXTENSIONS = (".csv", ".xlsx", ".json") + VECTOR_EXTENSIONS
+
+
+def _has_geo_metadata(schema):
+    """
+    GeoParquet and GeoArrow files carry a "geo" entry in their schema metadata.
+    """
+    return bool(schema.metadata) and b"geo" in schema.metadata
+
+
+def _with_geometry_columns(schema, columns):
+    """
+    Add the file's geometry columns to a column projection, so a projected read still
+    returns a GeoDataFrame.
+    """
+    if columns is None:
+        return None
+    geometry_columns = json.loads(schema.metadata[b"geo"]).get("columns", {})
+    return list(columns) + [name for name in geometry_columns if name not in columns]
+
+
+def read_parquet(file_path, columns=None):
     """
-    Reads a file and returns its content as a Pandas DataFrame.
-    Supports CSV, Excel, and JSON files.
+    Parquet through pyarrow; GeoParquet files come back as GeoDataFrames.
+    """
+    schema = pq.read_schema(file_path)
+    if _has_geo_metadata(schema):
+        import geopandas
+        return geopandas.read_parquet(file_path, columns=_with_geometry_columns(schema, columns))
+    return pq.read_table(file_path, columns=columns).to_pandas()
+
+
+def read_arrow_ipc(file_path, columns=None):
+    """
+    Feather v2 / Arrow IPC files, memory-mapped rather than copied into memory.
+    """
+    with pa.memory_map(file_path) as source:
+        schema = pa_ipc.open_file(source).schema
+    if _has_geo_metadata(schema):
+        import geopandas
+        return geopandas.read_feather(file_path, columns=_with_geometry_columns(schema, columns))
+    return feather.read_table(file_path, columns=columns, memory_map=True).to_pandas()
+
+
+def read_vector(file_path, columns=None):
+    """
+    GeoJSON, Shapefile, FlatGeobuf and GeoPackage as a GeoDataFrame, decoding only the requested
+    attribute columns (the geometry is always read). Uses pyogrio's Arrow path when available.
+    """
+    try:
+        import pyogrio
+    except ImportError:
+        import geopandas
+        gdf = geopandas.read_file(file_path)
+        if columns is None:
+            return gdf
+        return gdf[[c for c in columns if c in gdf.columns and c != gdf.geometry.name] + [gdf.geometry.name]]
+    return pyogrio.read_dataframe(file_path, columns=columns, use_arrow=pa is not None)
+
+
+def read_file_as_dataframe(file_path, columns=None, use_cache=True):
+    """
+    Reads a file and returns its content as a Pandas DataFrame (GeoDataFrame for spatial formats).
+    Supports CSV, Excel, JSON, Parquet/GeoParquet, Feather/Arrow IPC, GeoJSON, Shapefile,
+    FlatGeobuf and GeoPackage files. If columns is given, only those columns are decoded.
+    Text and GDAL formats are parsed once per version of the file and then loaded from the
+    dataset cache.
     """
     if not os.path.exists(file_path):
         return {"file_results": "File not found."}
 
+    extension = os.path.splitext(file_path)[1].lower()
+    if use_cache and extension in CACHED_EXTENSIONS:
+        try:
+            return get_default_dataset_cache().load(file_path, parse_file, columns)
+        except Exception as e:
+            return {"file_results": f"Error reading file: {str(e)}"}
+    return parse_file(file_path, columns)
+
+
+def parse_file(file_path, columns=None):
+    """
+    Parse a file with the reader for its extension; errors are returned as {"file_results": ...}.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
     try:
         # Determine the file type based on the extension
-        if file_path.endswith(".csv"):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(".xlsx"):
-            df = pd.read_excel(file_path)
-        elif file_path.endswith(".json"):
+        if extension == ".csv":
+            df = pd.read_csv(file_path, usecols=columns)
+        elif extension == ".xlsx":
+            df = pd.read_excel(file_path, usecols=columns)
+        elif extension == ".json":
             df = pd.read_json(file_path)
+            if columns is not None:
+                df = df[columns]
+        elif extension in VECTOR_EXTENSIONS:
+            df = read_vector(file_path, columns)
+        elif extension in (".parquet", ".geoparquet") + ARROW_IPC_EXTENSIONS:
+            if pa is None:
+                return {"file_results": f"Reading {extension} files requires pyarrow."}
+            reader = read_parquet if extension in (".parquet", ".geoparquet") else read_arrow_ipc
+            df = reader(file_path, columns)
         else:
             return {"file_results": "Unsupported file format."}
 
@@ -40,6 +147,96 @@ def read_file_as_dataframe(file_path):
 
 
 
+def open_chunked(file_path, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streaming read: return a ChunkedDataset that downstream tasks iterate chunk by chunk,
+    instead of loading the whole file.
+    """
+    if not os.path.exists(file_path):
+        return {"file_results": "File not found."}
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in STREAMABLE_EXTENSIONS:
+        return {"file_results": f"Streaming is not supported for {extension} files; convert to CSV, JSON Lines or Parquet."}
+    return ChunkedDataset(file_path, batch_size, columns)
+
+
+def write_dataframe(df, file_path):
+    """
+    Write a DataFrame or GeoDataFrame in the format given by the file extension.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if type(df).__name__ == "GeoDataFrame" and extension in (".geojson", ".shp", ".gpkg", ".fgb"):
+        df.to_file(file_path)
+    elif extension == ".xlsx":
+        df.to_excel(file_path, index=False)
+    elif extension in (".json", ".geojson"):
+        df.to_json(file_path)
+    elif extension in (".parquet", ".geoparquet"):
+        df.to_parquet(file_path)
+    elif extension in ARROW_IPC_EXTENSIONS:
+        df.to_feather(file_path)
+    else:
+        df.to_csv(file_path, index=False)
+
+
+def write_chunks(dataset, file_path):
+    """
+    Write a ChunkedDataset one chunk at a time. CSV and Parquet outputs are appended to as the
+    chunks arrive; other formats need the whole frame and load it first.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".csv":
+        for i, chunk in enumerate(dataset):
+            chunk.to_csv(file_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    elif extension == ".parquet" and pa is not None and dataset.extension not in VECTOR_EXTENSIONS and dataset.geo_metadata() is None:
+        writer = None
+        try:
+            for chunk in dataset:
+                # Later chunks are cast to the first chunk's schema
+                table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(file_path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        write_dataframe(dataset.load(), file_path)
+
+
+def write_dependency_results(file_path, dep_results):
+    """
+    Write the outputs of a write task's dependencies, e.g. a frame or the code generated upstream.
+    A single frame is written in the file's format; anything else is written as text.
+    Returns False if no dependency produced a result.
+    """
+    values = []
+    for result in dep_results:
+        if result is None:
+            continue
+        # Agent results are wrapped as {"code_results": ...}, {"search_results": ...}
+        if isinstance(result, dict) and len(result) == 1:
+            result = next(iter(result.values()))
+        if isinstance(result, SpilledFrame):
+            result = result.load()
+        values.append(result)
+    if not values:
+        return False
+
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if len(values) == 1 and isinstance(values[0], pd.DataFrame):
+        write_dataframe(values[0], file_path)
+        return True
+    if len(values) == 1 and isinstance(values[0], ChunkedDataset):
+        write_chunks(values[0], file_path)
+        return True
+    with open(file_path, "w") as file:
+        file.write("\n\n".join(value if isinstance(value, str) else str(value) for value in values))
+    return True
+
+
 def file_io(state: State):
     """
     Handles file operations (reading/writing).
@@ -50,13 +247,22 @@ def file_io(state: State):
 
     # Read file
     if state["task_args"]["operation"] == "read":
-        result = read_file_as_dataframe(file_path)
+        columns = state["task_args"].get("columns")
+        if state["task_args"].get("stream"):
+            return open_chunked(file_path, columns, state["task_args"].get("batch_size") or DEFAULT_BATCH_SIZE)
+        with span("read_file", "file", path=file_path, columns=columns) as s:
+            result = read_file_as_dataframe(file_path, columns)
+            s.record_size(result)
         return result
   
 
-    # Write file THIS NEEDS UPDATING. IT SHOULD HAVE INPUT OF A DF, RETURN AS CSV/XSLX? 
+    # Write the given content, or the dependency results when no content was given
     elif state["task_args"]["operation"] == "write":
-        user_request = state["messages"][-1]["content"]
+        user_request = state["messages"][-1]["content"] if state["messages"] else ""
+        if not user_request and state.get("dep_results"):
+            if not write_dependency_results(file_path, state["dep_results"]):
+                return {"file_results": "Nothing to write: dependencies produced no results."}
+            return {"file_results": "File updated successfully."}
         with open(file_path, "w") as file:
             file.write(user_request)
         return {"file_results": "File updated successfully."}
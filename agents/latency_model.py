@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import threading
+
+from agents.paths import state_path
+
+
+# Prior estimates (seconds) used until a task type has been observed
+DEFAULT_ESTIMATES = {
+    "file_io": 0.5,
+    "code_writer": 20.0,
+    "search_web": 12.0,  # Tavily search plus the llm_extraction it runs on the results
+    "llm_extraction": 8.0,
+}
+
+UNKNOWN_TASK_ESTIMATE = 5.0
+
+# Weight of the newest observation in the moving average
+SMOOTHING = 0.3
+
+
+def args_size_bucket(args):
+    """
+    Bucket a task's arguments by serialized size (powers of two), so long prompts
+    and short ones are tracked separately.
+    """
+    size = len(json.dumps(args, sort_keys=True, default=str))
+    return int(math.log2(size + 1))
+
+
+class LatencyModel:
+    """
+    Learned per-task-type wall-clock latencies, persisted as JSON between runs.
+
+    Observations are kept as an exponential moving average per (task_type, args size bucket).
+    estimate() falls back to the task type's average over all buckets, then to DEFAULT_ESTIMATES.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._stats = {}  # {task_type: {bucket: {"mean": seconds, "count": n}}}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=None):
+        model = cls(path or state_path("latency.json"))
+        if os.path.exists(model.path):
+            try:
+                with open(model.path) as f:
+                    model._stats = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable latency model {model.path}: {e}")
+        return model
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._stats, indent=2, sort_keys=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def record(self, task, seconds):
+        task_type = task["task_type"]
+        bucket = str(args_size_bucket(task.get("args", {})))
+        with self._lock:
+            entry = self._stats.setdefault(task_type, {}).setdefault(bucket, {"mean": seconds, "count": 0})
+            if entry["count"]:
+                entry["mean"] += SMOOTHING * (seconds - entry["mean"])
+            entry["count"] += 1
+
+    def estimate(self, task):
+        task_type = task["task_type"]
+        bucket = str(args_size_bucket(task.get("args", {})))
+        with self._lock:
+            buckets = self._stats.get(task_type)
+            if buckets:
+                if bucket in buckets:
+                    return buckets[bucket]["mean"]
+                total = sum(b["count"] for b in buckets.values())
+                return sum(b["mean"] * b["count"] for b in buckets.values()) / total
+        return DEFAULT_ESTIMATES.get(task_type, UNKNOWN_TASK_ESTIMATE)
+
+
+def critical_path_lengths(graph, task_map, model):
+    """
+    Estimate, for every task, the remaining critical path: its own expected latency plus
+    the longest expected chain of dependents after it.
+    Returns {task_id: seconds}. The graph must be acyclic.
+    """
+    lengths = {}
+
+    def visit(task_id):
+        if task_id not in lengths:
+            downstream = max((visit(child) for child in graph.get(task_id, [])), default=0.0)
+            lengths[task_id] = model.estimate(task_map[task_id]) + downstream
+        return lengths[task_id]
+
+    for task_id in task_map:
+        visit(task_id)
+    return lengths
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+from agents.paths import state_path
+
+
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def normalize_prompt(prompt):
+    """
+    Collapse whitespace so prompts that differ only in indentation or line wrapping share a key.
+    """
+    return " ".join(str(prompt).split())
+
+
+def prompt_key(model, params, prompt):
+    payload = json.dumps(
+        {"model": model, "params": params, "prompt": normalize_prompt(prompt)},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of completions keyed by model, parameters and normalized prompt hash.
+
+    Entries expire after ttl seconds and the least recently used are evicted past max_bytes.
+    Identical prompts that are in flight at the same time are coalesced: the first caller
+    makes the upstream request and the others wait for its result.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}  # {key: concurrent.futures.Future}
+        self._ainflight = weakref.WeakKeyDictionary()  # {event loop: {key: asyncio.Future}}
+        self._conn = None
+        if not enabled:
+            return
+        self.path = path or state_path("llm_cache.sqlite")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            elif row is not None:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0] if row is not None else None
+
+    def put(self, key, model, response):
+        if not self.enabled:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= old_size
+                    if total <= self.max_bytes:
+                        break
+            self._conn.commit()
+
+    def get_or_compute(self, key, model, compute):
+        """
+        Return (response, status) where status is "hit", "coalesced" or "miss".
+        compute() is only called on a miss, by exactly one of the concurrent callers for this key.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, "hit"
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            self.coalesced += 1
+            return future.result(), "coalesced"
+
+        self.misses += 1
+        try:
+            response = compute()
+            self.put(key, model, response)
+            future.set_result(response)
+            return response, "miss"
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_compute(self, key, model, compute):
+        """
+        Async counterpart of get_or_compute(); compute is a zero-argument coroutine function.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, "hit"
+
+        loop = asyncio.get_running_loop()
+        inflight = self._ainflight.setdefault(loop, {})
+        future = inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future), "coalesced"
+
+        future = inflight[key] = loop.create_future()
+        self.misses += 1
+        try:
+            response = await compute()
+            self.put(key, model, response)
+            future.set_result(response)
+            return response, "miss"
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve the exception so asyncio doesn't warn when no one else was waiting
+            future.exception()
+            raise
+        finally:
+            inflight.pop(key, None)
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Process-wide cache used by the LLM gateway; disable with CITYLLM_LLM_CACHE=0.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(enabled=os.environ.get("CITYLLM_LLM_CACHE", "1") != "0")
+        return _default_cache
+
+
+def set_default_cache(cache):
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
@@ -2,36 +2,146 @@ from workflow.state import State, FileIOArgs, CodeWriterArgs, SearchWebArgs
 
 import os
 import sys
-from langchain.chat_models import ChatOpenAI
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import API_KEYS
 
 
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
-from langchain.schema import HumanMessage
 
+from agents import llm_gateway
 
-llm = ChatOpenAI(model="gpt-4-turbo", api_key=API_KEYS["openai"])
 
-def llm_extraction(state: State):
+# Inputs above MAX_PROMPT_TOKENS are extracted map-reduce style: split into chunks of at most
+# CHUNK_TOKENS, each chunk extracted separately (at most MAX_CONCURRENCY at a time), then the
+# partial extractions merged in a reduce step. A task can override chunk_tokens / max_concurrency
+# in its args.
+MAX_PROMPT_TOKENS = 12000
+CHUNK_TOKENS = 6000
+MAX_CONCURRENCY = 4
+# Rounds of chunked reduction before the remaining partials are merged in one prompt regardless
+MAX_REDUCE_DEPTH = 3
+
+def build_extraction_prompt(state: State):
+    """
+    Combine the task instructions with the dependency data into a single prompt.
+    """
+    # Get the instructions and input from task_args
+    instructions = state.get("task_args", {}).get("instructions", "")
+    input_data = state['dep_results']
+    
+    # Prepare the prompt
+    return f"{instructions}\n\nData:\n{input_data}"
+
+def build_map_prompt(instructions, chunk, index, total):
+    return (
+        f"{instructions}\n\n"
+        f"The data is split into {total} parts; this is part {index + 1}. Extract only what this part contains. "
+        f"If it contains nothing relevant, reply with an empty answer.\n\nData:\n{chunk}"
+    )
+
+def build_reduce_prompt(instructions, partials):
+    parts = "\n\n".join(f"--- Partial result {i + 1} ---\n{partial}" for i, partial in enumerate(partials))
+    return (
+        f"{instructions}\n\n"
+        f"The data was processed in parts. Merge the partial results below into a single answer, "
+        f"removing duplicates and keeping the requested format.\n\n{parts}"
+    )
+
+def split_into_chunks(text, chunk_tokens):
+    """
+    Split text into pieces of at most chunk_tokens tokens, breaking on line boundaries where possible.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for line in text.splitlines(keepends=True):
+        tokens = llm_gateway.count_tokens(line)
+        if tokens > chunk_tokens:
+            # A single oversized line (e.g. raw page content) is cut by characters
+            step = max(1, len(line) * chunk_tokens // tokens)
+            pieces = [line[i:i + step] for i in range(0, len(line), step)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_tokens = tokens if len(pieces) == 1 else llm_gateway.count_tokens(piece)
+            if current and current_tokens + piece_tokens > chunk_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+def extraction_settings(state: State):
+    task_args = state.get("task_args", {})
+    return (
+        task_args.get("instructions", ""),
+        int(task_args.get("chunk_tokens", CHUNK_TOKENS)),
+        int(task_args.get("max_concurrency", MAX_CONCURRENCY)),
+    )
+
+def map_reduce_extraction(instructions, text, chunk_tokens, max_concurrency, on_token=None, depth=0):
+    chunks = split_into_chunks(text, chunk_tokens)
+    print(f"Map-reduce extraction over {len(chunks)} chunks of up to {chunk_tokens} tokens")
+    prompts = [build_map_prompt(instructions, chunk, i, len(chunks)) for i, chunk in enumerate(chunks)]
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        # Copy the context in this thread so the map spans stay under the caller's tracer
+        futures = [
+            pool.submit(contextvars.copy_context().run, llm_gateway.invoke, prompt, agent="llm_extraction.map")
+            for prompt in prompts
+        ]
+        partials = [future.result() for future in futures]
+
+    reduce_prompt = build_reduce_prompt(instructions, partials)
+    if depth < MAX_REDUCE_DEPTH and llm_gateway.count_tokens(reduce_prompt) > MAX_PROMPT_TOKENS:
+        # Too many partials to merge at once: reduce them in chunks as well
+        return map_reduce_extraction(instructions, "\n\n".join(partials), chunk_tokens, max_concurrency, on_token, depth + 1)
+    return llm_gateway.invoke(reduce_prompt, agent="llm_extraction.reduce", on_token=on_token)
+
+async def amap_reduce_extraction(instructions, text, chunk_tokens, max_concurrency, on_token=None, depth=0):
+    chunks = split_into_chunks(text, chunk_tokens)
+    print(f"Map-reduce extraction over {len(chunks)} chunks of up to {chunk_tokens} tokens")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def extract(i, chunk):
+        async with semaphore:
+            return await llm_gateway.ainvoke(build_map_prompt(instructions, chunk, i, len(chunks)), agent="llm_extraction.map")
+
+    partials = await asyncio.gather(*(extract(i, chunk) for i, chunk in enumerate(chunks)))
+
+    reduce_prompt = build_reduce_prompt(instructions, partials)
+    if depth < MAX_REDUCE_DEPTH and llm_gateway.count_tokens(reduce_prompt) > MAX_PROMPT_TOKENS:
+        return await amap_reduce_extraction(instructions, "\n\n".join(partials), chunk_tokens, max_concurrency, on_token, depth + 1)
+    return await llm_gateway.ainvoke(reduce_prompt, agent="llm_extraction.reduce", on_token=on_token)
+
+def llm_extraction(state: State, on_token=None):
     """
     Process LLM extraction task based on the provided state.
+    Inputs too large for one prompt are extracted chunk by chunk and merged (map-reduce).
     
     Args:
         state: The current application state containing task arguments and search results
+        on_token: Optional callback that receives the response text as it streams in
         
     Returns:
         The direct response from the LLM
     """    
-    # Get the instructions and input from task_args
-    instructions = state.get("task_args", {}).get("instructions", "")
-    input_data = state['dep_results']
+    prompt = build_extraction_prompt(state)
+    if llm_gateway.count_tokens(prompt) > MAX_PROMPT_TOKENS:
+        instructions, chunk_tokens, max_concurrency = extraction_settings(state)
+        return map_reduce_extraction(instructions, str(state["dep_results"]), chunk_tokens, max_concurrency, on_token)
     
-    # Prepare the prompt
-    prompt = f"{instructions}\n\nData:\n{input_data}"
-    
-    # Call the LLM
-    response = llm([HumanMessage(content=prompt)])
-    
-    # Return the raw response content
-    return response.content
\ No newline at end of file
+    # Call the LLM and return the raw response content
+    return llm_gateway.invoke(prompt, agent="llm_extraction", on_token=on_token)
+
+async def allm_extraction(state: State, on_token=None):
+    """
+    Async counterpart of llm_extraction().
+    """
+    prompt = build_extraction_prompt(state)
+    if llm_gateway.count_tokens(prompt) > MAX_PROMPT_TOKENS:
+        instructions, chunk_tokens, max_concurrency = extraction_settings(state)
+        return await amap_reduce_extraction(instructions, str(state["dep_results"]), chunk_tokens, max_concurrency, on_token)
+
+    return await llm_gateway.ainvoke(prompt, agent="llm_extraction", on_token=on_token)
\ No newline at end of file
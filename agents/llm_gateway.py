@@ -0,0 +1,282 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import weakref
+
+import httpx
+from langchain_openai import ChatOpenAI  # OpenAI model
+
+try:
+    import tiktoken  # Exact token counts when available
+except ImportError:
+    tiktoken = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agents.concurrency import provider_slot
+from agents.tracing import span, token_usage
+from agents.llm_cache import get_default_cache, normalize_prompt, prompt_key
+from agents import replay
+
+
+# Single entry point for model access. Clients are created on first use and share one pooled
+# HTTP connection pool (per event loop for async calls); every call passes through a global
+# requests/tokens-per-minute limiter so bursts of concurrent tasks queue instead of getting 429s.
+# Completions are cached on disk (see agents.llm_cache) and identical in-flight prompts coalesced.
+# Passing on_token streams the completion: each piece of text is handed to the callback as it
+# arrives and the full text is still returned (and cached) as usual.
+# Upstream calls go through agents.replay, so they can be recorded to and replayed from cassettes.
+
+DEFAULT_MODEL = "gpt-4-turbo"
+
+REQUESTS_PER_MINUTE = int(os.environ.get("CITYLLM_OPENAI_RPM", 500))
+TOKENS_PER_MINUTE = int(os.environ.get("CITYLLM_OPENAI_TPM", 300000))
+
+# Completion size assumed when reserving rate-limit budget; corrected once usage is reported
+EXPECTED_COMPLETION_TOKENS = 1000
+
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token) for rate limiting.
+    """
+    return len(str(text)) // 4 + 1
+
+
+_encodings = {}
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """
+    Number of tokens 'text' takes for this model; uses tiktoken if installed, else estimate_tokens().
+    """
+    if tiktoken is None:
+        return estimate_tokens(text)
+    if model not in _encodings:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken downloads encodings on first use, which fails offline
+            print(f"Could not load tiktoken encoding for {model}, estimating token counts: {e}")
+            encoding = None
+        _encodings[model] = encoding
+    encoding = _encodings[model]
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(str(text), disallowed_special=()))
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter over requests and tokens per minute, shared by threads and event loops.
+    Callers reserve budget up front (the buckets may go negative) and wait until it is repaid,
+    so concurrent callers are served in arrival order instead of retrying in a storm.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_rate)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+
+    def reserve(self, tokens):
+        """
+        Reserve one request and 'tokens' tokens. Returns how long the caller must wait.
+        """
+        with self._lock:
+            self._refill()
+            self._requests -= 1
+            self._tokens -= tokens
+            return max(0.0, -self._requests / self.request_rate, -self._tokens / self.token_rate)
+
+    def adjust(self, tokens):
+        """
+        Correct an earlier reservation once the real token usage is known (positive = used more).
+        """
+        with self._lock:
+            self._tokens -= tokens
+
+    def acquire(self, tokens):
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens):
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+rate_limiter = RateLimiter()
+
+_lock = threading.Lock()
+_http_client = None
+_sync_clients = {}
+_async_clients = weakref.WeakKeyDictionary()  # {event loop: {client key: ChatOpenAI}}
+
+
+def _api_key():
+    from config import API_KEYS
+    return API_KEYS["openai"]
+
+
+def _client_key(model, params):
+    return (model, tuple(sorted(params.items())))
+
+
+def _shared_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _http_client
+
+
+def get_llm(model=DEFAULT_MODEL, **params):
+    """
+    Return the shared ChatOpenAI client for this model and parameters, creating it on first use.
+    Safe to call from sync code; for async calls use get_async_llm().
+    """
+    key = _client_key(model, params)
+    with _lock:
+        if key not in _sync_clients:
+            _sync_clients[key] = ChatOpenAI(
+                model=model, api_key=_api_key(), http_client=_shared_http_client(), **params
+            )
+        return _sync_clients[key]
+
+
+def get_async_llm(model=DEFAULT_MODEL, **params):
+    """
+    Like get_llm(), but bound to the running event loop's pooled async HTTP client.
+    """
+    loop = asyncio.get_running_loop()
+    key = _client_key(model, params)
+    with _lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        if key not in loop_clients:
+            http_async_client = loop_clients.get("http")
+            if http_async_client is None:
+                http_async_client = loop_clients["http"] = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+            loop_clients[key] = ChatOpenAI(
+                model=model, api_key=_api_key(), http_async_client=http_async_client, **params
+            )
+        return loop_clients[key]
+
+
+def _record_usage(s, response, reserved):
+    usage = token_usage(response)
+    s.set(**usage)
+    if usage:
+        rate_limiter.adjust(usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0) - reserved)
+
+
+def _merge_chunk(response, chunk, s, started):
+    """
+    Accumulate a streamed chunk into the full message, noting time to first token on the span.
+    """
+    if response is None:
+        s.set(first_token_s=round(time.perf_counter() - started, 4))
+        return chunk
+    return response + chunk
+
+
+def invoke(prompt, model=DEFAULT_MODEL, agent=None, use_cache=True, on_token=None, **params):
+    """
+    Send a prompt to the model and return the completion text.
+    Served from the response cache when possible; use_cache=False forces a fresh completion, as does
+    record/replay mode, so every completion goes through the cassette.
+    With on_token, the completion is streamed to the callback as it arrives (a cached
+    completion is delivered in one piece).
+    """
+    reserved = estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+    request = {"model": model, "params": params, "prompt": normalize_prompt(prompt)}
+
+    with span("llm", "llm", model=model, agent=agent, streamed=on_token is not None) as s:
+
+        def complete():
+            llm = get_llm(model, **params)
+            s.set(queue_wait_s=rate_limiter.acquire(reserved))
+            if on_token is None:
+                response = llm.invoke(prompt)
+            else:
+                response, started = None, time.perf_counter()
+                for chunk in llm.stream(prompt):
+                    if chunk.content:
+                        on_token(chunk.content)
+                    response = _merge_chunk(response, chunk, s, started)
+            _record_usage(s, response, reserved)
+            return response.content
+
+        def compute():
+            content = replay.call("llm", request, complete)
+            if on_token is not None and replay.get_mode() == "replay":
+                on_token(content)
+            return content
+
+        if not use_cache or not replay.caching_enabled():
+            return compute()
+        content, status = get_default_cache().get_or_compute(prompt_key(model, params, prompt), model, compute)
+        s.set(cache=status)
+        if on_token is not None and status != "miss":
+            on_token(content)
+        return content
+
+
+async def ainvoke(prompt, model=DEFAULT_MODEL, agent=None, use_cache=True, on_token=None, **params):
+    """
+    Async counterpart of invoke(); also holds an "openai" provider slot while the request is in flight.
+    """
+    reserved = estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+    request = {"model": model, "params": params, "prompt": normalize_prompt(prompt)}
+
+    with span("llm", "llm", model=model, agent=agent, streamed=on_token is not None) as s:
+
+        async def complete():
+            llm = get_async_llm(model, **params)
+            s.add("queue_wait_s", await rate_limiter.aacquire(reserved))
+            if on_token is None:
+                response = await llm.ainvoke(prompt)
+            else:
+                response, started = None, time.perf_counter()
+                async for chunk in llm.astream(prompt):
+                    if chunk.content:
+                        on_token(chunk.content)
+                    response = _merge_chunk(response, chunk, s, started)
+            _record_usage(s, response, reserved)
+            return response.content
+
+        async def compute():
+            async with provider_slot("openai"):
+                content = await replay.acall("llm", request, complete)
+            if on_token is not None and replay.get_mode() == "replay":
+                on_token(content)
+            return content
+
+        if not use_cache or not replay.caching_enabled():
+            return await compute()
+        content, status = await get_default_cache().aget_or_compute(prompt_key(model, params, prompt), model, compute)
+        s.set(cache=status)
+        if on_token is not None and status != "miss":
+            on_token(content)
+        return content
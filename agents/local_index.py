@@ -0,0 +1,249 @@
+import argparse
+import bisect
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agents.doc_index import tokenize, K1, B
+from agents.paths import state_path
+
+
+# On-disk BM25 inverted index over a directory of local documents (open-data catalogs, GTFS docs, ...),
+# used by the "local" search backend. The index is a single binary file that is memory-mapped when
+# loaded, so opening it costs nothing up front and a query only touches the postings of its terms.
+#
+# Layout (little-endian):
+#   header    MAGIC, VERSION, doc count, term count, average doc length, section offsets
+#   terms     fixed-size entries sorted by term: (string offset, string length, df, postings offset)
+#   strings   utf-8 term strings
+#   postings  per term, df entries of (doc id, term frequency)
+#   docs      fixed-size entries: (length, meta length, meta offset, text offset, text length)
+#   blob      per doc, its JSON metadata (url, title, path) followed by its text
+
+MAGIC = b"CLIX"
+VERSION = 1
+DEFAULT_MAX_RESULTS = 5
+SNIPPET_CHARS = 500
+
+TEXT_EXTENSIONS = {".md", ".markdown", ".txt", ".rst", ".html", ".htm", ".json", ".geojson", ".csv", ".xml"}
+
+_HEADER = struct.Struct("<4sIIIdQQQQQ")
+_TERM = struct.Struct("<QIIQ")
+_POSTING = struct.Struct("<II")
+_DOC = struct.Struct("<IIQQQ")
+
+_TAG_RE = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+_TITLE_RE = re.compile(r"<title>(.*?)</title>|^#+\s+(.+)$", re.IGNORECASE | re.MULTILINE)
+
+
+def default_index_path():
+    """
+    CITYLLM_LOCAL_INDEX if set, else local_index.bin in the state directory.
+    """
+    return os.environ.get("CITYLLM_LOCAL_INDEX") or state_path("local_index.bin")
+
+
+def read_document(path):
+    """
+    Return (title, text) for a corpus file; HTML markup is stripped, other formats are indexed as text.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    match = _TITLE_RE.search(raw)
+    title = " ".join((match.group(1) or match.group(2)).split()) if match else os.path.basename(path)
+    text = _TAG_RE.sub(" ", raw) if path.lower().endswith((".html", ".htm")) else raw
+    return title, text
+
+
+def iter_corpus(corpus_dir):
+    """
+    Yield the paths of all indexable files under corpus_dir, in a stable order.
+    """
+    for root, dirs, files in os.walk(corpus_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS:
+                yield os.path.join(root, name)
+
+
+def build_index(corpus_dir, index_path=None):
+    """
+    Index every text file under corpus_dir and write the index file. Returns the number of documents.
+    """
+    corpus_dir = os.path.abspath(corpus_dir)
+    index_path = index_path or default_index_path()
+    postings = {}
+    docs = []
+    blob = bytearray()
+    for doc_id, path in enumerate(iter_corpus(corpus_dir)):
+        title, text = read_document(path)
+        term_freqs = Counter(tokenize(f"{title} {title} {text}"))
+        for term, freq in term_freqs.items():
+            postings.setdefault(term, []).append((doc_id, freq))
+        meta = json.dumps({
+            "url": f"file://{path}", "title": title, "path": os.path.relpath(path, corpus_dir),
+        }).encode("utf-8")
+        text_bytes = text.encode("utf-8")
+        docs.append((sum(term_freqs.values()), len(meta), len(blob), len(blob) + len(meta), len(text_bytes)))
+        blob += meta + text_bytes
+
+    terms = sorted(postings)
+    encoded_terms = [term.encode("utf-8") for term in terms]
+    terms_offset = _HEADER.size
+    strings_offset = terms_offset + len(terms) * _TERM.size
+    postings_offset = strings_offset + sum(len(t) for t in encoded_terms)
+    docs_offset = postings_offset + sum(len(postings[t]) for t in terms) * _POSTING.size
+    blob_offset = docs_offset + len(docs) * _DOC.size
+    avg_length = sum(doc[0] for doc in docs) / len(docs) if docs else 0.0
+
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(
+            MAGIC, VERSION, len(docs), len(terms), avg_length,
+            terms_offset, strings_offset, postings_offset, docs_offset, blob_offset,
+        ))
+        string_pos, posting_pos = strings_offset, postings_offset
+        for term, encoded in zip(terms, encoded_terms):
+            f.write(_TERM.pack(string_pos, len(encoded), len(postings[term]), posting_pos))
+            string_pos += len(encoded)
+            posting_pos += len(postings[term]) * _POSTING.size
+        for encoded in encoded_terms:
+            f.write(encoded)
+        for term in terms:
+            for doc_id, freq in postings[term]:
+                f.write(_POSTING.pack(doc_id, freq))
+        for length, meta_length, meta_offset, text_offset, text_length in docs:
+            f.write(_DOC.pack(length, meta_length, blob_offset + meta_offset, blob_offset + text_offset, text_length))
+        f.write(blob)
+    os.replace(tmp_path, index_path)
+    return len(docs)
+
+
+class _TermList:
+    """
+    Sequence view of the sorted term table, so bisect can binary-search it in place.
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self):
+        return self._index.term_count
+
+    def __getitem__(self, i):
+        return self._index._term(i)[0]
+
+
+class LocalIndex:
+    """
+    Memory-mapped, read-only view of an index file written by build_index().
+    """
+
+    def __init__(self, path=None):
+        self.path = path = path or default_index_path()
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.doc_count, self.term_count, self.avg_length, self._terms_offset,
+         _, _, self._docs_offset, _) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a CityLLM local index (version {VERSION})")
+        self._terms = _TermList(self)
+
+    def _term(self, i):
+        string_offset, string_length, df, postings_offset = _TERM.unpack_from(self._mmap, self._terms_offset + i * _TERM.size)
+        return self._mmap[string_offset:string_offset + string_length], df, postings_offset
+
+    def postings(self, term):
+        """
+        Return [(doc_id, term_frequency)] for a term, empty if it is not in the index.
+        """
+        encoded = term.encode("utf-8")
+        i = bisect.bisect_left(self._terms, encoded)
+        if i == self.term_count:
+            return []
+        found, df, offset = self._term(i)
+        if found != encoded:
+            return []
+        return list(_POSTING.iter_unpack(self._mmap[offset:offset + df * _POSTING.size]))
+
+    def document(self, doc_id):
+        """
+        Return the metadata dict of a document with its text under "text".
+        """
+        length, meta_length, meta_offset, text_offset, text_length = _DOC.unpack_from(self._mmap, self._docs_offset + doc_id * _DOC.size)
+        doc = json.loads(self._mmap[meta_offset:meta_offset + meta_length])
+        doc["text"] = self._mmap[text_offset:text_offset + text_length].decode("utf-8")
+        return doc
+
+    def _doc_length(self, doc_id):
+        return _DOC.unpack_from(self._mmap, self._docs_offset + doc_id * _DOC.size)[0]
+
+    def search(self, query, k=DEFAULT_MAX_RESULTS):
+        """
+        Return up to k (score, doc_id) pairs for the query, best first.
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (self.doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, freq in postings:
+                norm = K1 * (1 - B + B * self._doc_length(doc_id) / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (K1 + 1) / (freq + norm)
+        return heapq.nlargest(k, ((score, doc_id) for doc_id, score in scores.items()))
+
+    def close(self):
+        self._mmap.close()
+
+
+def snippet(text, query, chars=SNIPPET_CHARS):
+    """
+    The part of the text around the first line mentioning a query term.
+    """
+    terms = set(tokenize(query))
+    lines = text.splitlines()
+    start = next((i for i, line in enumerate(lines) if terms & set(tokenize(line))), 0)
+    return " ".join(" ".join(lines[start:]).split())[:chars]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the local search index.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Index a directory of documents")
+    build.add_argument("corpus_dir")
+    build.add_argument("--index", help="Index file to write (default: CITYLLM_LOCAL_INDEX or .cityllm/local_index.bin)")
+    search = subcommands.add_parser("search", help="Query an index")
+    search.add_argument("query")
+    search.add_argument("--index", help="Index file to read")
+    search.add_argument("-k", type=int, default=DEFAULT_MAX_RESULTS)
+    args = parser.parse_args(argv)
+
+    args.index = args.index or default_index_path()
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_index(args.corpus_dir, args.index)
+        print(f"Indexed {count} documents into {args.index} in {time.perf_counter() - start:.2f}s")
+    else:
+        index = LocalIndex(args.index)
+        start = time.perf_counter()
+        hits = index.search(args.query, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for score, doc_id in hits:
+            doc = index.document(doc_id)
+            print(f"{score:7.3f}  {doc['path']}  {doc['title']}")
+        print(f"{len(hits)} results in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+
+
+# Local directory for run artifacts that should survive between runs (latency stats, checkpoints, caches).
+# Defaults to .cityllm/ at the repository root; override with the CITYLLM_STATE_DIR environment variable.
+STATE_DIR = os.environ.get(
+    "CITYLLM_STATE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".cityllm")),
+)
+
+
+def state_path(*parts):
+    """
+    Return a path inside STATE_DIR, creating the parent directory if needed.
+    """
+    path = os.path.join(STATE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,162 @@
+import copy
+import json
+import os
+import re
+import threading
+
+from agents.paths import state_path
+
+
+# Requests are matched on their template: the request text with its parameters (file paths,
+# quoted strings, years and other numbers, place names) replaced by typed placeholders. A cached plan
+# is only reused for a request with the same template up to case, whitespace and punctuation, so the
+# two differ in nothing but parameter values; those are then re-bound from the old values to the new.
+# Any other differing word ("schools" vs "stops", "CSV" vs "GeoJSON") can change the plan and is a miss.
+
+# Capitalized words that show up mid-sentence in requests without naming a place
+_NON_PLACE_WORDS = (
+    "Python", "Pandas", "Excel", "Shapefile", "Parquet", "Feather", "Arrow", "Matplotlib", "Folium",
+    "Leaflet", "Mapbox", "Google", "Maps", "OpenStreetMap", "Census", "Wikipedia",
+)
+_PLACE_WORD = rf"(?!(?:{'|'.join(_NON_PLACE_WORDS)})\b)[A-Z][a-z]+\b"
+
+_SLOT_PATTERNS = [
+    ("path", r"(?:[\w.-]+/)*[\w.-]+\.(?:csv|xlsx|json|geojson|shp|parquet|geoparquet|feather|arrow|fgb|gpkg|txt|html|tif|tiff)\b"),
+    ("quoted", r"\"[^\"]+\"|'[^']+'"),
+    ("year", r"\b(?:1[89]|20)\d{2}\b"),
+    ("number", r"\b\d+(?:\.\d+)?\b"),
+    # Capitalized word runs that don't start a sentence, e.g. "San Francisco", "New York City".
+    # CamelCase and all-caps words (GeoPandas, GeoJSON, NYC) and the tool names above are not places.
+    ("place", rf"(?<![.!?]\s)(?<!^)\b{_PLACE_WORD}(?:\s+{_PLACE_WORD})*"),
+]
+_SLOT_RE = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _SLOT_PATTERNS))
+_TOKEN_RE = re.compile(r"<\w+>|[a-z0-9]+")
+
+
+def extract_slots(request):
+    """
+    Split a request into (template, slots) where slots is a list of (kind, value) in order.
+    """
+    slots = []
+
+    def replace(match):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "quoted":
+            value = value[1:-1]
+        slots.append((kind, value))
+        return f"<{kind}>"
+
+    template = _SLOT_RE.sub(replace, request.strip())
+    return template, slots
+
+
+def template_key(template):
+    """
+    Normalized form of a template: its lowercase words and slot placeholders.
+    """
+    return " ".join(_TOKEN_RE.findall(template.lower()))
+
+
+def rebind(value, bindings):
+    """
+    Replace old parameter values with new ones in every string inside a plan.
+    Values only match as whole words ("500" does not match inside "5000"), longer values are
+    replaced first, and replacements go through sentinels so overlapping values don't clobber each other.
+    """
+    if isinstance(value, dict):
+        return {k: rebind(v, bindings) for k, v in value.items()}
+    if isinstance(value, list):
+        return [rebind(v, bindings) for v in value]
+    if isinstance(value, str):
+        ordered = sorted(bindings.items(), key=lambda kv: -len(kv[0]))
+        for i, (old, _) in enumerate(ordered):
+            value = re.sub(rf"(?<!\w){re.escape(old)}(?!\w)", f"\x00{i}\x00", value)
+        for i, (_, new) in enumerate(ordered):
+            value = value.replace(f"\x00{i}\x00", new)
+    return value
+
+
+def _mentions(value, old):
+    """
+    Whether any string inside a plan contains 'old' as a whole word, i.e. rebind() would replace it.
+    """
+    if isinstance(value, dict):
+        return any(_mentions(v, old) for v in value.values())
+    if isinstance(value, list):
+        return any(_mentions(v, old) for v in value)
+    if isinstance(value, str):
+        return re.search(rf"(?<!\w){re.escape(old)}(?!\w)", value) is not None
+    return False
+
+
+class PlanCache:
+    """
+    Index of previously planned requests by normalized template, persisted as JSON.
+    lookup() returns a re-bound copy of the plan cached for the same template, or None; add() indexes a new plan.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or state_path("plan_cache.json")
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # {template key: entry}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    for entry in json.load(f)["entries"]:
+                        self._entries[template_key(entry["template"])] = entry
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Ignoring unreadable plan cache {self.path}: {e}")
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": list(self._entries.values())}, f)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, request):
+        template, slots = extract_slots(request)
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get(template_key(template))
+            if entry is None:
+                return None
+            bindings = {old: new for (_, old), (_, new) in zip(entry["slots"], slots) if old != new}
+            if not all(_mentions(entry["plan"], old) for old in bindings):
+                # A changed parameter the plan never spells out can't be re-bound, so the plan would be stale
+                return None
+            self.hits += 1
+            return rebind(copy.deepcopy(entry["plan"]), bindings)
+
+    def add(self, request, plan):
+        template, slots = extract_slots(request)
+        with self._lock:
+            self._entries[template_key(template)] = {"request": request, "template": template, "slots": slots, "plan": plan}
+            self._save()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_plan_cache():
+    """
+    Process-wide plan cache used by the router; disable with CITYLLM_PLAN_CACHE=0.
+    """
+    global _default_cache
+    if os.environ.get("CITYLLM_PLAN_CACHE", "1") == "0":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PlanCache()
+        return _default_cache
@@ -0,0 +1,172 @@
+import copy
+import os
+import re
+from collections import deque
+
+
+# Rewrites a router plan ({"tasks": [...]}) before it is turned into a dependency graph:
+#   - validates ids and dep references (dangling and self references are dropped, cycles rejected)
+#   - merges duplicate tasks (same type, same normalized args, same inputs), e.g. two reads of one file
+#     or the same search issued twice, and points their consumers at the surviving task
+#   - drops placeholder write content such as "Results from Task 3" so the write uses its input instead
+#   - prunes reads whose output nothing consumes
+# Every change is listed in the returned report.
+
+# Writes have side effects and are never merged or pruned
+_SIDE_EFFECT_OPERATIONS = ("write",)
+
+_PLACEHOLDER_RE = re.compile(
+    r"^\s*(?:the\s+)?(?:results?|outputs?|data|content)\s+(?:from|of)\s+(?:the\s+)?(?:task|step)\s*#?\s*\w+\.?\s*$",
+    re.IGNORECASE,
+)
+
+
+class PlanError(ValueError):
+    """
+    Raised for plans that cannot be executed: missing or duplicate ids, or dependency cycles.
+    """
+
+
+def is_placeholder_content(content):
+    """
+    True for write content that only refers to another task's output, e.g. "Results from Task 3".
+    """
+    return isinstance(content, str) and bool(_PLACEHOLDER_RE.match(content))
+
+
+def _normalize(value, casefold=False):
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return value.casefold() if casefold else value
+    if isinstance(value, dict):
+        return {k: _normalize(v, casefold) for k, v in sorted(value.items())}
+    if isinstance(value, list):
+        return [_normalize(v, casefold) for v in value]
+    return value
+
+
+def _signature(task):
+    """
+    Key under which two tasks are interchangeable, or None if the task must never be merged.
+    """
+    args = dict(task.get("args", {}))
+    if task["task_type"] == "file_io":
+        if args.get("operation") in _SIDE_EFFECT_OPERATIONS:
+            return None
+        if args.get("file_path"):
+            args["file_path"] = os.path.normpath(args["file_path"])
+    # Search wording is case-insensitive; other args only ignore whitespace differences
+    args = _normalize(args, casefold=task["task_type"] == "search_web")
+    return repr((task["task_type"], args, sorted(map(str, task["dep"]))))
+
+
+def _is_pure_read(task):
+    return task["task_type"] == "file_io" and task.get("args", {}).get("operation") == "read"
+
+
+def _topological_order(tasks):
+    consumers = {task["id"]: [] for task in tasks}
+    in_degree = {task["id"]: len(task["dep"]) for task in tasks}
+    for task in tasks:
+        for dep in task["dep"]:
+            consumers[dep].append(task["id"])
+    queue = deque(task["id"] for task in tasks if in_degree[task["id"]] == 0)
+    order = []
+    while queue:
+        task_id = queue.popleft()
+        order.append(task_id)
+        for consumer in consumers[task_id]:
+            in_degree[consumer] -= 1
+            if in_degree[consumer] == 0:
+                queue.append(consumer)
+    if len(order) != len(tasks):
+        cyclic = sorted(str(task_id) for task_id, degree in in_degree.items() if degree > 0)
+        raise PlanError(f"Dependency cycle between tasks {', '.join(cyclic)}")
+    return order
+
+
+def validate_plan(tasks, report):
+    """
+    Check ids and dep references in place, recording any dropped reference in report.
+    """
+    ids = set()
+    for position, task in enumerate(tasks):
+        if "id" not in task:
+            raise PlanError(f"Task at position {position} has no id")
+        if "task_type" not in task:
+            raise PlanError(f"Task {task['id']} has no task_type")
+        if task["id"] in ids:
+            raise PlanError(f"Duplicate task id {task['id']}")
+        ids.add(task["id"])
+
+    ids_by_text = {str(task_id): task_id for task_id in ids}
+    for task in tasks:
+        deps = []
+        for dep in task.get("dep") or []:
+            if dep not in ids and str(dep) in ids_by_text:
+                # e.g. "2" referring to task 2
+                dep = ids_by_text[str(dep)]
+            if dep == task["id"]:
+                report.append({"action": "dropped_dep", "task": task["id"], "dep": dep, "reason": "task depends on itself"})
+            elif dep not in ids:
+                report.append({"action": "dropped_dep", "task": task["id"], "dep": dep, "reason": "no task has this id"})
+            elif dep not in deps:
+                deps.append(dep)
+        task["dep"] = deps
+    return _topological_order(tasks)
+
+
+def optimize_plan(plan):
+    """
+    Return (optimized_plan, report) for a router plan; the input plan is left untouched.
+    report is a list of {"action", "task", ...} entries describing each change.
+    """
+    tasks = copy.deepcopy(plan["tasks"])
+    report = []
+    order = validate_plan(tasks, report)
+    task_map = {task["id"]: task for task in tasks}
+
+    # Merge duplicates in dependency order, so consumers are compared after their inputs were merged
+    replaced = {}
+    survivors = {}
+    for task_id in order:
+        task = task_map[task_id]
+        task["dep"] = list(dict.fromkeys(replaced.get(dep, dep) for dep in task["dep"]))
+        signature = _signature(task)
+        if signature is None:
+            continue
+        if signature in survivors:
+            replaced[task_id] = survivors[signature]
+            report.append({"action": "merged", "task": task_id, "into": survivors[signature], "reason": f"duplicate {task['task_type']}"})
+        else:
+            survivors[signature] = task_id
+
+    kept = [task_map[task_id] for task_id in order if task_id not in replaced]
+
+    # Writes whose content just points at another task get their input written instead
+    for task in kept:
+        args = task.get("args", {})
+        if task["task_type"] == "file_io" and args.get("operation") == "write" and task["dep"] and is_placeholder_content(args.get("content")):
+            report.append({"action": "placeholder_content", "task": task["id"], "content": args.pop("content"), "reason": "writes its dependency results instead"})
+
+    # Prune reads nothing consumes, as long as something else in the plan produces the output
+    if any(not _is_pure_read(task) for task in kept):
+        consumed = {dep for task in kept for dep in task["dep"]}
+        for task in kept:
+            if _is_pure_read(task) and task["id"] not in consumed:
+                report.append({"action": "pruned", "task": task["id"], "reason": f"output of read {task['args'].get('file_path')} is never used"})
+        kept = [task for task in kept if not (_is_pure_read(task) and task["id"] not in consumed)]
+
+    # Keep the router's original task order
+    positions = {task["id"]: position for position, task in enumerate(plan["tasks"])}
+    kept.sort(key=lambda task: positions[task["id"]])
+    return {**plan, "tasks": kept}, report
+
+
+def print_report(report, before, after):
+    if not report:
+        return
+    print(f"\nPlan optimizer: {before} -> {after} tasks")
+    for entry in report:
+        details = ", ".join(f"{k}={v!r}" for k, v in entry.items() if k not in ("action", "task"))
+        print(f"  {entry['action']}: task {entry['task']} ({details})")
@@ -0,0 +1,77 @@
+import json
+
+
+class IncrementalPlanParser:
+    """
+    Parse a streamed JSON task list, yielding each task object as soon as its closing brace arrives.
+
+    Usage:
+        parser = IncrementalPlanParser()
+        for text in token_stream:
+            for task in parser.feed(text):
+                schedule(task)
+
+    Text before the opening '[' (such as a code fence) is skipped, and anything after the closing ']'
+    is ignored. Objects that fail to parse are skipped; the complete response is still parsed by the
+    router at the end, so nothing is lost for good.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+
+    def feed(self, text):
+        """
+        Consume more response text and return the list of task dicts completed by it.
+        """
+        if self.done:
+            return []
+        self._buffer += text
+        buffer = self._buffer
+        tasks = []
+        while self._pos < len(buffer):
+            ch = buffer[self._pos]
+            if not self._started:
+                self._started = ch == "["
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._object_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the task list
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        task = json.loads(buffer[self._object_start:self._pos + 1])
+                    except ValueError:
+                        task = None
+                    if isinstance(task, dict):
+                        tasks.append(task)
+                    self._object_start = None
+            self._pos += 1
+
+        # Only keep the object still being received
+        keep_from = self._object_start if self._object_start is not None else self._pos
+        self._buffer = buffer[keep_from:]
+        self._pos -= keep_from
+        if self._object_start is not None:
+            self._object_start = 0
+        return tasks
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from agents.paths import state_path
+
+
+# Record/replay of external calls (LLM completions, web searches, raw OpenAI client calls) so
+# performance runs can be repeated offline and deterministically.
+#
+#   CITYLLM_REPLAY=record    make real calls and append request/response pairs to cassettes
+#   CITYLLM_REPLAY=replay    serve responses from cassettes; an unrecorded request raises CassetteMiss
+#   CITYLLM_REPLAY=off       (default) call through
+#
+# Cassettes are JSONL files, one per kind of call, in CITYLLM_CASSETTE_DIR (default .cityllm/cassettes).
+# In replay mode each response is delayed according to CITYLLM_REPLAY_LATENCY:
+#   none (default) | recorded | fixed:<s> | uniform:<lo>:<hi> | normal:<mean>:<std> | lognormal:<mu>:<sigma>
+# optionally per kind via CITYLLM_REPLAY_LATENCY_<KIND> (e.g. CITYLLM_REPLAY_LATENCY_LLM), and
+# seeded with CITYLLM_REPLAY_SEED for repeatable runs.
+#
+# While recording or replaying, the response caches in front of these calls (LLM, search, task
+# results and plans) are bypassed: a cache hit would answer without reaching the cassette, so a
+# recording would miss the call and a replay would skip its latency.
+
+MODES = ("off", "record", "replay")
+
+_settings = {}
+_cassettes = {}
+_lock = threading.Lock()
+_rng = random.Random(os.environ.get("CITYLLM_REPLAY_SEED"))
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised in replay mode when a request was never recorded.
+    """
+
+
+def configure(mode=None, cassette_dir=None, latency=None, seed=None):
+    """
+    Override the environment settings for this process. latency is a spec string or {kind: spec}.
+    """
+    with _lock:
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"Replay mode must be one of {MODES}, got {mode!r}")
+            _settings["mode"] = mode
+        if cassette_dir is not None:
+            _settings["cassette_dir"] = cassette_dir
+            _cassettes.clear()
+        if latency is not None:
+            _settings["latency"] = latency
+        if seed is not None:
+            _rng.seed(seed)
+
+
+def get_mode():
+    mode = _settings.get("mode") or os.environ.get("CITYLLM_REPLAY", "off")
+    if mode not in MODES:
+        raise ValueError(f"CITYLLM_REPLAY must be one of {MODES}, got {mode!r}")
+    return mode
+
+
+def caching_enabled():
+    """
+    Whether response caches may answer calls; False while recording or replaying (see module comment).
+    """
+    return get_mode() == "off"
+
+
+def _cassette_dir():
+    directory = _settings.get("cassette_dir") or os.environ.get("CITYLLM_CASSETTE_DIR") or state_path("cassettes")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _latency_spec(kind):
+    latency = _settings.get("latency")
+    if isinstance(latency, dict):
+        return latency.get(kind, "none")
+    if latency is not None:
+        return latency
+    return os.environ.get(f"CITYLLM_REPLAY_LATENCY_{kind.upper()}") or os.environ.get("CITYLLM_REPLAY_LATENCY", "none")
+
+
+def sample_latency(spec, recorded=0.0):
+    """
+    Draw a delay in seconds from a latency spec string (see module comment).
+    """
+    name, _, args = spec.partition(":")
+    params = [float(a) for a in args.split(":")] if args else []
+    if name == "none":
+        return 0.0
+    if name == "recorded":
+        return recorded
+    if name == "fixed":
+        return params[0]
+    if name == "uniform":
+        return _rng.uniform(params[0], params[1])
+    if name == "normal":
+        return max(0.0, _rng.gauss(params[0], params[1]))
+    if name == "lognormal":
+        return _rng.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def request_key(request):
+    payload = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded request/response pairs of one kind, loaded from and appended to a JSONL file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def record(self, key, request, response, latency_s):
+        entry = {"key": key, "request": request, "response": response, "latency_s": round(latency_s, 4)}
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            self._entries[key] = entry
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+def get_cassette(kind):
+    with _lock:
+        cassette = _cassettes.get(kind)
+        if cassette is None:
+            cassette = _cassettes[kind] = Cassette(os.path.join(_cassette_dir(), f"{kind}.jsonl"))
+        return cassette
+
+
+def _replayed(kind, request):
+    entry = get_cassette(kind).get(request_key(request))
+    if entry is None:
+        description = json.dumps(request, default=str)
+        if len(description) > 200:
+            description = description[:200] + "..."
+        raise CassetteMiss(f"No recorded {kind} response for {description}")
+    return entry, sample_latency(_latency_spec(kind), entry.get("latency_s", 0.0))
+
+
+def call(kind, request, compute, encode=None, decode=None):
+    """
+    Run compute() according to the replay mode. 'request' is the JSON-able description of the call
+    used as the cassette key; encode/decode convert the response to and from its JSON form.
+    """
+    mode = get_mode()
+    if mode == "off":
+        return compute()
+    if mode == "replay":
+        entry, delay = _replayed(kind, request)
+        if delay:
+            time.sleep(delay)
+        return decode(entry["response"]) if decode else entry["response"]
+
+    start = time.perf_counter()
+    response = compute()
+    get_cassette(kind).record(request_key(request), request, encode(response) if encode else response, time.perf_counter() - start)
+    return response
+
+
+async def acall(kind, request, compute, encode=None, decode=None):
+    """
+    Async counterpart of call(); compute is a zero-argument coroutine function.
+    """
+    mode = get_mode()
+    if mode == "off":
+        return await compute()
+    if mode == "replay":
+        entry, delay = _replayed(kind, request)
+        if delay:
+            await asyncio.sleep(delay)
+        return decode(entry["response"]) if decode else entry["response"]
+
+    start = time.perf_counter()
+    response = await compute()
+    get_cassette(kind).record(request_key(request), request, encode(response) if encode else response, time.perf_counter() - start)
+    return response
+
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+class ReplayClient:
+    """
+    Drop-in for an openai.OpenAI client's chat.completions.create that goes through record/replay.
+    In replay mode the wrapped client may be None, so no API key or network is needed.
+
+    Usage:
+        client = ReplayClient(openai.OpenAI(api_key=...))   # or ReplayClient(None) when replaying
+        response = client.chat.completions.create(model=..., messages=[...])
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @classmethod
+    def wrap(cls, client):
+        """
+        Wrap client unless record/replay is off (or it is already wrapped).
+        """
+        if isinstance(client, cls) or get_mode() == "off":
+            return client
+        return cls(client)
+
+    def _create(self, **kwargs):
+        def compute():
+            if self._client is None:
+                raise RuntimeError("ReplayClient has no underlying client to record from")
+            return self._client.chat.completions.create(**kwargs)
+
+        return call("openai", kwargs, compute, encode=lambda response: response.model_dump(), decode=_to_namespace)
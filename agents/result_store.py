@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import pandas as pd
+
+
+# DataFrames larger than this (in bytes, as reported by memory_usage(deep=True)) are spilled to disk
+DEFAULT_SPILL_THRESHOLD = 64 * 1024 * 1024
+
+
+def _is_geodataframe(value):
+    return type(value).__name__ == "GeoDataFrame"
+
+
+class SpilledFrame:
+    """
+    Lazy handle to a DataFrame or GeoDataFrame that was spilled to a Parquet file.
+    Downstream tasks receive the handle instead of the frame; call load() to read it back,
+    optionally projecting only the columns that are needed.
+    """
+
+    def __init__(self, path, shape, columns, geo=False):
+        self.path = path
+        self.shape = shape
+        self.columns = columns
+        self.geo = geo
+
+    def load(self, columns=None):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Spilled result was already released: {self.path}")
+        if self.geo:
+            import geopandas
+            return geopandas.read_parquet(self.path, columns=columns)
+        return pd.read_parquet(self.path, columns=columns)
+
+    def __repr__(self):
+        kind = "GeoDataFrame" if self.geo else "DataFrame"
+        return f"SpilledFrame({kind}, path={self.path!r}, shape={self.shape}, columns={self.columns})"
+
+
+class ResultStore:
+    """
+    Holds task results for one DAG run.
+
+    Small results stay in memory. Large DataFrames/GeoDataFrames are written to Parquet in a
+    scratch directory and replaced by a SpilledFrame handle. Each entry knows how many tasks
+    depend on it and is freed once all of them have finished; results nothing depends on
+    (the plan's outputs) are kept until close().
+
+    Supports the dict operations the executor uses (store[task_id] = result, store[task_id],
+    items()), so it can stand in for the plain results dict.
+    """
+
+    def __init__(self, graph, spill_dir=None, spill_threshold=DEFAULT_SPILL_THRESHOLD):
+        self.spill_threshold = spill_threshold
+        self._owns_dir = spill_dir is None
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="cityllm-results-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._consumers = {task_id: len(dependents) for task_id, dependents in graph.items()}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _spill(self, task_id, frame):
+        path = os.path.join(self.spill_dir, f"task_{task_id}.parquet")
+        try:
+            frame.to_parquet(path)
+        except Exception as e:
+            # Missing pyarrow, unserializable columns, full disk: keep the frame in memory
+            print(f"Could not spill result of task {task_id}, keeping it in memory: {e}")
+            return frame
+        return SpilledFrame(path, frame.shape, [str(c) for c in frame.columns], geo=_is_geodataframe(frame))
+
+    def __setitem__(self, task_id, value):
+        if isinstance(value, pd.DataFrame) and value.memory_usage(deep=True).sum() >= self.spill_threshold:
+            value = self._spill(task_id, value)
+        with self._lock:
+            self._values[task_id] = value
+
+    def __getitem__(self, task_id):
+        with self._lock:
+            return self._values[task_id]
+
+    def __contains__(self, task_id):
+        with self._lock:
+            return task_id in self._values
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def release_dependencies(self, task):
+        """
+        Record that 'task' has finished with its dependencies' results.
+        Entries whose dependents have all finished are dropped and their spill files deleted.
+        """
+        for dep in task["dep"]:
+            with self._lock:
+                if dep not in self._consumers:
+                    continue
+                self._consumers[dep] -= 1
+                if self._consumers[dep] > 0:
+                    continue
+                value = self._values.pop(dep, None)
+            if isinstance(value, SpilledFrame) and os.path.exists(value.path):
+                os.remove(value.path)
+
+    def close(self):
+        """
+        Drop all remaining results and remove the scratch directory if the store created it.
+        """
+        with self._lock:
+            self._values.clear()
+        if self._owns_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
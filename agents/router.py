@@ -1,8 +1,6 @@
-from langchain_openai import ChatOpenAI  # OpenAI model
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import API_KEYS
 import json
 
 
@@ -12,12 +10,17 @@ from langgraph.graph.message import add_messages
 from typing import TypedDict, Union, Literal, Annotated
 
 from workflow.state import State, FileIOArgs, CodeWriterArgs, SearchWebArgs
+from agents import llm_gateway, replay
+from agents.tracing import span
+from agents.plan_cache import get_default_plan_cache
+from agents.streaming import FenceFilter
 
 
-llm = ChatOpenAI(model="gpt-4-turbo", api_key=API_KEYS["openai"])    
-
-def router(user_message):
-    prompt = f"""
+def build_router_prompt(user_message):
+    """
+    Build the planning prompt that asks the LLM to decompose a user request into tasks.
+    """
+    return f"""
     You are an advanced task planner responsible for breaking down a high-level user request into a structured, interdependent workflow using a minimal number of AI agents while ensuring **maximal efficiency**.
 
     ### **User Request**
@@ -41,6 +44,9 @@ def router(user_message):
     - **For `"write"`:** Specify `file_path` and the `content` to be written.
     - `file_path`: The file's location (e.g., `"data/input.csv"`).
     - `content` (for `"write"` only): The actual data to write (e.g., a string, JSON, or DataFrame).
+    - `columns` (for `"read"` only, optional): The list of columns the later tasks need (e.g., `["BoroName", "Shape_Area", "geometry"]`). Only these columns are loaded, so include it whenever the request names the fields it uses.
+    - `stream` (for `"read"` only, optional): Set to `true` for very large files (multi-GB logs or trip records) that must be processed in chunks instead of loaded at once; `batch_size` sets the rows per chunk.
+    - Supported formats: CSV, Excel, JSON, Parquet/GeoParquet, Feather/Arrow, GeoJSON, Shapefile, FlatGeobuf and GeoPackage.
 
     #### **2. code_writer** (Generate a single, efficient script)
     - Used for writing **one** optimized script that performs multiple tasks.
@@ -54,7 +60,7 @@ def router(user_message):
     #### **3. search_web** (Retrieve external information)
     - Used when information retrieval is necessary.
     - **Arguments:**
-    - `query`: The specific web search to perform.
+    - `query`: The specific web search to perform. For broad requests, a list of up to 3 different phrasings; they are searched in parallel and merged.
     - `focus_area`: The domain of interest (e.g., `"urban planning"`, `"environmental data"`).
     - `instructions`: How to **process** the search result using LLM (e.g., `"Extract the names and coordinates of metro stations"`).
 
@@ -134,13 +140,16 @@ def router(user_message):
 
     """
 
-    # Invoke LLM to generate structured tasks
-    tasks_json = llm.invoke(prompt).content
+
+def parse_router_response(tasks_json, user_message):
+    """
+    Turn the raw planner completion into {"tasks": [...]}, falling back to a single web search.
+    """
     if tasks_json.startswith("```json"):
         tasks_json = tasks_json[7:]  # Remove the first 7 characters (` ```json `)
     if tasks_json.endswith("```"):
         tasks_json = tasks_json[:-3]
-        
+
     # Attempt to parse the response as JSON
     try:
         structured_tasks = json.loads(tasks_json)
@@ -159,3 +168,73 @@ def router(user_message):
         }]
     }
 
+def lookup_cached_plan(user_message, router_span):
+    """
+    Return a re-bound plan from the plan cache for a request differing only in its parameters, or None.
+    """
+    plan_cache = get_default_plan_cache()
+    if plan_cache is None or not replay.caching_enabled():
+        # Recording or replaying: plan through the cassette
+        return None
+    tasks = plan_cache.lookup(user_message)
+    stats = plan_cache.stats()
+    router_span.set(plan_cache="hit" if tasks else "miss")
+    if tasks is not None:
+        print(f"Plan cache hit (hit rate {stats['hit_rate']:.0%} over {stats['lookups']} lookups)")
+    return tasks
+
+
+def remember_plan(user_message, tasks):
+    """
+    Add a freshly planned request to the plan cache, unless the plan is empty or planning fell
+    back to the default search.
+    """
+    plan_cache = get_default_plan_cache()
+    if plan_cache is None or not tasks["tasks"] or tasks["tasks"][0].get("id") == "default_search":
+        return
+    plan_cache.add(user_message, tasks)
+
+
+def router(user_message, use_plan_cache=True, on_token=None):
+    """
+    Plan the request into {"tasks": [...]}. With on_token, the plan's JSON text is streamed to
+    the callback as it is generated (without the ```json fence); a cached plan arrives in one piece.
+    """
+    with span("router", "router") as router_span:
+        tasks = lookup_cached_plan(user_message, router_span) if use_plan_cache else None
+        if tasks is not None:
+            if on_token is not None:
+                on_token(json.dumps(tasks["tasks"], indent=4))
+        else:
+            prompt = build_router_prompt(user_message)
+
+            # Invoke LLM to generate structured tasks
+            tasks_json = llm_gateway.invoke(
+                prompt, agent="router", on_token=on_token and FenceFilter(on_token, "```json")
+            )
+            tasks = parse_router_response(tasks_json, user_message)
+            if use_plan_cache:
+                remember_plan(user_message, tasks)
+        router_span.set(task_count=len(tasks["tasks"]))
+        return tasks
+
+async def arouter(user_message, use_plan_cache=True, on_token=None):
+    """
+    Async counterpart of router(); awaits the model instead of blocking a thread.
+    """
+    with span("router", "router") as router_span:
+        tasks = lookup_cached_plan(user_message, router_span) if use_plan_cache else None
+        if tasks is not None:
+            if on_token is not None:
+                on_token(json.dumps(tasks["tasks"], indent=4))
+        else:
+            prompt = build_router_prompt(user_message)
+
+            tasks_json = await llm_gateway.ainvoke(
+                prompt, agent="router", on_token=on_token and FenceFilter(on_token, "```json")
+            )
+            tasks = parse_router_response(tasks_json, user_message)
+            if use_plan_cache:
+                remember_plan(user_message, tasks)
+        router_span.set(task_count=len(tasks["tasks"]))
+        return tasks
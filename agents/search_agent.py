@@ -1,32 +1,235 @@
 import sys
 import os
-
-from langchain_community.tools.tavily_search import TavilySearchResults
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import API_KEYS  
 
 
 from workflow.state import State, FileIOArgs, CodeWriterArgs, SearchWebArgs
 
-from agents.llm_extraction_agent import llm_extraction
+from agents.llm_extraction_agent import llm_extraction, allm_extraction
+from agents.concurrency import provider_slot
+from agents.tracing import span
+from agents import replay
+from agents.search_cache import get_default_search_cache
+from agents import llm_gateway
+from agents.content_trimmer import trim_results, CONTENT_TOKEN_BUDGET
+from agents.search_backends import get_search_backend
+
+# Multi-query fan-out: queries searched at once by the sync path (the async path is bounded by
+# the backend's provider slot), results kept after merging, and the reciprocal-rank-fusion constant
+MAX_PARALLEL_QUERIES = 4
+MAX_MERGED_RESULTS = 10
+RRF_K = 60
+
+def with_focus_area(query, focus_area):
+    """
+    Append the router's focus_area to a query when it adds anything.
+    """
+    query = str(query)
+    if focus_area and focus_area.casefold() not in query.casefold():
+        query = f"{query} ({focus_area})"
+    return query
+
+def build_variants_prompt(query, count):
+    return (
+        f"Rewrite the web search query below into {count} different phrasings that would find "
+        f"complementary results (synonyms, official names, related data sources). "
+        f"Return only a JSON list of strings.\n\nQuery: {query}"
+    )
+
+def parse_variants(response, count):
+    """
+    Read the variant list from the model's reply; falls back to one variant per line.
+    """
+    text = response.strip().removeprefix("```json").removesuffix("```").strip()
+    try:
+        variants = json.loads(text)
+    except json.JSONDecodeError:
+        variants = [line.strip(" -*\"'") for line in text.splitlines()]
+    if not isinstance(variants, list):
+        return []
+    return [str(v).strip() for v in variants if str(v).strip()][:count]
+
+def build_search_queries(state: State):
+    """
+    All queries for a task: its query list if given, else its single query.
+    Returns (queries, variants_to_generate).
+    """
+    task_args = state.get("task_args") or {}
+    queries = task_args.get("queries") or [state["messages"][0]]
+    variants = task_args.get("query_variants", 0) if len(queries) == 1 else 0
+    return queries, variants
+
+def finalize_queries(queries, focus_area):
+    return list(dict.fromkeys(with_focus_area(query, focus_area) for query in queries))
+
+def merge_search_results(result_lists):
+    """
+    Merge the results of several queries by URL, ranked by reciprocal rank fusion:
+    pages that rank high for several phrasings come first.
+    """
+    scores = {}
+    pages = {}
+    extras = []
+    for results in result_lists:
+        for rank, result in enumerate(results if isinstance(results, list) else []):
+            if not isinstance(result, dict) or not result.get("url"):
+                extras.append(result)
+                continue
+            url = result["url"]
+            scores[url] = scores.get(url, 0.0) + 1.0 / (RRF_K + rank + 1)
+            # Keep the copy with the most page content
+            if len(str(result.get("raw_content") or "")) >= len(str((pages.get(url) or {}).get("raw_content") or "")):
+                pages[url] = result
+    ranked = sorted(pages, key=lambda url: -scores[url])[:MAX_MERGED_RESULTS]
+    return [pages[url] for url in ranked] + extras
+
+def fan_out_search(queries, backend=None):
+    """
+    Search several queries in parallel and merge their results. A failing query is skipped
+    unless every query failed.
+    """
+    if len(queries) == 1:
+        return run_search(queries[0], backend)
+    print(f"Searching {len(queries)} queries: {queries}")
 
-os.environ["TAVILY_API_KEY"] = API_KEYS["tavily"]
+    def search(query):
+        try:
+            return run_search(query, backend)
+        except Exception as e:
+            print(f"Search failed for {query!r}: {e}")
+            return e
 
-tavily_search = TavilySearchResults(max_results=5, include_answer=True, include_raw_content=True, include_images=True)
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_QUERIES) as pool:
+        # Copy the context here, not in the worker, so search spans land under the caller's tracer
+        futures = [pool.submit(contextvars.copy_context().run, search, query) for query in queries]
+        outcomes = [future.result() for future in futures]
+    result_lists = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+    if not result_lists:
+        raise outcomes[0]
+    return merge_search_results(result_lists)
+
+async def afan_out_search(queries, backend=None):
+    """
+    Async counterpart of fan_out_search().
+    """
+    if len(queries) == 1:
+        return await arun_search(queries[0], backend)
+    print(f"Searching {len(queries)} queries: {queries}")
+    outcomes = await asyncio.gather(*(arun_search(query, backend) for query in queries), return_exceptions=True)
+    for query, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Search failed for {query!r}: {outcome}")
+    result_lists = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+    if not result_lists:
+        raise outcomes[0]
+    return merge_search_results(result_lists)
+
+def run_search(query, backend=None):
+    """
+    Search a query with the given (or configured) backend; remote backends go through the search cache
+    (bypassed in record/replay mode, so every search goes through the cassette).
+    """
+    backend = get_search_backend(backend)
+    with span(f"{backend.name}_search", "search", query=query) as s:
+        if not backend.remote:
+            search_results = backend.search(query)
+        else:
+            cache = get_default_search_cache()
+            use_cache = replay.caching_enabled()
+            search_results = None
+            if use_cache:
+                search_results = cache.get(query, backend.options)
+                s.set(cache="hit" if search_results is not None else "miss")
+            if search_results is None:
+                search_results = replay.call(
+                    "search", {"query": query, **backend.options},
+                    lambda: backend.search(query),
+                )
+                if use_cache:
+                    search_results = cache.put(query, backend.options, search_results)
+        s.set(result_count=len(search_results))
+        s.record_size(search_results)
+    return search_results
+
+async def arun_search(query, backend=None):
+    """
+    Async counterpart of run_search(); holds a provider slot only when actually searching a remote backend.
+    """
+    backend = get_search_backend(backend)
+    with span(f"{backend.name}_search", "search", query=query) as s:
+        if not backend.remote:
+            search_results = await backend.asearch(query)
+        else:
+            cache = get_default_search_cache()
+            use_cache = replay.caching_enabled()
+            search_results = None
+            if use_cache:
+                search_results = cache.get(query, backend.options)
+                s.set(cache="hit" if search_results is not None else "miss")
+            if search_results is None:
+                async with provider_slot(backend.name):
+                    search_results = await replay.acall(
+                        "search", {"query": query, **backend.options},
+                        lambda: backend.asearch(query),
+                    )
+                if use_cache:
+                    search_results = cache.put(query, backend.options, search_results)
+        s.set(result_count=len(search_results))
+        s.record_size(search_results)
+    return search_results
+
+def trim_search_results(state: State, queries, search_results):
+    """
+    Cut raw page content down to the passages relevant to the task's instructions and queries,
+    within the task's max_content_tokens (default CONTENT_TOKEN_BUDGET).
+    """
+    task_args = state.get("task_args") or {}
+    relevance_query = " ".join([task_args.get("instructions") or ""] + [str(query) for query in queries])
+    with span("trim_content", "search") as s:
+        trimmed = trim_results(search_results, relevance_query, int(task_args.get("max_content_tokens") or CONTENT_TOKEN_BUDGET))
+        s.record_size(trimmed)
+    return trimmed
 
 def search_web(state: State):
     """
-    Uses TavilySearchResults to fetch relevant online information.
+    Fetches relevant information with the configured search backend (Tavily by default, or the
+    local index with CITYLLM_SEARCH_BACKEND=local or a "backend" task arg).
+    Tasks with several queries (or query_variants) are searched in parallel and merged
+    before a single extraction.
     """
-    search_query = state["messages"][0]
-    search_results = tavily_search.invoke({"query": search_query})
+    queries, variants = build_search_queries(state)
+    if variants:
+        queries = queries + parse_variants(llm_gateway.invoke(build_variants_prompt(queries[0], variants), agent="search_variants"), variants)
+    task_args = state.get("task_args") or {}
+    search_results = fan_out_search(finalize_queries(queries, task_args.get("focus_area")), task_args.get("backend"))
+    search_results = trim_search_results(state, queries, search_results)
     
     state['dep_results'] = search_results
     final_op = llm_extraction(state)
     
     return {"search_results": final_op}
 
+async def asearch_web(state: State):
+    """
+    Async counterpart of search_web(); the search and the extraction each hold their own provider slot.
+    """
+    queries, variants = build_search_queries(state)
+    if variants:
+        queries = queries + parse_variants(await llm_gateway.ainvoke(build_variants_prompt(queries[0], variants), agent="search_variants"), variants)
+    task_args = state.get("task_args") or {}
+    search_results = await afan_out_search(finalize_queries(queries, task_args.get("focus_area")), task_args.get("backend"))
+    search_results = await asyncio.to_thread(contextvars.copy_context().run, trim_search_results, state, queries, search_results)
+
+    state['dep_results'] = search_results
+    final_op = await allm_extraction(state)
+
+    return {"search_results": final_op}
+
 
 '''
 #TEST SCRIPT 
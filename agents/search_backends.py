@@ -0,0 +1,132 @@
+import asyncio
+import os
+import threading
+
+from langchain_community.tools.tavily_search import TavilySearchResults
+
+from agents.local_index import LocalIndex, build_index, default_index_path, snippet, DEFAULT_MAX_RESULTS
+
+
+# Search backends used by search_web. Every backend returns Tavily-shaped result dicts
+# ({"url", "title", "content", "raw_content", "score"}) so merging, trimming and extraction
+# don't depend on where the results came from. Pick one with CITYLLM_SEARCH_BACKEND
+# ("tavily" by default, or "local"), or register another with register_search_backend().
+
+TAVILY_OPTIONS = {"max_results": 5, "include_answer": True, "include_raw_content": True, "include_images": True}
+
+
+class SearchBackend:
+    """
+    Base class for search backends.
+
+    name      used for trace spans and provider slots
+    options   part of the cache and replay keys, so results from different backends never mix
+    remote    remote backends go through the search cache, replay cassettes and a provider slot;
+              local ones are fast and deterministic enough to be called directly
+    """
+
+    name = None
+    options = {}
+    remote = True
+
+    def search(self, query):
+        raise NotImplementedError
+
+    async def asearch(self, query):
+        return await asyncio.to_thread(self.search, query)
+
+
+class TavilyBackend(SearchBackend):
+    name = "tavily"
+    options = TAVILY_OPTIONS
+
+    def __init__(self):
+        self._client = None
+
+    def client(self):
+        """
+        Create the Tavily client on first use, so replayed runs need neither config.py nor an API key.
+        """
+        if self._client is None:
+            from config import API_KEYS
+            os.environ["TAVILY_API_KEY"] = API_KEYS["tavily"]
+            self._client = TavilySearchResults(**TAVILY_OPTIONS)
+        return self._client
+
+    def search(self, query):
+        return self.client().invoke({"query": query})
+
+    async def asearch(self, query):
+        return await self.client().ainvoke({"query": query})
+
+
+class LocalIndexBackend(SearchBackend):
+    """
+    BM25 search over the on-disk index built by `python -m agents.local_index build <dir>`.
+    If the index file is missing and CITYLLM_LOCAL_CORPUS names a directory, it is built on first use.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self, index_path=None, max_results=DEFAULT_MAX_RESULTS):
+        self.index_path = index_path or default_index_path()
+        self.max_results = max_results
+        self.options = {"backend": "local", "index": self.index_path, "max_results": max_results}
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                corpus_dir = os.environ.get("CITYLLM_LOCAL_CORPUS")
+                if not os.path.exists(self.index_path):
+                    if not corpus_dir:
+                        raise FileNotFoundError(
+                            f"No local search index at {self.index_path}; build one with "
+                            f"`python -m agents.local_index build <corpus_dir>` or set CITYLLM_LOCAL_CORPUS"
+                        )
+                    print(f"Building local search index from {corpus_dir}")
+                    build_index(corpus_dir, self.index_path)
+                self._index = LocalIndex(self.index_path)
+            return self._index
+
+    def search(self, query):
+        index = self.index()
+        results = []
+        for score, doc_id in index.search(query, self.max_results):
+            doc = index.document(doc_id)
+            results.append({
+                "url": doc["url"],
+                "title": doc["title"],
+                "content": snippet(doc["text"], query),
+                "raw_content": doc["text"],
+                "score": round(score, 4),
+            })
+        return results
+
+
+SEARCH_BACKENDS = {"tavily": TavilyBackend, "local": LocalIndexBackend}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def register_search_backend(name, factory):
+    """
+    Make a backend selectable by name; factory is called with no arguments on first use.
+    """
+    SEARCH_BACKENDS[name] = factory
+
+
+def get_search_backend(name=None):
+    """
+    Return the (shared) backend called name, defaulting to CITYLLM_SEARCH_BACKEND or "tavily".
+    """
+    name = name or os.environ.get("CITYLLM_SEARCH_BACKEND", "tavily")
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown search backend {name!r}; expected one of {sorted(SEARCH_BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = SEARCH_BACKENDS[name]()
+        return _backends[name]
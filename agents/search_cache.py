@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agents.paths import state_path
+
+
+DEFAULT_TTL = int(os.environ.get("CITYLLM_SEARCH_CACHE_TTL", 24 * 3600))
+
+
+def normalize_query(query):
+    """
+    Case- and whitespace-insensitive form of a search query.
+    """
+    return " ".join(str(query).split()).casefold()
+
+
+def search_key(query, options):
+    payload = json.dumps({"query": normalize_query(query), "options": options}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """
+    SQLite cache of web search results with a page index keyed by URL.
+
+    A query entry only stores the ordered list of result URLs; the page content lives once per URL,
+    so overlapping queries share pages instead of storing (and later extracting from) copies, and
+    a page already fetched with its raw content is reused when a later result for it lacks it.
+    Entries older than ttl seconds are treated as misses.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, enabled=True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.pages_reused = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if not enabled:
+            return
+        self.path = path or state_path("search_cache.sqlite")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS queries (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                urls TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def page(self, url):
+        """
+        Return the cached result dict for a URL if it is still fresh, else None.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT result, fetched_at FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def get(self, query, options):
+        """
+        Return the cached results for this query and options, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls, created_at FROM queries WHERE key = ?", (search_key(query, options),)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        results = []
+        for url in json.loads(row[0]):
+            page = self.page(url)
+            if page is None:
+                # A page expired or was evicted; the query has to be searched again
+                self.misses += 1
+                return None
+            results.append(page)
+        self.hits += 1
+        return results
+
+    def put(self, query, options, results):
+        """
+        Store search results and return them with page content merged from the page index.
+        """
+        if not self.enabled or not isinstance(results, list):
+            return results
+        now = time.time()
+        merged = []
+        seen = set()
+        with self._lock:
+            for result in results:
+                if not isinstance(result, dict) or not result.get("url"):
+                    merged.append(result)
+                    continue
+                if result["url"] in seen:
+                    continue
+                seen.add(result["url"])
+                row = self._conn.execute("SELECT result, fetched_at FROM pages WHERE url = ?", (result["url"],)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    known = json.loads(row[0])
+                    if known.get("raw_content") and not result.get("raw_content"):
+                        result = {**result, "raw_content": known["raw_content"]}
+                        self.pages_reused += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, result, fetched_at) VALUES (?, ?, ?)",
+                    (result["url"], json.dumps(result, default=str), now),
+                )
+                merged.append(result)
+            if merged and all(isinstance(result, dict) and result.get("url") for result in merged):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO queries (key, query, urls, created_at) VALUES (?, ?, ?, ?)",
+                    (search_key(query, options), normalize_query(query), json.dumps([r["url"] for r in merged]), now),
+                )
+            self._conn.commit()
+        return merged
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.executescript("DELETE FROM queries; DELETE FROM pages;")
+            self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_search_cache():
+    """
+    Process-wide cache used by search_web; disable with CITYLLM_SEARCH_CACHE=0.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SearchCache(enabled=os.environ.get("CITYLLM_SEARCH_CACHE", "1") != "0")
+        return _default_cache
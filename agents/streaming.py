@@ -0,0 +1,109 @@
+import asyncio
+import contextvars
+import queue
+import threading
+
+
+# Streaming helpers. Agents that support streaming take an on_token callback that receives each
+# piece of text as it arrives and still return the same final result as the blocking call.
+# TokenStream / ATokenStream turn such a call into something you can iterate over.
+
+_DONE = object()
+
+
+class FenceFilter:
+    """
+    Wrap an on_token callback so a leading ```<lang> fence and a trailing ``` never reach it.
+    Text that could still turn out to be part of a fence is held back until it can't.
+    """
+
+    def __init__(self, on_token, fence):
+        self.on_token = on_token
+        self.fence = fence
+        self._head = ""
+        self._started = False
+        self._pending = ""
+
+    def __call__(self, text):
+        if not self._started:
+            self._head += text
+            if self.fence.startswith(self._head):
+                return
+            text = self._head[len(self.fence):] if self._head.startswith(self.fence) else self._head
+            text = text.lstrip()
+            if not text:
+                return
+            self._started = True
+
+        text = self._pending + text
+        # Trailing backticks and whitespace may be the closing fence; wait for more text
+        body = text.rstrip("` \n")
+        self._pending = text[len(body):]
+        if body:
+            self.on_token(body)
+
+
+class TokenStream:
+    """
+    Run fn(*args, on_token=..., **kwargs) on a background thread and iterate over its tokens.
+    Once iteration finishes, .result holds fn's return value; exceptions are re-raised to the reader.
+
+    Usage:
+        stream = TokenStream(code_writer, state)
+        for token in stream:
+            print(token, end="", flush=True)
+        code = stream.result["code_results"]
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        self.result = None
+        self._queue = queue.Queue()
+        self._error = None
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(target=context.run, args=(self._run, fn, args, kwargs), daemon=True)
+        self._thread.start()
+
+    def _run(self, fn, args, kwargs):
+        try:
+            self.result = fn(*args, on_token=self._queue.put, **kwargs)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._queue.put(_DONE)
+
+    def __iter__(self):
+        while True:
+            token = self._queue.get()
+            if token is _DONE:
+                break
+            yield token
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class ATokenStream:
+    """
+    Async counterpart of TokenStream for coroutine functions; iterate with 'async for'.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        self.result = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+
+    async def __aiter__(self):
+        tokens = asyncio.Queue()
+        task = asyncio.ensure_future(self._fn(*self._args, on_token=tokens.put_nowait, **self._kwargs))
+        task.add_done_callback(lambda _: tokens.put_nowait(_DONE))
+        try:
+            while True:
+                token = await tokens.get()
+                if token is _DONE:
+                    break
+                yield token
+            self.result = task.result()
+        finally:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from agents.paths import state_path
+from agents.result_store import SpilledFrame
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Larger results aren't worth a second in-memory copy, and SQLite rejects blobs over ~1 GB anyway
+MAX_ENTRY_BYTES = 256 * 1024 * 1024
+
+# Seconds a cached result stays valid, per task type. Web results go stale fastest.
+DEFAULT_TTLS = {
+    "search_web": 24 * 3600,
+    "llm_extraction": 30 * 24 * 3600,
+    "code_writer": 30 * 24 * 3600,
+}
+
+
+def normalize_args(value):
+    """
+    Canonicalize task arguments so cosmetic differences (key order, stray or repeated
+    whitespace) map to the same cache key.
+    """
+    if isinstance(value, dict):
+        return {str(k): normalize_args(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize_args(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def content_hash(value):
+    """
+    Hash a task result by content, so identical outputs produced by different tasks or runs match.
+    """
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode("utf-8"))
+        digest.update(repr([str(t) for t in value.dtypes]).encode("utf-8"))
+        try:
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        except TypeError:
+            # Unhashable cells (lists, dicts, geometries): fall back to pickling
+            digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    elif isinstance(value, SpilledFrame):
+        with open(value.path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        try:
+            digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            digest.update(repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_cacheable(task):
+    """
+    Everything except file_io: writes are side effects, and parsed reads are already cached
+    as memory-mapped Arrow files by agents.dataset_cache.
+    """
+    return task["task_type"] != "file_io"
+
+
+def cache_key(task, dep_hashes):
+    """
+    Key a task on its type, normalized args and the content hashes of its dependencies' results.
+    """
+    payload = {
+        "task_type": task["task_type"],
+        "args": normalize_args(task.get("args", {})),
+        "deps": dep_hashes,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class TaskCache:
+    """
+    Cross-run, content-addressed cache of task results in SQLite.
+
+    Entries expire after a per-task-type TTL and the cache is kept under max_bytes by
+    evicting the least recently used entries. Set enabled=False to bypass it entirely.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, ttls=None, enabled=True):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if not enabled:
+            return
+        self.path = path or state_path("task_cache.sqlite")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                task_type TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key, task_type):
+        """
+        Returns (True, result) on a fresh hit, else (False, None).
+        """
+        if not self.enabled:
+            return False, None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttls.get(task_type, 0):
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return False, None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:
+            print(f"Ignoring unreadable cache entry {key[:12]}: {e}")
+            return False, None
+        with self._lock:
+            self.hits += 1
+        return True, value
+
+    def put(self, key, task_type, value):
+        if not self.enabled:
+            return
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Could not cache {task_type} result: {e}")
+            return
+        if len(blob) > min(self.max_bytes, MAX_ENTRY_BYTES):
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, task_type, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, task_type, blob, len(blob), now, now),
+                )
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # A failed write only costs a future cache miss
+                self._conn.rollback()
+                print(f"Could not cache {task_type} result: {e}")
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
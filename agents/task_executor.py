@@ -1,18 +1,41 @@
-import json
+import asyncio
+import contextvars
+import heapq
+import itertools
+import queue
+import reprlib
 import sys
+import threading
+import time
 from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 
 from agents.file_io_agent import file_io
-from agents.code_agent import code_writer
-from agents.search_agent import search_web
-from agents.llm_extraction_agent import llm_extraction
+from agents.code_agent import code_writer, acode_writer
+from agents.search_agent import search_web, asearch_web
+from agents.llm_extraction_agent import llm_extraction, allm_extraction
+from agents.router import router, arouter
+from agents.concurrency import provider_slot
+from agents import replay
+from agents.result_store import ResultStore
+from agents.latency_model import LatencyModel, critical_path_lengths
+from agents.checkpoint import Checkpoint, plan_fingerprints, is_checkpointable
+from agents.task_cache import TaskCache, cache_key, content_hash, is_cacheable
+from agents.tracing import Tracer, span, use_tracer
+from agents.plan_optimizer import optimize_plan, print_report, is_placeholder_content
+from agents.plan_parser import IncrementalPlanParser
 
-from workflow.state import State, FileIOArgs, CodeWriterArgs, SearchWebArgs
+from workflow.state import State, TaskState, FileIOArgs, CodeWriterArgs, SearchWebArgs
 
 
 
 
+# Results can be whole DataFrames or scraped pages; only log a bounded preview of them
+_result_repr = reprlib.Repr()
+_result_repr.maxstring = 500
+_result_repr.maxother = 500
+
 TASK_FUNCTIONS = {
     "file_io": file_io,
     "code_writer": code_writer,
@@ -20,6 +43,30 @@ TASK_FUNCTIONS = {
     "llm_extraction": llm_extraction
 }
 
+async def afile_io(state: State):
+    """
+    File reads and writes block, so run them on a worker thread under the filesystem limit.
+    """
+    async with provider_slot("filesystem"):
+        return await asyncio.to_thread(file_io, state)
+
+ASYNC_TASK_FUNCTIONS = {
+    "file_io": afile_io,
+    "code_writer": acode_writer,
+    "search_web": asearch_web,
+    "llm_extraction": allm_extraction
+}
+
+
+def prepare_plan(tasks, optimize=True):
+    """
+    Run the plan optimizer over a router plan (unless optimize=False) and print what it changed.
+    """
+    if not optimize:
+        return tasks
+    optimized, report = optimize_plan(tasks)
+    print_report(report, len(tasks["tasks"]), len(optimized["tasks"]))
+    return optimized
 
 def build_dependency_graph(tasks):
     """
@@ -66,113 +113,629 @@ def topological_sort(graph, in_degree):
 
 from typing import TypedDict, Union, Literal, Annotated, Dict, Any, List
 
-def execute_tasks(sorted_task_ids, task_map):
+def build_task_inputs(task):
     """
-    Execute tasks in the order provided, using a shared state that passes results between tasks.
-    Each task receives its own 'args' plus outputs from its dependencies.
+    Translate a planned task into the (task_args, messages) pair its agent expects.
     """
-    # Initialize shared state that will be updated after each task
-    state: State = {
-    "messages": [],
-    "task_type": None,  # Default task type (can be changed later)
-    "task_args": {},  # Empty dictionary (will be populated based on the task type)
-    "dep_results": []  # Empty list for storing dependency results
-    }
+    task_type = task["task_type"]
+    args = task.get("args", {})
+    messages = list(task.get("messages", []))
+    task_args = {}
 
-    
-    
-    results: Dict[int, Any] = {}  # Store all task results by task_id    
+    if task_type == "file_io":
+        task_args = {
+            "operation": args.get("operation"),
+            "file_path": args.get("file_path"),
+        }
 
-    for task_id in sorted_task_ids:
-        task = task_map[task_id]
-        task_type = task["task_type"]
-        
-        # update state task_type 
-        state["task_type"] = task_type
-        
-        # update state messages
-        messages = task.get("messages", [])
-        state["messages"] = messages
-        
-        # update state task_args
-        if task_type == "file_io":
-            task_args = {
-                "operation": task.get("args", {}).get("operation"),
-                "file_path": task.get("args", {}).get("file_path"),
-            }
-            
-            # Append "content" to messages if provided (for write operations)
-            if task.get("args", {}).get("operation") == "write":
-                content = task.get("args", {}).get("content", "")
-                state["messages"].append({"role": "user", "content": content})
-                
-        elif task_type == "code_writer":
-            task_args = {
-                "language": task.get("args", {}).get("language"),
-                "requirements": task.get("args", {}).get("requirements"),
-            }
-            
-            # Append "context" to messages if provided
-            context = task.get("args", {}).get("context", "")
-            if context:
-                state["messages"].append({"role": "user", "content": context})
-                
-        elif task_type == "search_web":
-            task_args = {
-                "focus_area": task.get("args", {}).get("focus_area"), 
-                "instructions": task.get("args", {}).get('instructions')
-            }
-            
-            # Append "query" to messages if provided
-            query = task.get("args", {}).get("query", "")
-            if query:
-                state["messages"].append(query)
-            
-        
-        elif task_type == "llm_extraction":
-            task_args = {
-                "instructions": task.get("args", {}).get("instructions", "")
-            }
+        # Column projection for reads: a list of names, or a comma-separated string
+        columns = args.get("columns")
+        if isinstance(columns, str):
+            columns = [column.strip() for column in columns.split(",") if column.strip()]
+        if args.get("operation") == "read" and columns:
+            task_args["columns"] = list(columns)
 
-            
-        # Update task_args in state
-        state["task_args"] = task_args
-        
-        # update dep-results in state
-        for index in task["dep"]:        
-            state["dep_results"].append(results[index])
-            
+        # Streaming reads hand downstream tasks a ChunkedDataset instead of a whole DataFrame
+        if args.get("operation") == "read" and args.get("stream"):
+            task_args["stream"] = True
+            if args.get("batch_size"):
+                task_args["batch_size"] = int(args["batch_size"])
+
+        # Append "content" to messages if provided (for write operations)
+        if args.get("operation") == "write":
+            content = args.get("content", "")
+            messages.append({"role": "user", "content": content})
+
+    elif task_type == "code_writer":
+        task_args = {
+            "language": args.get("language"),
+            "requirements": args.get("requirements"),
+        }
+
+        # Append "context" to messages if provided
+        context = args.get("context", "")
+        if context:
+            messages.append({"role": "user", "content": context})
+
+    elif task_type == "search_web":
+        # "query" may be a single query or a list of phrasings ("queries" is accepted too)
+        queries = args.get("queries") or args.get("query") or []
+        if isinstance(queries, str):
+            queries = [queries]
+        task_args = {
+            "focus_area": args.get("focus_area"),
+            "instructions": args.get('instructions'),
+            "queries": list(queries),
+            "query_variants": int(args.get("query_variants", 0)),
+        }
+        if args.get("max_content_tokens"):
+            task_args["max_content_tokens"] = int(args["max_content_tokens"])
+        if args.get("backend"):
+            task_args["backend"] = args["backend"]
+
+        # Append the (first) query to messages if provided
+        if queries:
+            messages.append(queries[0])
+
+    elif task_type == "llm_extraction":
+        task_args = {
+            "instructions": args.get("instructions", "")
+        }
+
+        # Optional map-reduce settings for inputs too large for one prompt
+        for key in ("chunk_tokens", "max_concurrency"):
+            if args.get(key):
+                task_args[key] = int(args[key])
 
-        
+    return task_args, messages
+
+def run_task(task_id, task_type, state, lane=None, queued_at=None):
+    """
+    Run a single task against its prepared state.
+    Returns the task result, or None if the task is unknown or raised.
+    When tracing, the task is recorded as a span on 'lane', with the time since
+    'queued_at' (when it became ready) as its queue wait.
+    """
+    queue_wait = time.perf_counter() - queued_at if queued_at is not None else 0.0
+    with span(task_type, "task", lane=lane, task_id=task_id, queue_wait_s=queue_wait) as task_span:
         print(f"\nExecuting Task {task_id} ({task_type}) with state: {state}")
-        
+
         # Get the function for the task type
         func = TASK_FUNCTIONS.get(task_type)
         if not func:
             print(f"Unknown task type: {task_type}")
-            results[task_id] = None
-            continue
-            
+            return None
+
         try:
             result = func(state)
-            results[task_id] = result
-            print(f"Task {task_id} result: {result}")
-                      
+            print(f"Task {task_id} result: {_result_repr.repr(result)}")
+            task_span.record_size(result)
+            return result
+
         except Exception as e:
             print(f"Error executing task {task_id}: {str(e)}")
-            results[task_id] = None
+            task_span.set(error=str(e))
+            return None
+
+async def arun_task(task_id, task_type, state, lane=None, queued_at=None):
+    """
+    Async counterpart of run_task().
+    """
+    queue_wait = time.perf_counter() - queued_at if queued_at is not None else 0.0
+    with span(task_type, "task", lane=lane, task_id=task_id, queue_wait_s=queue_wait) as task_span:
+        print(f"\nExecuting Task {task_id} ({task_type}) with state: {state}")
+
+        func = ASYNC_TASK_FUNCTIONS.get(task_type)
+        if not func:
+            print(f"Unknown task type: {task_type}")
+            return None
+
+        try:
+            result = await func(state)
+            print(f"Task {task_id} result: {_result_repr.repr(result)}")
+            task_span.record_size(result)
+            return result
+
+        except Exception as e:
+            print(f"Error executing task {task_id}: {str(e)}")
+            task_span.set(error=str(e))
+            return None
+
+def run_task_timed(task_id, task_type, state, lane=None, queued_at=None):
+    """
+    Run a task and also return its wall-clock duration in seconds.
+    """
+    start = time.perf_counter()
+    result = run_task(task_id, task_type, state, lane=lane, queued_at=queued_at)
+    return result, time.perf_counter() - start
+
+async def arun_task_timed(task_id, task_type, state, lane=None, queued_at=None):
+    start = time.perf_counter()
+    result = await arun_task(task_id, task_type, state, lane=lane, queued_at=queued_at)
+    return result, time.perf_counter() - start
+
+def build_task_state(task, results):
+    """
+    Build a fresh state for one task, holding only the results of its direct dependencies.
+    """
+    task_args, messages = build_task_inputs(task)
+    return TaskState(
+        task_id=task["id"],
+        task_type=task["task_type"],
+        task_args=task_args,
+        messages=messages,
+        dep_results=[results[index] for index in task["dep"]],
+    )
+
+_run_ids = itertools.count(1)
+
+class RunContext:
+    """
+    Per-run bookkeeping shared by all executors.
+
+    Holds the results container (a plain dict or a ResultStore), the optional latency model,
+    checkpoint and task cache, and decides for each task whether it can be restored instead of run.
+    A task's result is only checkpointed or cached when it succeeded and all of its dependencies
+    completed successfully, so a rerun never restores output computed from a failed input.
+    Tasks downstream of a failure are not run at all (see dependencies_failed()).
+    """
+
+    def __init__(self, task_map, store=None, latency_model=None, checkpoint=None, cache=None):
+        self.task_map = task_map
+        self.results = store if store is not None else {}  # Store all task results by task_id
+        self.latency_model = latency_model
+        self.checkpoint = checkpoint
+        self.cache = cache if cache is not None and cache.enabled else None
+        self.fingerprints = plan_fingerprints(task_map) if checkpoint is not None else {}
+        self.complete = set()  # tasks that succeeded and whose inputs were all complete
+        self.restored = []
+        self.cache_hits = []
+        self.cache_keys = {}
+        self.content_hashes = {}
+        self.run_id = next(_run_ids)
+
+    def build_state(self, task_id):
+        return build_task_state(self.task_map[task_id], self.results)
+
+    def lane(self, task_id):
+        """
+        Trace row for a task; unique across concurrent runs sharing one tracer.
+        """
+        return f"run {self.run_id} / task {task_id}"
+
+    def _content_hash(self, task_id):
+        if task_id not in self.content_hashes:
+            self.content_hashes[task_id] = content_hash(self.results[task_id])
+        return self.content_hashes[task_id]
+
+    def dependencies_failed(self, task_id):
+        """
+        Whether a dependency of the task failed (or was itself skipped); such a task is skipped
+        and counts as failed, so a failure stops everything downstream of it.
+        """
+        failed = [dep for dep in self.task_map[task_id]["dep"] if dep not in self.complete]
+        if failed:
+            print(f"Skipping task {task_id}: dependencies {failed} failed")
+        return bool(failed)
+
+    def restore(self, task_id):
+        """
+        Returns (True, result) if the task's result can be reused from the checkpoint or
+        the task cache, else (False, None).
+        """
+        task = self.task_map[task_id]
+        if self.checkpoint is not None and is_checkpointable(task):
+            hit, result = self.checkpoint.load(self.fingerprints[task_id])
+            if hit:
+                print(f"Task {task_id} ({task['task_type']}) restored from checkpoint")
+                self.restored.append(task_id)
+                return hit, result
+
+        if self.cache is not None and is_cacheable(task):
+            key = cache_key(task, [self._content_hash(dep) for dep in task["dep"]])
+            self.cache_keys[task_id] = key
+            hit, result = self.cache.get(key, task["task_type"])
+            if hit:
+                print(f"Task {task_id} ({task['task_type']}) served from cache")
+                self.cache_hits.append(task_id)
+                return hit, result
+
+        return False, None
+
+    def finish(self, task_id, result, elapsed=None, restored=False):
+        """
+        Record a task's result: update the latency model, checkpoint it, store it,
+        and free dependency results that no remaining task needs.
+        """
+        task = self.task_map[task_id]
+
+        if not restored and elapsed is not None and result is not None and self.latency_model is not None:
+            # Failed tasks are skipped so fast errors don't skew the estimates
+            self.latency_model.record(task, elapsed)
+
+        if result is not None and all(dep in self.complete for dep in task["dep"]):
+            self.complete.add(task_id)
+            if self.checkpoint is not None and not restored and is_checkpointable(task):
+                self.checkpoint.save(self.fingerprints[task_id], task["task_type"], result)
+            if task_id in self.cache_keys and not restored:
+                self.cache.put(self.cache_keys[task_id], task["task_type"], result)
+
+        self.results[task_id] = result
+        if isinstance(self.results, ResultStore):
+            self.results.release_dependencies(task)
+
+    def output(self):
+        if self.restored:
+            print(f"Restored {len(self.restored)} of {len(self.task_map)} tasks from checkpoint: {self.restored}")
+        if self.cache is not None:
+            lookups = len(self.cache_keys)
+            saved = sum((self.latency_model or LatencyModel()).estimate(self.task_map[t]) for t in self.cache_hits)
+            print(f"Task cache: {len(self.cache_hits)} hits / {lookups} lookups {self.cache_hits}, ~{saved:.1f}s saved")
+        return dict(self.results.items())
+
+def execute_tasks(sorted_task_ids, task_map, store=None, latency_model=None, checkpoint=None, cache=None):
+    """
+    Execute tasks in the order provided, passing results between tasks.
+    Each task receives its own 'args' plus the outputs of its direct dependencies.
+    If a ResultStore is given, results are kept in it (large frames spilled to disk,
+    intermediates freed once consumed) and the retained results are returned.
+    If a Checkpoint is given, tasks whose fingerprint was already checkpointed are restored instead of run.
+    If a TaskCache is given, tasks whose type, args and input contents were seen before are served from it.
+    """
+    run = RunContext(task_map, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+
+    for task_id in sorted_task_ids:
+        if run.dependencies_failed(task_id):
+            run.finish(task_id, None)
+            continue
+        hit, result = run.restore(task_id)
+        if hit:
+            run.finish(task_id, result, restored=True)
+            continue
+
+        result, elapsed = run_task_timed(task_id, task_map[task_id]["task_type"], run.build_state(task_id), lane=run.lane(task_id))
+        run.finish(task_id, result, elapsed)
     
+    return run.output()
+
+DEFAULT_MAX_WORKERS = 4
+
+def execute_tasks_parallel(graph, in_degree, task_map, max_workers=DEFAULT_MAX_WORKERS, store=None, latency_model=None, checkpoint=None, cache=None):
+    """
+    Execute tasks concurrently on a bounded worker pool.
+    A task becomes ready as soon as every task in its 'dep' list has finished, so
+    independent roots (file reads, web searches) overlap instead of waiting on each other.
+    When more tasks are ready than there are free workers, the one with the longest
+    estimated remaining critical path (see agents.latency_model) starts first.
+    Each task gets its own state holding only the results of its direct dependencies.
+    Returns {task_id: result}, same as execute_tasks.
+    """
+    # Validate the graph up front so a cycle fails before any task runs
+    topological_sort(graph, dict(in_degree))
+
+    latency_model = latency_model or LatencyModel()
+    priority = critical_path_lengths(graph, task_map, latency_model)
+    run = RunContext(task_map, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+
+    remaining = dict(in_degree)
+    ready = []  # heap of (-critical_path, order, task_id)
+    order = itertools.count()  # tie-breaker: equal priorities start in the order they became ready
+    ready_at = {}
+    pending = {}
+
+    def mark_ready(task_id):
+        ready_at[task_id] = time.perf_counter()
+        heapq.heappush(ready, (-priority[task_id], next(order), task_id))
+
+    def complete(task_id, result, elapsed=None, restored=False):
+        run.finish(task_id, result, elapsed, restored=restored)
+        for neighbor in graph[task_id]:
+            remaining[neighbor] -= 1
+            if remaining[neighbor] == 0:
+                mark_ready(neighbor)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def dispatch():
+            while ready and len(pending) < max_workers:
+                _, _, task_id = heapq.heappop(ready)
+                if run.dependencies_failed(task_id):
+                    complete(task_id, None)
+                    continue
+                hit, result = run.restore(task_id)
+                if hit:
+                    complete(task_id, result, restored=True)
+                    continue
+                # Run in a copy of this context so worker threads see the active tracer
+                future = pool.submit(
+                    contextvars.copy_context().run, run_task_timed,
+                    task_id, task_map[task_id]["task_type"], run.build_state(task_id),
+                    lane=run.lane(task_id), queued_at=ready_at[task_id],
+                )
+                pending[future] = task_id
+
+        for task_id, deg in remaining.items():
+            if deg == 0:
+                mark_ready(task_id)
+        dispatch()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id = pending.pop(future)
+                result, elapsed = future.result()
+                complete(task_id, result, elapsed)
+            dispatch()
+
+    return run.output()
+
+async def async_execute_tasks(graph, in_degree, task_map, store=None, latency_model=None, checkpoint=None, cache=None):
+    """
+    Execute tasks as asyncio tasks on the running event loop.
+    Scheduling mirrors execute_tasks_parallel: a task starts once all of its dependencies
+    have finished, and tasks that become ready together start in critical-path order so
+    they queue first for provider slots. Concurrency is capped per backend
+    (see agents.concurrency) rather than by a worker pool, so many DAGs can share one event loop.
+    """
+    topological_sort(graph, dict(in_degree))
+
+    latency_model = latency_model or LatencyModel()
+    priority = critical_path_lengths(graph, task_map, latency_model)
+    run = RunContext(task_map, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+
+    remaining = dict(in_degree)
+    pending = {}
+
+    # Restoring and finishing a task can hash, pickle, checkpoint or spill a large result;
+    # that runs on a worker thread so other tasks on the event loop keep going meanwhile.
+    async def complete(task_id, result, elapsed=None, restored=False):
+        await asyncio.to_thread(run.finish, task_id, result, elapsed, restored)
+        newly_ready = []
+        for neighbor in graph[task_id]:
+            remaining[neighbor] -= 1
+            if remaining[neighbor] == 0:
+                newly_ready.append(neighbor)
+        return newly_ready
+
+    async def start(task_ids):
+        queue = sorted(task_ids, key=lambda t: -priority[t])
+        while queue:
+            task_id = queue.pop(0)
+            if run.dependencies_failed(task_id):
+                queue = sorted(queue + await complete(task_id, None), key=lambda t: -priority[t])
+                continue
+            hit, result = await asyncio.to_thread(run.restore, task_id)
+            if hit:
+                queue = sorted(queue + await complete(task_id, result, restored=True), key=lambda t: -priority[t])
+                continue
+            coro = arun_task_timed(
+                task_id, task_map[task_id]["task_type"], run.build_state(task_id),
+                lane=run.lane(task_id), queued_at=time.perf_counter(),
+            )
+            pending[asyncio.create_task(coro)] = task_id
+
+    await start([task_id for task_id, deg in remaining.items() if deg == 0])
+
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        newly_ready = []
+        for finished in done:
+            task_id = pending.pop(finished)
+            result, elapsed = finished.result()
+            newly_ready.extend(await complete(task_id, result, elapsed))
+        await start(newly_ready)
+
+    return run.output()
+
+def execute_pipelined(user_message, max_workers=DEFAULT_MAX_WORKERS, latency_model=None, cache=None):
+    """
+    Plan and execute a request at the same time: the router streams its plan on a background
+    thread, each task is parsed as soon as its JSON object is complete and started once its
+    dependencies have finished, so root tasks (reads, searches) overlap the rest of the generation.
+    Everything is driven by one event queue fed by the planner thread and finished tasks.
+
+    Plan-wide rewrites (merging duplicates, pruning dead reads) and checkpoints need the whole plan
+    up front, so they are not applied here; placeholder write content is still dropped per task.
+    Returns (tasks, results) where tasks is the router's final plan.
+    """
+    events = queue.Queue()
+    task_map = {}
+    run = RunContext(task_map, latency_model=latency_model, cache=cache)
+    waiting = {}  # task_id -> dependencies that have not finished yet
+    consumers = defaultdict(list)
+    ready = deque()
+    ready_at = {}
+    finished = set()
+    pending = set()
+    final_tasks = None
+
+    def plan():
+        parser = IncrementalPlanParser()
+
+        def on_token(text):
+            for task in parser.feed(text):
+                events.put(("task", task))
+
+        try:
+            events.put(("plan", router(user_message, on_token=on_token)))
+        except Exception as e:
+            events.put(("plan_error", e))
+
+    def add_task(task):
+        task_id = task.get("id")
+        if task_id is None or task_id in task_map:
+            return
+        task = {**task, "dep": list(dict.fromkeys(task.get("dep") or []))}
+        args = task.get("args", {})
+        if task.get("task_type") == "file_io" and args.get("operation") == "write" and task["dep"] and is_placeholder_content(args.get("content")):
+            task["args"] = {k: v for k, v in args.items() if k != "content"}
+        task_map[task_id] = task
+        print(f"Planned Task {task_id} ({task.get('task_type')}) after {time.perf_counter() - started:.2f}s")
+
+        unmet = {dep for dep in task["dep"] if dep not in finished}
+        for dep in unmet:
+            consumers[dep].append(task_id)
+        if unmet:
+            waiting[task_id] = unmet
+        else:
+            mark_ready(task_id)
+
+    def mark_ready(task_id):
+        ready_at[task_id] = time.perf_counter()
+        ready.append(task_id)
+
+    def complete(task_id, result, elapsed=None, restored=False):
+        run.finish(task_id, result, elapsed, restored=restored)
+        finished.add(task_id)
+        for consumer in consumers.pop(task_id, []):
+            waiting[consumer].discard(task_id)
+            if not waiting[consumer]:
+                del waiting[consumer]
+                mark_ready(consumer)
+
+    def drop_missing_dependencies():
+        # Once the plan is final, dependencies on tasks that never appeared can't be met
+        for task_id, unmet in list(waiting.items()):
+            missing = {dep for dep in unmet if dep not in task_map}
+            if missing:
+                print(f"Task {task_id}: ignoring dependencies on unknown tasks {sorted(map(str, missing))}")
+                task_map[task_id]["dep"] = [dep for dep in task_map[task_id]["dep"] if dep not in missing]
+                unmet -= missing
+                if not unmet:
+                    del waiting[task_id]
+                    mark_ready(task_id)
+
+    started = time.perf_counter()
+    planner = threading.Thread(target=contextvars.copy_context().run, args=(plan,), daemon=True)
+    planner.start()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def dispatch():
+            while ready and len(pending) < max_workers:
+                task_id = ready.popleft()
+                if run.dependencies_failed(task_id):
+                    complete(task_id, None)
+                    continue
+                hit, result = run.restore(task_id)
+                if hit:
+                    complete(task_id, result, restored=True)
+                    continue
+                future = pool.submit(
+                    contextvars.copy_context().run, run_task_timed,
+                    task_id, task_map[task_id]["task_type"], run.build_state(task_id),
+                    lane=run.lane(task_id), queued_at=ready_at[task_id],
+                )
+                future.add_done_callback(lambda f, task_id=task_id: events.put(("done", task_id, f)))
+                pending.add(task_id)
+
+        while final_tasks is None or pending:
+            event = events.get()
+            if event[0] == "task":
+                add_task(event[1])
+            elif event[0] == "plan":
+                final_tasks = event[1]["tasks"]
+                print(f"Plan complete after {time.perf_counter() - started:.2f}s ({len(final_tasks)} tasks)")
+                # Tasks the stream didn't yield, e.g. the router's fallback search
+                for task in final_tasks:
+                    add_task(task)
+                drop_missing_dependencies()
+            elif event[0] == "plan_error":
+                print(f"Planning failed: {event[1]}")
+                final_tasks = list(task_map.values())
+                drop_missing_dependencies()
+            else:
+                _, task_id, future = event
+                pending.discard(task_id)
+                result, elapsed = future.result()
+                complete(task_id, result, elapsed)
+            dispatch()
+
+    planner.join()
+    if waiting:
+        print(f"Tasks never run (dependency cycle): {sorted(map(str, waiting))}")
+    return final_tasks, run.output()
+
+async def async_main(tasks, store=None, latency_model=None, checkpoint=None, cache=None, optimize=True):
+    """
+    Async counterpart of main(); returns the results instead of only printing them.
+    Pass a ResultStore to bound memory; the caller closes it once done with the results
+    (build it from the optimized plan, see prepare_plan(), and pass optimize=False).
+    Pass a LatencyModel to prioritize with (and update) learned task latencies; saving it is left to the caller.
+    Pass a Checkpoint to restore tasks completed by an earlier run of the same plan,
+    and a TaskCache to reuse results of identical tasks from any earlier run.
+    """
+    tasks = prepare_plan(tasks, optimize)
+    graph, in_degree, task_map = build_dependency_graph(tasks['tasks'])
+    results = await async_execute_tasks(graph, in_degree, task_map, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+    print("\nFinal Results:")
+    for task_id, result in results.items():
+        print(f"Task {task_id}: {_result_repr.repr(result)}")
     return results
 
-def main(tasks):
+async def async_run_request(user_message, store=None, latency_model=None, checkpoint=None, cache=None):
+    """
+    Plan a user request with the async router and execute the resulting DAG.
+    """
+    tasks = await arouter(user_message)
+    return await async_main(tasks, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+
+def main(tasks, parallel=False, max_workers=DEFAULT_MAX_WORKERS, resume=False, checkpoint_path=None, use_cache=True, trace_path=None, optimize=True):
+    """
+    Execute a router plan and print the results.
+    With resume=True, completed task results are checkpointed (by default in .cityllm/checkpoints.sqlite)
+    and a rerun of the same plan only executes tasks whose inputs changed or previously failed.
+    Results are also memoized across runs in .cityllm/task_cache.sqlite; use_cache=False bypasses it.
+    With trace_path, every task, LLM call, search and file read is traced; the timeline is written
+    there as Chrome trace-event JSON and a summary table is printed.
+    The plan is first optimized (duplicate tasks merged, dead reads pruned); optimize=False runs it as given.
+    """
+    tasks = prepare_plan(tasks, optimize)
     graph, in_degree, task_map = build_dependency_graph(tasks['tasks'])
-    sorted_task_ids = topological_sort(graph, in_degree)
-    
-    print("Execution Order:", sorted_task_ids)
-    results = execute_tasks(sorted_task_ids, task_map)
+    latency_model = LatencyModel.load()
+    checkpoint = Checkpoint(checkpoint_path) if resume else None
+    cache = TaskCache(enabled=use_cache and replay.caching_enabled())
+    tracer = Tracer(track_memory=True) if trace_path else None
+
+    with ResultStore(graph) as store, use_tracer(tracer):
+        if parallel:
+            print(f"Execution Mode: parallel ({max_workers} workers)")
+            results = execute_tasks_parallel(graph, in_degree, task_map, max_workers=max_workers, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+        else:
+            sorted_task_ids = topological_sort(graph, in_degree)
+            print("Execution Order:", sorted_task_ids)
+            results = execute_tasks(sorted_task_ids, task_map, store=store, latency_model=latency_model, checkpoint=checkpoint, cache=cache)
+        latency_model.save()
+        if checkpoint is not None:
+            checkpoint.close()
+        cache.close()
+        if tracer is not None:
+            print(f"\nTrace written to {tracer.export_chrome(trace_path)}")
+            tracer.print_summary()
+        print("\nFinal Results:")
+        for task_id, result in results.items():
+            print(f"Task {task_id}: {_result_repr.repr(result)}")
+
+def run_pipelined(user_message, max_workers=DEFAULT_MAX_WORKERS, use_cache=True, trace_path=None):
+    """
+    Plan and execute a user request with planning and execution overlapped (see execute_pipelined())
+    and print the results. Returns the results.
+    """
+    latency_model = LatencyModel.load()
+    cache = TaskCache(enabled=use_cache and replay.caching_enabled())
+    tracer = Tracer(track_memory=True) if trace_path else None
+
+    with use_tracer(tracer):
+        tasks, results = execute_pipelined(user_message, max_workers=max_workers, latency_model=latency_model, cache=cache)
+    latency_model.save()
+    cache.close()
+    if tracer is not None:
+        print(f"\nTrace written to {tracer.export_chrome(trace_path)}")
+        tracer.print_summary()
     print("\nFinal Results:")
     for task_id, result in results.items():
-        print(f"Task {task_id}: {result}")
+        print(f"Task {task_id}: {_result_repr.repr(result)}")
+    return results
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -0,0 +1,267 @@
+import asyncio
+import contextvars
+import json
+import math
+import pickle
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# The active tracer and innermost open span for the current thread / asyncio task.
+# Worker threads must be started with contextvars.copy_context().run to inherit them.
+_current_tracer = contextvars.ContextVar("cityllm_tracer", default=None)
+_current_span = contextvars.ContextVar("cityllm_span", default=None)
+
+
+class Span:
+    """
+    One timed operation. attrs carries whatever the call site knows: token counts,
+    result size in bytes, queue wait, peak memory.
+    """
+
+    def __init__(self, name, cat, lane, attrs):
+        self.name = name
+        self.cat = cat
+        self.lane = lane
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, amount):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def record_size(self, value):
+        self.attrs["result_bytes"] = result_size(value)
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+
+class _NullSpan:
+    """
+    Stand-in yielded when tracing is off, so call sites never need to check.
+    """
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, amount):
+        pass
+
+    def record_size(self, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects spans for one or more runs.
+    export_chrome() writes Chrome trace-event JSON (open in chrome://tracing or Perfetto);
+    summary() aggregates the spans into a per-operation table.
+    With track_memory=True, each span records the traced peak memory while it was open
+    (when spans overlap, the peak covers everything running at the same time); memory tracking
+    ends at export_chrome() or close(), which stops tracemalloc if this tracer started it.
+    """
+
+    def __init__(self, track_memory=False):
+        self.spans = []
+        self.track_memory = track_memory
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._started_tracemalloc = False
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self):
+        """
+        Stop memory tracking; tracemalloc keeps slowing every allocation until it is stopped.
+        """
+        self.track_memory = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _opened(self):
+        if self.track_memory:
+            with self._lock:
+                if self._open == 0:
+                    tracemalloc.reset_peak()
+                self._open += 1
+
+    def _closed(self, span):
+        if self.track_memory:
+            span.attrs["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            with self._lock:
+                self._open -= 1
+        with self._lock:
+            self.spans.append(span)
+
+    def export_chrome(self, path):
+        lanes = {}
+        events = []
+        with self._lock:
+            spans = list(self.spans)
+        for span in sorted(spans, key=lambda s: s.start):
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.cat,
+                "ph": "X",
+                "ts": round((span.start - self._origin) * 1e6, 1),
+                "dur": round(span.duration * 1e6, 1),
+                "pid": 1,
+                "tid": tid,
+                "args": span.attrs,
+            })
+        for lane, tid in lanes.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": str(lane)}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        self.close()
+        return path
+
+    def summary(self):
+        """
+        Aggregate spans by (category, operation). Returns a list of row dicts.
+        """
+        groups = defaultdict(list)
+        with self._lock:
+            for span in self.spans:
+                groups[(span.cat, span.name)].append(span)
+
+        rows = []
+        for (cat, name), spans in sorted(groups.items()):
+            durations = sorted(s.duration for s in spans)
+            rows.append({
+                "category": cat,
+                "operation": name,
+                "count": len(spans),
+                "total_s": sum(durations),
+                "mean_s": sum(durations) / len(durations),
+                "p95_s": durations[max(0, math.ceil(0.95 * len(durations)) - 1)],
+                "queue_wait_s": sum(s.attrs.get("queue_wait_s", 0) for s in spans),
+                "prompt_tokens": sum(s.attrs.get("prompt_tokens", 0) for s in spans),
+                "completion_tokens": sum(s.attrs.get("completion_tokens", 0) for s in spans),
+                "result_bytes": sum(s.attrs.get("result_bytes", 0) for s in spans),
+                "peak_memory_bytes": max((s.attrs.get("peak_memory_bytes", 0) for s in spans), default=0),
+            })
+        return rows
+
+    def print_summary(self):
+        columns = ["category", "operation", "count", "total_s", "mean_s", "p95_s", "queue_wait_s",
+                   "prompt_tokens", "completion_tokens", "result_bytes", "peak_memory_bytes"]
+        rows = [[f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in self.summary()]
+        widths = [max(len(c), *(len(r[i]) for r in rows)) if rows else len(c) for i, c in enumerate(columns)]
+        print("\nTrace Summary:")
+        print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+        for row in rows:
+            print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+@contextmanager
+def use_tracer(tracer):
+    """
+    Record spans from the enclosed block (and anything it starts) into tracer.
+    """
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+def _default_lane():
+    """
+    Top-level spans are drawn per asyncio task when inside one, else per thread.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task.get_name() if task is not None else threading.current_thread().name
+
+
+@contextmanager
+def span(name, cat, lane=None, **attrs):
+    """
+    Time the enclosed block as a span under the active tracer; a no-op when tracing is off.
+    Spans inherit their lane (the row they are drawn on) from the enclosing span.
+
+    Usage:
+        with span("llm", "llm", model="gpt-4-turbo") as s:
+            response = llm.invoke(prompt)
+            s.set(**token_usage(response))
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield _NULL_SPAN
+        return
+
+    parent = _current_span.get()
+    if lane is None:
+        lane = parent.lane if parent is not None else _default_lane()
+    current = Span(name, cat, lane, attrs)
+    tracer._opened()
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        tracer._closed(current)
+
+
+def tracing_enabled():
+    return _current_tracer.get() is not None
+
+
+def current_span():
+    """
+    The innermost open span, or a no-op stand-in when tracing is off.
+    """
+    return _current_span.get() or _NULL_SPAN
+
+
+def token_usage(message):
+    """
+    Pull prompt/completion token counts off a LangChain chat response, if the provider reported them.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    if usage:
+        return {"prompt_tokens": usage.get("prompt_tokens", 0), "completion_tokens": usage.get("completion_tokens", 0)}
+    return {}
+
+
+def result_size(value):
+    """
+    Approximate size of a result in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return len(repr(value))
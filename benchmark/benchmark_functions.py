@@ -1,13 +1,28 @@
 # benchmark_functions.py
+import os
+import sys
+
 import geopandas
 from geodatasets import get_path
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agents.dataset_cache import get_default_dataset_cache
+
+
+def read_file(path):
+    """
+    geopandas.read_file() through the dataset cache, so repeated runs load the parsed layer
+    instead of parsing it again. Set CITYLLM_DATASET_CACHE=0 to always parse.
+    """
+    return get_default_dataset_cache().load(path, lambda path, columns: geopandas.read_file(path))
+
 def q1_benchmark():
     """
     Load the New York Boroughs dataset (nybb) and return the first 5 rows.
     """
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
     # Instead of printing, return the head() so we can compare later.
     return gdf.head()
 
@@ -16,7 +31,7 @@ def q2_benchmark():
     Calculate the area of each borough in the New York Boroughs dataset (nybb)
     """
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
     # Calculate area (using the geometry's area; note: real area calculations may need proper CRS)
     gdf["area"] = gdf.geometry.area
     return gdf["area"]
@@ -26,7 +41,7 @@ def q3_benchmark():
     Create an interactive map of the New York Boroughs dataset (nybb), color-coded by area.
     """
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
     gdf["area"] = gdf.area  
     map_obj = gdf.explore("area", legend=False)
     return map_obj
@@ -36,7 +51,7 @@ def q4_benchmark():
     Find and plot the convex hull of each borough in the New York Boroughs dataset (nybb).
     """
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
     gdf["convex_hull"] = gdf.geometry.convex_hull
     ax = gdf["convex_hull"].plot(edgecolor="black", facecolor="lightblue", alpha=0.5)
@@ -50,7 +65,7 @@ def q5_benchmark():
     """
 
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
     dissolved_gdf = gdf.dissolve(by="BoroCode")
     ax = dissolved_gdf.plot(edgecolor="black", facecolor="lightgreen", alpha=0.6)
@@ -62,7 +77,7 @@ def q6_benchmark():
     """
 
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
     gdf["centroid"] = gdf.centroid
     gdf["area"] = gdf.area
@@ -76,7 +91,7 @@ def q7_benchmark():
     # 7. Load the New York Boroughs dataset (nybb).Compute the convex hull of all boroughs. Extract the centroid of the convex hull. And plot the original boroughs and overlay the convex hull and centroid.
     """
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)    
+    gdf = read_file(path_to_data)    
 
     convex_hull = gdf.unary_union.convex_hull
     centroid = convex_hull.centroid
@@ -95,7 +110,7 @@ def q8_benchmark():
     #8. Load the New York Boroughs dataset (nybb). Compute the area of each borough. Identify the borough with the largest and smallest area. Return their names as a tuple: (largest_borough, smallest_borough).
     """
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)   
+    gdf = read_file(path_to_data)   
 
     gdf["area"] = gdf.geometry.area
     largest_borough = gdf.loc[gdf["area"].idxmax(), "BoroName"]
@@ -111,7 +126,7 @@ def q9_benchmark():
     from geodatasets import get_path
 
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
     # Compute centroids
     gdf["centroid"] = gdf.geometry.centroid
@@ -140,7 +155,7 @@ def q10_benchmark():
     from geodatasets import get_path
 
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
     # Compute distances between all pairs
     min_distance = float("inf")
@@ -166,7 +181,7 @@ def q11_benchmark():
     from geodatasets import get_path
 
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
     gdf["centroid"] = gdf.centroid
     gdf["convex_hull"] = gdf.convex_hull
@@ -190,7 +205,7 @@ def q12_benchmark():
     from geodatasets import get_path
 
     path_to_data = get_path("nybb")
-    gdf = geopandas.read_file(path_to_data)
+    gdf = read_file(path_to_data)
 
 
     # Compute pairwise Hausdorff distances
@@ -214,7 +229,7 @@ def q13_benchmark():
     from geodatasets import get_path
 
     # Load dataset
-    gdf = gpd.read_file(get_path("nybb"))
+    gdf = read_file(get_path("nybb"))
 
     # Compute boundary geometries
     gdf["boundary"] = gdf.boundary
@@ -240,7 +255,7 @@ def q14_benchmark():
     import itertools
 
     # Load the New York Boroughs dataset (nybb) from the GeoPandas sample data
-    gdf = gpd.read_file(get_path("nybb"))
+    gdf = read_file(get_path("nybb"))
 
     # Initialize variables to store the minimum distance and the corresponding pair of boroughs
     min_distance = float("inf")
@@ -298,7 +313,7 @@ def q15_benchmark():
             return 0
 
     # Load the dataset
-    nybb = gpd.read_file(get_path("nybb"))
+    nybb = read_file(get_path("nybb"))
 
     borough_names = []
     original_counts = []
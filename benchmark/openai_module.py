@@ -1,6 +1,13 @@
 # openai_module.py
+import os
+import sys
 import types
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agents.doc_index import relevant_docs
+from agents.replay import ReplayClient
+
 
 def run_code_capture_output(code_str):
 # Create a fresh namespace
@@ -32,10 +39,15 @@ def run_code_capture_output(code_str):
             raise e
         raise RuntimeError(f"Error during execution: {e}")
 
-def generate_code_for_question(question, client, geo_docs):
+def generate_code_for_question(question, client, geo_docs=None):
     """
     Call the OpenAI API with the provided question, then extract and clean the returned Python code.
+    Without geo_docs, only the reference sections relevant to the question are included.
+    The client goes through record/replay when CITYLLM_REPLAY is set (see agents.replay).
     """
+    client = ReplayClient.wrap(client)
+    if geo_docs is None:
+        geo_docs = relevant_docs(question)
     response = client.chat.completions.create(
         model='gpt-4-turbo',
         messages=[
@@ -66,7 +78,7 @@ def generate_code_for_question(question, client, geo_docs):
     
     return generated_code.strip()
 
-def process_question(question, client, geo_docs):
+def process_question(question, client, geo_docs=None):
     """
     Generate code for a given question using the OpenAI API, execute it, and return its printed output.
     """
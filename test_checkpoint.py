@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from agents import task_executor
+from agents.checkpoint import Checkpoint, is_checkpointable, plan_fingerprints
+
+
+class TestCheckpointResume(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp.name, "trips.csv")
+        with open(self.data_path, "w") as f:
+            f.write("id,fare\n1,2.5\n")
+        self.task_map = {
+            0: {"task_type": "file_io", "id": 0, "dep": [], "args": {"operation": "read", "file_path": self.data_path}},
+            1: {"task_type": "search_web", "id": 1, "dep": [], "args": {"query": "Bike lanes in Boston"}},
+            2: {"task_type": "code_writer", "id": 2, "dep": [0, 1], "args": {"requirements": "Join the fares"}},
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def checkpoint_run(self, path):
+        """Checkpoint every checkpointable task of the plan, as a finished run would."""
+        fingerprints = plan_fingerprints(self.task_map)
+        checkpoint = Checkpoint(path)
+        for task_id, task in self.task_map.items():
+            if is_checkpointable(task):
+                checkpoint.save(fingerprints[task_id], task["task_type"], f"result {task_id}")
+        checkpoint.close()
+
+    def restorable(self, path):
+        fingerprints = plan_fingerprints(self.task_map)
+        checkpoint = Checkpoint(path)
+        try:
+            return {task_id: checkpoint.load(fingerprints[task_id]) for task_id, task in self.task_map.items()
+                    if is_checkpointable(task)}
+        finally:
+            checkpoint.close()
+
+    def test_resume_restores_unchanged_plan(self):
+        path = os.path.join(self.tmp.name, "checkpoints.sqlite")
+        self.checkpoint_run(path)
+        self.assertEqual(self.restorable(path), {1: (True, "result 1"), 2: (True, "result 2")})
+
+    def test_changed_input_invalidates_dependents(self):
+        """Editing a file that is read upstream re-runs the tasks depending on it, but not the others."""
+        path = os.path.join(self.tmp.name, "checkpoints.sqlite")
+        self.checkpoint_run(path)
+        with open(self.data_path, "a") as f:
+            f.write("2,3.75\n")
+        self.assertEqual(self.restorable(path), {1: (True, "result 1"), 2: (False, None)})
+
+    def test_changed_args_invalidate_dependents(self):
+        path = os.path.join(self.tmp.name, "checkpoints.sqlite")
+        self.checkpoint_run(path)
+        self.task_map[1]["args"]["query"] = "Bike lanes in Chicago"
+        self.assertEqual(self.restorable(path), {1: (False, None), 2: (False, None)})
+
+    def test_file_io_is_not_checkpointed(self):
+        self.assertFalse(is_checkpointable(self.task_map[0]))
+        self.assertTrue(is_checkpointable(self.task_map[2]))
+
+
+class TestResumeThroughExecutor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "checkpoints.sqlite")
+        self.task_map = {
+            0: {"task_type": "search_web", "id": 0, "dep": [], "args": {"query": "Bike lanes in Boston"}},
+            1: {"task_type": "llm_extraction", "id": 1, "dep": [0], "args": {"instructions": "List the streets"}},
+            2: {"task_type": "search_web", "id": 2, "dep": [], "args": {"query": "Bike counts in Boston"}},
+            3: {"task_type": "code_writer", "id": 3, "dep": [1, 2], "args": {"requirements": "Join counts to streets"}},
+        }
+        self.calls = []
+        self.inputs = {}
+        self.failing = {1}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_stub(self, state):
+        self.calls.append(state["task_id"])
+        self.inputs[state["task_id"]] = list(state["dep_results"])
+        if state["task_id"] in self.failing:
+            raise RuntimeError("upstream timeout")
+        return f"result {state['task_id']}"
+
+    def execute(self):
+        checkpoint = Checkpoint(self.path)
+        stubs = {task_type: self.run_stub for task_type in ("search_web", "llm_extraction", "code_writer")}
+        try:
+            with mock.patch.dict(task_executor.TASK_FUNCTIONS, stubs):
+                return task_executor.execute_tasks([0, 1, 2, 3], self.task_map, checkpoint=checkpoint)
+        finally:
+            checkpoint.close()
+
+    def test_rerun_only_failed_task_and_dependents(self):
+        """A resumed run restores the tasks that succeeded and reruns the failed one and everything below it."""
+        first = self.execute()
+        self.assertEqual(self.calls, [0, 1, 2])
+        self.assertEqual((first[1], first[3]), (None, None))
+
+        self.failing, self.calls = set(), []
+        second = self.execute()
+        self.assertEqual(self.calls, [1, 3])
+        self.assertEqual(self.inputs[1], ["result 0"])
+        self.assertEqual(self.inputs[3], ["result 1", "result 2"])
+        self.assertEqual(second, {0: "result 0", 1: "result 1", 2: "result 2", 3: "result 3"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from agents import chunked_dataset
+from agents.chunked_dataset import ChunkedDataset
+
+
+class TestChunkedDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.frame = pd.DataFrame({
+            "trip_id": range(25),
+            "fare": [1.5 + i for i in range(25)],
+            "zone": [f"Z{i % 4}" for i in range(25)],
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name):
+        path = os.path.join(self.tmp.name, name)
+        if name.endswith(".csv"):
+            self.frame.to_csv(path, index=False)
+        elif name.endswith(".jsonl"):
+            self.frame.to_json(path, orient="records", lines=True)
+        elif name.endswith(".xlsx"):
+            self.frame.to_excel(path, index=False)
+        elif name.endswith(".parquet"):
+            self.frame.to_parquet(path, index=False, row_group_size=7)
+        elif name.endswith(".feather"):
+            self.frame.to_feather(path)
+        return path
+
+    def test_chunks_cover_file_in_order(self):
+        """Every format yields chunks of batch_size rows (the last shorter) that add up to the file."""
+        names = ["trips.csv", "trips.jsonl", "trips.xlsx"]
+        if chunked_dataset.pa is not None:
+            names += ["trips.parquet", "trips.feather"]
+        for name in names:
+            with self.subTest(name):
+                dataset = ChunkedDataset(self.write(name), batch_size=10)
+                chunks = list(dataset)
+                self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+                combined = pd.concat(chunks, ignore_index=True)
+                self.assertEqual(combined["trip_id"].tolist(), list(range(25)))
+                self.assertAlmostEqual(combined["fare"].sum(), self.frame["fare"].sum())
+
+    def test_reiterable(self):
+        dataset = ChunkedDataset(self.write("trips.csv"), batch_size=10)
+        self.assertEqual(sum(len(chunk) for chunk in dataset), 25)
+        self.assertEqual(sum(len(chunk) for chunk in dataset), 25)
+
+    def test_column_projection(self):
+        for name in ["trips.csv", "trips.jsonl", "trips.xlsx"]:
+            with self.subTest(name):
+                dataset = ChunkedDataset(self.write(name), batch_size=10, columns=["fare"])
+                self.assertEqual([list(chunk.columns) for chunk in dataset], [["fare"]] * 3)
+
+    @unittest.skipIf(chunked_dataset.pa is None, "pyarrow not installed")
+    def test_record_batches_are_resliced(self):
+        """An Arrow file written as one record batch comes back in batches of batch_size rows."""
+        dataset = ChunkedDataset(self.write("trips.feather"), batch_size=6, columns=["trip_id"])
+        batches = list(dataset.iter_batches())
+        self.assertEqual([batch.num_rows for batch in batches], [6, 6, 6, 6, 1])
+        self.assertEqual(batches[0].schema.names, ["trip_id"])
+        self.assertEqual(batches[-1].column(0).to_pylist(), [24])
+
+    def test_load(self):
+        loaded = ChunkedDataset(self.write("trips.csv"), batch_size=10).load()
+        pd.testing.assert_frame_equal(loaded, self.frame)
+
+    def test_stamp_tracks_file_version(self):
+        path = self.write("trips.csv")
+        before = ChunkedDataset(path).stamp
+        with open(path, "a") as f:
+            f.write("25,26.5,Z1\n")
+        self.assertNotEqual(ChunkedDataset(path).stamp, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+
+from agents import llm_gateway
+from agents.content_trimmer import is_boilerplate, passage_scores, trim_results
+from agents.doc_index import DocIndex, tokenize
+
+
+def page(url, raw_content):
+    return {"url": url, "title": url, "raw_content": raw_content}
+
+
+class ContentTrimmerTestCase(unittest.TestCase):
+    def setUp(self):
+        # Count tokens with the character estimate so no tiktoken encoding is downloaded
+        patcher = mock.patch.object(llm_gateway, "count_tokens", llm_gateway.estimate_tokens)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestTokenize(unittest.TestCase):
+    def test_identifiers_contribute_their_parts(self):
+        self.assertEqual(tokenize("sjoin_nearest"), ["sjoin", "nearest", "sjoinnearest"])
+
+    def test_non_latin_text_is_tokenized(self):
+        self.assertEqual(tokenize("Zürich 渋谷駅 Москва"), ["zürich", "渋谷駅", "москва"])
+
+    def test_index_without_tokens_matches_nothing(self):
+        index = DocIndex([{"title": "", "text": "—"}, {"title": "", "text": "..."}])
+        self.assertEqual(index.search("stations"), [])
+
+
+class TestTrimResults(ContentTrimmerTestCase):
+    def test_non_latin_page_is_kept(self):
+        results = [page("a", "東京の駅一覧\n渋谷駅 新宿駅 池袋駅")]
+        self.assertEqual(trim_results(results, "stations in Tokyo"), results)
+
+    def test_non_latin_query_ranks_matching_passages(self):
+        matching, unrelated = passage_scores(["渋谷駅 新宿駅", "Unrelated text"], "渋谷駅")
+        self.assertGreater(matching, 0.0)
+        self.assertEqual(unrelated, 0.0)
+
+    def test_drops_boilerplate_lines(self):
+        trimmed = trim_results([page("a", "Home\nAccept cookies\nShibuya Station opened in 1885.\n© 2024 Example")], "Shibuya")
+        self.assertEqual(trimmed[0]["raw_content"], "Shibuya Station opened in 1885.")
+
+    def test_short_content_lines_are_not_boilerplate(self):
+        self.assertFalse(is_boilerplate("Shinjuku Station"))
+        self.assertTrue(is_boilerplate("Back to top"))
+
+    def test_drops_near_duplicate_pages(self):
+        text = " ".join(f"Line {i} of the Tokyo station list mentions Shibuya and Shinjuku." for i in range(5))
+        trimmed = trim_results([page("a", text), page("b", text)], "Tokyo stations")
+        self.assertEqual(trimmed[0]["raw_content"], text)
+        self.assertEqual(trimmed[1]["raw_content"], "")
+
+    def test_keeps_most_relevant_passages_within_budget(self):
+        relevant = "Bike lanes on Market Street were extended in 2023. " * 10
+        filler = "The weather was mild and the museum opened late on Sunday. " * 10
+        trimmed = trim_results([page("a", filler), page("b", relevant)], "bike lanes", token_budget=200)
+        self.assertEqual(trimmed[0]["raw_content"], "")
+        self.assertEqual(trimmed[1]["raw_content"], " ".join(relevant.split()))
+
+    def test_results_without_content_pass_through(self):
+        results = [{"url": "a", "content": "snippet"}, "not a dict"]
+        self.assertEqual(trim_results(results, "query"), results)
+        self.assertEqual(trim_results("no results", "query"), "no results")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from agents import dataset_cache
+from agents.dataset_cache import DatasetCache
+
+
+@unittest.skipIf(dataset_cache.pa is None, "pyarrow not installed")
+class TestDatasetCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DatasetCache(os.path.join(self.tmp.name, "datasets"))
+        self.path = os.path.join(self.tmp.name, "trips.csv")
+        pd.DataFrame({"trip_id": [1, 2, 3], "fare": [2.5, 3.0, 4.25]}).to_csv(self.path, index=False)
+        self.reads = []
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def reader(self, path, columns):
+        self.reads.append(columns)
+        return pd.read_csv(path, usecols=columns)
+
+    def test_second_load_is_a_hit(self):
+        first = self.cache.load(self.path, self.reader)
+        second = self.cache.load(self.path, self.reader)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(self.reads, [None])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_projection_served_from_full_entry(self):
+        self.cache.load(self.path, self.reader)
+        projected = self.cache.load(self.path, self.reader, columns=["fare"])
+        self.assertEqual(list(projected.columns), ["fare"])
+        self.assertEqual(self.reads, [None])
+
+    def test_unknown_column_keeps_entry(self):
+        self.cache.load(self.path, self.reader)
+        with self.assertRaises(ValueError):
+            self.cache.load(self.path, self.reader, columns=["nope"])
+        self.assertIsNotNone(self.cache.get(self.path))
+        self.assertEqual(self.reads, [None, ["nope"]])
+
+    def test_corrupt_file_is_dropped(self):
+        self.cache.load(self.path, self.reader)
+        arrow_files = [f for f in os.listdir(self.cache.directory) if f.endswith(".arrow")]
+        with open(os.path.join(self.cache.directory, arrow_files[0]), "wb") as f:
+            f.write(b"not arrow")
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(os.listdir(self.cache.directory), ["index.sqlite"])
+        self.cache.load(self.path, self.reader)
+        self.assertEqual(self.reads, [None, None])
+
+    def test_changed_source_is_reparsed(self):
+        """Rewriting the source changes its size and mtime, which invalidates the entry."""
+        self.cache.load(self.path, self.reader)
+        with open(self.path, "a") as f:
+            f.write("4,5.5\n")
+        reloaded = self.cache.load(self.path, self.reader)
+        self.assertEqual(len(reloaded), 4)
+        self.assertEqual(self.reads, [None, None])
+        self.assertEqual(len(os.listdir(self.cache.directory)), 2)  # index.sqlite and one .arrow file
+
+    def test_evicts_least_recently_used(self):
+        paths = []
+        for name in ["a.csv", "b.csv", "c.csv"]:
+            path = os.path.join(self.tmp.name, name)
+            pd.DataFrame({"value": range(100)}).to_csv(path, index=False)
+            paths.append(path)
+        self.cache.load(paths[0], self.reader)
+        entry_size = sum(os.path.getsize(os.path.join(self.cache.directory, f))
+                         for f in os.listdir(self.cache.directory) if f.endswith(".arrow"))
+        self.cache.max_bytes = 2 * entry_size
+        self.cache.load(paths[1], self.reader)
+        self.cache.load(paths[0], self.reader)  # a.csv is now more recent than b.csv
+        self.cache.load(paths[2], self.reader)
+        self.assertIsNotNone(self.cache.get(paths[0]))
+        self.assertIsNone(self.cache.get(paths[1]))
+        self.assertIsNotNone(self.cache.get(paths[2]))
+
+    def test_disabled_cache_always_parses(self):
+        cache = DatasetCache(enabled=False)
+        cache.load(self.path, self.reader)
+        cache.load(self.path, self.reader)
+        self.assertEqual(len(self.reads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from agents import file_io_agent
+from agents.file_io_agent import parse_file, read_arrow_ipc, read_parquet, read_vector
+
+try:
+    import geopandas
+    from shapely.geometry import Point
+except ImportError:
+    geopandas = None
+
+
+STOPS = pd.DataFrame({"stop_id": [1, 2, 3], "name": ["Market", "Mission", "Valencia"], "riders": [120, 80, 45]})
+
+
+class FileReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def geo_stops(self):
+        return geopandas.GeoDataFrame(STOPS, geometry=[Point(0, 0), Point(1, 1), Point(2, 2)], crs="EPSG:4326")
+
+
+class TestParseCsv(FileReaderTestCase):
+    def test_projection_keeps_default_dtypes(self):
+        path = self.path("trips.csv")
+        pd.DataFrame({"trip_id": [1, 2], "date": ["2024-01-01", "2024-01-02"], "fare": [2.5, 3.0]}).to_csv(path, index=False)
+        df = parse_file(path, ["trip_id", "date"])
+        self.assertEqual(list(df.columns), ["trip_id", "date"])
+        self.assertEqual(df["date"].tolist(), ["2024-01-01", "2024-01-02"])
+
+    def test_unknown_column_is_reported(self):
+        path = self.path("trips.csv")
+        STOPS.to_csv(path, index=False)
+        result = parse_file(path, ["nope"])
+        self.assertIn("Usecols do not match columns", result["file_results"])
+
+
+@unittest.skipIf(file_io_agent.pa is None, "pyarrow not installed")
+class TestColumnarReaders(FileReaderTestCase):
+    def test_read_parquet_projection(self):
+        path = self.path("stops.parquet")
+        STOPS.to_parquet(path)
+        pd.testing.assert_frame_equal(read_parquet(path, ["name", "riders"]), STOPS[["name", "riders"]])
+
+    def test_read_arrow_ipc_projection(self):
+        path = self.path("stops.feather")
+        STOPS.to_feather(path)
+        pd.testing.assert_frame_equal(read_arrow_ipc(path, ["riders"]), STOPS[["riders"]])
+        pd.testing.assert_frame_equal(read_arrow_ipc(path), STOPS)
+
+    @unittest.skipIf(geopandas is None, "geopandas not installed")
+    def test_geoparquet_projection_keeps_geometry(self):
+        path = self.path("stops.parquet")
+        self.geo_stops().to_parquet(path)
+        gdf = read_parquet(path, ["name"])
+        self.assertIsInstance(gdf, geopandas.GeoDataFrame)
+        self.assertEqual(list(gdf.columns), ["name", "geometry"])
+        self.assertEqual(gdf.crs.to_epsg(), 4326)
+
+    @unittest.skipIf(geopandas is None, "geopandas not installed")
+    def test_geo_arrow_ipc_projection_keeps_geometry(self):
+        path = self.path("stops.arrow")
+        self.geo_stops().to_feather(path)
+        gdf = read_arrow_ipc(path, ["riders"])
+        self.assertIsInstance(gdf, geopandas.GeoDataFrame)
+        self.assertEqual(list(gdf.columns), ["riders", "geometry"])
+
+
+@unittest.skipIf(geopandas is None, "geopandas not installed")
+class TestReadVector(FileReaderTestCase):
+    def test_projection_keeps_geometry(self):
+        path = self.path("stops.geojson")
+        self.geo_stops().to_file(path, driver="GeoJSON")
+        gdf = read_vector(path, ["name"])
+        self.assertEqual(list(gdf.columns), ["name", "geometry"])
+        self.assertEqual(gdf["name"].tolist(), STOPS["name"].tolist())
+
+    def test_reads_every_column_by_default(self):
+        path = self.path("stops.gpkg")
+        self.geo_stops().to_file(path, driver="GPKG")
+        gdf = read_vector(path)
+        self.assertEqual(list(gdf.columns), ["stop_id", "name", "riders", "geometry"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.llm_cache import LLMCache, prompt_key
+
+
+class TestLLMCacheCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = LLMCache(path=os.path.join(self.tmp.name, "llm_cache.sqlite"))
+        self.key = prompt_key("test-model", {}, "Summarize the report")
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_threads_share_one_upstream_call(self):
+        """Callers arriving while the first request is in flight wait for it instead of calling upstream."""
+        callers = 4
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "summary"
+
+        with ThreadPoolExecutor(callers) as pool:
+            leader = pool.submit(self.cache.get_or_compute, self.key, "test-model", compute)
+            started.wait(5)
+            followers = [pool.submit(self.cache.get_or_compute, self.key, "test-model", compute) for _ in range(callers - 1)]
+            while self.cache.coalesced < callers - 1:
+                time.sleep(0.01)
+            release.set()
+            statuses = [leader.result()] + [f.result() for f in followers]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(statuses, [("summary", "miss")] + [("summary", "coalesced")] * (callers - 1))
+        self.assertEqual(self.cache.get_or_compute(self.key, "test-model", compute), ("summary", "hit"))
+
+    def test_tasks_share_one_upstream_call(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "summary"
+
+        async def run():
+            return await asyncio.gather(*(self.cache.aget_or_compute(self.key, "test-model", compute) for _ in range(3)))
+
+        statuses = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(status for _, status in statuses), ["coalesced", "coalesced", "miss"])
+        self.assertEqual((self.cache.misses, self.cache.coalesced), (1, 2))
+
+    def test_failure_reaches_waiters_and_is_not_cached(self):
+        async def compute():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("rate limited")
+
+        async def run():
+            return await asyncio.gather(
+                *(self.cache.aget_or_compute(self.key, "test-model", compute) for _ in range(2)), return_exceptions=True
+            )
+
+        outcomes = asyncio.run(run())
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+        self.assertIsNone(self.cache.get(self.key))
+
+
+if __name__ == "__main__":
+    unittest.main()
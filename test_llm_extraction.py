@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from agents import llm_extraction_agent, llm_gateway
+from agents.llm_extraction_agent import llm_extraction, allm_extraction, map_reduce_extraction, split_into_chunks
+from workflow.state import TaskState
+
+
+def count_words(text, model=None):
+    return len(str(text).split())
+
+
+class StubLLM:
+    """Answers map prompts with the part number and reduce prompts with the partials they merge."""
+
+    def __init__(self):
+        self.prompts = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def answer(self, prompt, agent):
+        self.prompts.append((agent, prompt))
+        if agent == "llm_extraction.map":
+            return prompt.split("this is part ")[1].split(".")[0]
+        if agent == "llm_extraction.reduce":
+            return "merged " + ",".join(line.split()[3] for line in prompt.splitlines() if line.startswith("--- Partial"))
+        return "direct"
+
+    def invoke(self, prompt, agent=None, on_token=None, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            return self.answer(prompt, agent)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    async def ainvoke(self, prompt, agent=None, on_token=None, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return self.answer(prompt, agent)
+
+
+class TestSplitIntoChunks(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(llm_gateway, "count_tokens", count_words)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_chunks_break_on_lines_and_rejoin(self):
+        text = "".join(f"stop {i} near main street\n" for i in range(20))  # 5 words per line
+        chunks = split_into_chunks(text, 12)
+        self.assertEqual("".join(chunks), text)
+        self.assertTrue(all(count_words(chunk) <= 12 for chunk in chunks))
+        self.assertTrue(all(chunk.endswith("\n") for chunk in chunks))
+        self.assertEqual(len(chunks), 10)
+
+    def test_oversized_line_is_cut(self):
+        text = " ".join(f"w{i}" for i in range(100))
+        chunks = split_into_chunks(text, 30)
+        self.assertEqual("".join(chunks), text)
+        self.assertGreater(len(chunks), 3)
+
+    def test_empty_text(self):
+        self.assertEqual(split_into_chunks("", 10), [])
+
+
+class TestMapReduceExtraction(unittest.TestCase):
+    def setUp(self):
+        self.llm = StubLLM()
+        self.patches = [
+            mock.patch.object(llm_gateway, "count_tokens", count_words),
+            mock.patch.object(llm_gateway, "invoke", self.llm.invoke),
+            mock.patch.object(llm_gateway, "ainvoke", self.llm.ainvoke),
+            mock.patch.object(llm_extraction_agent, "MAX_PROMPT_TOKENS", 50),
+        ]
+        for patch in self.patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.rows = "".join(f"station {i} on red line\n" for i in range(30))
+
+    def agents(self):
+        return [agent for agent, _ in self.llm.prompts]
+
+    def test_every_chunk_is_mapped_then_reduced_in_order(self):
+        with mock.patch.object(llm_extraction_agent, "MAX_PROMPT_TOKENS", 1000):
+            result = map_reduce_extraction("List the stations", self.rows, 25, 3)
+        self.assertEqual(self.agents(), ["llm_extraction.map"] * 6 + ["llm_extraction.reduce"])
+        self.assertEqual(result, "merged 1,2,3,4,5,6")
+        self.assertLessEqual(self.llm.max_running, 3)
+
+    def test_long_reduce_prompt_is_reduced_in_rounds(self):
+        """Partials that don't fit one reduce prompt go through another map round first."""
+        map_reduce_extraction("List the stations", self.rows, 25, 3)
+        self.assertEqual(self.agents(), ["llm_extraction.map"] * 7 + ["llm_extraction.reduce"])
+
+    def test_small_input_is_one_call(self):
+        state = TaskState(task_id=0, task_type="llm_extraction", task_args={"instructions": "List"}, messages=[], dep_results=["a b"])
+        self.assertEqual(llm_extraction(state), "direct")
+        self.assertEqual(self.agents(), ["llm_extraction"])
+
+    def test_large_input_uses_task_chunk_settings(self):
+        state = TaskState(
+            task_id=0, task_type="llm_extraction", messages=[], dep_results=[self.rows],
+            task_args={"instructions": "List", "chunk_tokens": 40, "max_concurrency": 2},
+        )
+        llm_extraction(state)
+        map_prompts = [prompt for agent, prompt in self.llm.prompts if agent == "llm_extraction.map"]
+        self.assertEqual(len(map_prompts), 4)
+        self.assertLessEqual(self.llm.max_running, 2)
+
+    def test_async_matches_sync(self):
+        state = TaskState(
+            task_id=0, task_type="llm_extraction", messages=[], dep_results=[self.rows],
+            task_args={"instructions": "List", "chunk_tokens": 25, "max_concurrency": 2},
+        )
+        expected = llm_extraction(state)
+        self.llm.max_running = 0
+        self.assertEqual(asyncio.run(allm_extraction(state)), expected)
+        self.assertEqual(self.llm.max_running, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from agents import llm_gateway, replay
+from agents.llm_cache import LLMCache
+
+
+class StubAsyncLLM:
+    """Async chat client that answers every prompt without touching the network."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        return AIMessage(content=f"answer to {prompt}", usage_metadata={"input_tokens": 5, "output_tokens": 3, "total_tokens": 8})
+
+    async def astream(self, prompt):
+        self.calls += 1
+        for piece in ["answer ", "to ", prompt]:
+            yield AIMessageChunk(content=piece)
+
+
+class StubbedLLMTestCase(unittest.TestCase):
+    def setUp(self):
+        """Route ainvoke() to a stub client and a throwaway cache."""
+        replay.configure(mode="off")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = LLMCache(path=f"{self.tmp.name}/llm_cache.sqlite")
+        self.llm = StubAsyncLLM()
+        self.patches = [
+            mock.patch.object(llm_gateway, "get_async_llm", lambda model, **params: self.llm),
+            mock.patch.object(llm_gateway, "get_default_cache", lambda: self.cache),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.cache.close()
+        self.tmp.cleanup()
+
+
+class TestAsyncInvoke(StubbedLLMTestCase):
+    def test_returns_text_and_caches_it(self):
+        """Uncached and cached calls both return the completion text."""
+        first = asyncio.run(llm_gateway.ainvoke("hello", agent="test"))
+        second = asyncio.run(llm_gateway.ainvoke("hello", agent="test"))
+        self.assertEqual(first, "answer to hello")
+        self.assertEqual(second, "answer to hello")
+        self.assertEqual(self.llm.calls, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_uncached_call(self):
+        self.assertEqual(asyncio.run(llm_gateway.ainvoke("hi", use_cache=False)), "answer to hi")
+
+    def test_streaming(self):
+        """Streamed pieces reach on_token and the joined text is returned."""
+        pieces = []
+        content = asyncio.run(llm_gateway.ainvoke("stream", on_token=pieces.append))
+        self.assertEqual(content, "answer to stream")
+        self.assertEqual("".join(pieces), content)
+
+
+class TestReplayBypassesCache(StubbedLLMTestCase):
+    def setUp(self):
+        """Keep cassettes and replay settings for this test only."""
+        super().setUp()
+        for patch in [mock.patch.dict(replay._settings), mock.patch.dict(replay._cassettes, clear=True)]:
+            patch.start()
+            self.patches.append(patch)
+        replay.configure(cassette_dir=f"{self.tmp.name}/cassettes", latency="fixed:0.05")
+
+    def test_record_reaches_cassette_for_cached_prompt(self):
+        asyncio.run(llm_gateway.ainvoke("hello"))
+        replay.configure(mode="record")
+        self.assertEqual(asyncio.run(llm_gateway.ainvoke("hello")), "answer to hello")
+        self.assertEqual(self.llm.calls, 2)
+        self.assertEqual(len(replay.get_cassette("llm")), 1)
+
+    def test_replay_applies_latency_for_cached_prompt(self):
+        replay.configure(mode="record")
+        asyncio.run(llm_gateway.ainvoke("hello"))
+        replay.configure(mode="off")
+        asyncio.run(llm_gateway.ainvoke("hello"))  # now also in the response cache
+        replay.configure(mode="replay")
+        started = time.perf_counter()
+        self.assertEqual(asyncio.run(llm_gateway.ainvoke("hello")), "answer to hello")
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.llm.calls, 2)
+
+
+class TestCountTokens(unittest.TestCase):
+    def test_offline_fallback(self):
+        """An encoding that can't be downloaded falls back to the character estimate."""
+        if llm_gateway.tiktoken is None:
+            self.skipTest("tiktoken not installed")
+        failing = mock.Mock(side_effect=OSError("offline"))
+        with mock.patch.object(llm_gateway.tiktoken, "encoding_for_model", failing), \
+                mock.patch.object(llm_gateway.tiktoken, "get_encoding", failing), \
+                mock.patch.dict(llm_gateway._encodings, clear=True):
+            self.assertEqual(llm_gateway.count_tokens("x" * 40, "offline-model"), llm_gateway.estimate_tokens("x" * 40))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from agents.local_index import LocalIndex, build_index, main
+
+
+DOCUMENTS = {
+    "gtfs/stops.md": "# GTFS stops\n\nThe stops file lists every transit stop with its latitude and longitude.\n",
+    "gtfs/routes.md": "# GTFS routes\n\nRoutes group trips shown to riders as a single bus or subway line.\n",
+    "catalog/parks.html": "<html><head><title>Parks inventory</title><style>p {}</style></head>"
+                          "<body><p>Acreage of every park and playground.</p></body></html>",
+    "notes/ignored.py": "print('not indexed')\n",
+}
+
+
+class TestLocalIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.corpus = os.path.join(self.tmp.name, "corpus")
+        for name, text in DOCUMENTS.items():
+            path = os.path.join(self.corpus, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        self.index_path = os.path.join(self.tmp.name, "local_index.bin")
+        self.count = build_index(self.corpus, self.index_path)
+        self.index = LocalIndex(self.index_path)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_indexes_text_files_only(self):
+        self.assertEqual(self.count, 3)
+        self.assertEqual(self.index.doc_count, 3)
+        self.assertEqual(self.index.postings("print"), [])
+
+    def test_search_ranks_matching_document_first(self):
+        hits = self.index.search("transit stop latitude")
+        self.assertEqual(self.index.document(hits[0][1])["path"], os.path.join("gtfs", "stops.md"))
+        self.assertEqual(hits, sorted(hits, reverse=True))
+        self.assertEqual(self.index.search("nonexistent words"), [])
+
+    def test_document_metadata(self):
+        """HTML titles are extracted and markup (including style blocks) is stripped from the text."""
+        _, doc_id = self.index.search("playground")[0]
+        doc = self.index.document(doc_id)
+        self.assertEqual(doc["title"], "Parks inventory")
+        self.assertTrue(doc["url"].startswith("file://"))
+        self.assertNotIn("<p>", doc["text"])
+        self.assertNotIn("p {}", doc["text"])
+
+    def test_postings_term_frequencies(self):
+        """Titles are weighted double on top of their occurrence in the text, so "gtfs" counts 3 times."""
+        postings = self.index.postings("gtfs")
+        self.assertEqual(len(postings), 2)
+        self.assertTrue(all(freq == 3 for _, freq in postings))
+
+    def test_cli(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["search", "subway line", "--index", self.index_path, "-k", "1"])
+        self.assertIn("GTFS routes", output.getvalue())
+        self.assertIn("1 results", output.getvalue())
+
+    def test_rejects_other_files(self):
+        other = os.path.join(self.tmp.name, "other.bin")
+        with open(other, "wb") as f:
+            f.write(b"\0" * 128)
+        with self.assertRaises(ValueError):
+            LocalIndex(other)
+
+
+if __name__ == "__main__":
+    unittest.main()
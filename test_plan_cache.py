@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from agents.plan_cache import PlanCache, extract_slots
+
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PlanCache(path=os.path.join(self.tmp.name, "plan_cache.json"))
+        self.plan = {"tasks": [{
+            "task_type": "search_web", "id": 0, "dep": [],
+            "args": {"query": "Subway stations in Boston", "instructions": "Extract station names."},
+        }]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tool_names_are_not_places(self):
+        _, slots = extract_slots("Use Python and GeoPandas to map subway stations in San Francisco as GeoJSON")
+        self.assertEqual(slots, [("place", "San Francisco")])
+
+    def test_rebinds_changed_place(self):
+        self.cache.add("List the subway stations in Boston", self.plan)
+        plan = self.cache.lookup("List the subway stations in Chicago")
+        self.assertEqual(plan["tasks"][0]["args"]["query"], "Subway stations in Chicago")
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_miss_when_plan_lacks_old_value(self):
+        """A changed slot the cached plan never mentions can't be re-bound, so the lookup misses."""
+        self.plan["tasks"][0]["args"]["query"] = "Subway stations"
+        self.cache.add("List the subway stations in Boston", self.plan)
+        self.assertIsNone(self.cache.lookup("List the subway stations in Chicago"))
+        self.assertEqual(self.cache.hits, 0)
+
+
+class TestPlanCacheMatching(unittest.TestCase):
+    REQUEST = ("Search for public transport stops in San Francisco, use a Python script to compute a 500-meter "
+               "buffer around each stop using GeoPandas, and save the resulting accessibility zones as a GeoJSON file.")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "plan_cache.json")
+        self.cache = PlanCache(path=self.path)
+        self.cache.add(self.REQUEST, {"tasks": [
+            {"task_type": "search_web", "id": 0, "dep": [], "args": {"query": "Public transport stops in San Francisco"}},
+            {"task_type": "code_writer", "id": 1, "dep": [0], "args": {
+                "requirements": "Buffer each stop by 500 meters and save the zones as GeoJSON",
+                "output_files": ["output/accessibility_zones.geojson"],
+            }},
+        ]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_parameters_differ(self):
+        plan = self.cache.lookup(self.REQUEST.replace("San Francisco", "Oakland").replace("500", "300"))
+        self.assertEqual(plan["tasks"][0]["args"]["query"], "Public transport stops in Oakland")
+        self.assertEqual(plan["tasks"][1]["args"]["requirements"], "Buffer each stop by 300 meters and save the zones as GeoJSON")
+
+    def test_case_and_punctuation_are_ignored(self):
+        self.assertIsNotNone(self.cache.lookup("  search" + self.REQUEST[6:].replace(", ", " ;  ").rstrip(".")))
+
+    def test_different_entity_misses(self):
+        self.assertIsNone(self.cache.lookup(self.REQUEST.replace("public transport stops", "schools")))
+
+    def test_different_output_format_misses(self):
+        self.assertIsNone(self.cache.lookup(self.REQUEST.replace("GeoJSON file", "CSV file")))
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_persisted_across_instances(self):
+        self.assertIsNotNone(PlanCache(path=self.path).lookup(self.REQUEST))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from agents.plan_optimizer import PlanError, is_placeholder_content, optimize_plan
+
+
+class TestPlanOptimizer(unittest.TestCase):
+    def setUp(self):
+        """Set up a plan with the waste the router typically produces."""
+        self.plan = {
+            "tasks": [
+                {"task_type": "file_io", "id": 0, "dep": [], "args": {"operation": "read", "file_path": "data/stops.csv"}},
+                {"task_type": "file_io", "id": 1, "dep": [], "args": {"operation": "read", "file_path": "./data/stops.csv"}},
+                {"task_type": "file_io", "id": 2, "dep": [], "args": {"operation": "read", "file_path": "data/unused.csv"}},
+                {"task_type": "search_web", "id": 3, "dep": [], "args": {"query": "Transit stations in Cambridge", "instructions": "Extract names"}},
+                {"task_type": "search_web", "id": 4, "dep": [], "args": {"query": "transit  stations in cambridge", "instructions": "extract names"}},
+                {"task_type": "code_writer", "id": 5, "dep": [0, 1, 3, 4, 9], "args": {"language": "python", "requirements": "Map the stops"}},
+                {"task_type": "file_io", "id": 6, "dep": [5], "args": {"operation": "write", "file_path": "output/map.py", "content": "Results from Task 5"}},
+            ]
+        }
+
+    def test_optimize_plan(self):
+        """Duplicates are merged, dead reads pruned, deps rewritten and placeholder content dropped."""
+        optimized, report = optimize_plan(self.plan)
+        tasks = {task["id"]: task for task in optimized["tasks"]}
+
+        self.assertEqual(sorted(tasks), [0, 3, 5, 6])
+        self.assertEqual(tasks[5]["dep"], [0, 3])
+        self.assertNotIn("content", tasks[6]["args"])
+        actions = sorted((entry["action"], entry["task"]) for entry in report)
+        self.assertEqual(actions, [("dropped_dep", 5), ("merged", 1), ("merged", 4), ("placeholder_content", 6), ("pruned", 2)])
+
+        # The router's plan is left untouched
+        self.assertEqual(len(self.plan["tasks"]), 7)
+
+    def test_invalid_plans(self):
+        """Duplicate ids and dependency cycles are rejected."""
+        with self.assertRaises(PlanError):
+            optimize_plan({"tasks": [{"task_type": "file_io", "id": 0, "dep": []}, {"task_type": "file_io", "id": 0, "dep": []}]})
+        with self.assertRaises(PlanError):
+            optimize_plan({"tasks": [{"task_type": "code_writer", "id": 0, "dep": [1]}, {"task_type": "code_writer", "id": 1, "dep": [0]}]})
+
+    def test_placeholder_content(self):
+        self.assertTrue(is_placeholder_content("Results from Task 3"))
+        self.assertTrue(is_placeholder_content("output of step 2."))
+        self.assertFalse(is_placeholder_content("station,lat,lon\nA,1,2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import unittest
+
+from agents.plan_parser import IncrementalPlanParser
+from agents.streaming import FenceFilter
+
+
+PLAN = [
+    {"task_type": "file_io", "id": 0, "dep": [], "args": {"operation": "read", "file_path": "data/parks.geojson"}},
+    {"task_type": "code_writer", "id": 1, "dep": [0], "args": {"requirements": "Escape \"quotes\", {braces} and [brackets]"}},
+]
+RESPONSE = "```json\n" + json.dumps(PLAN, indent=4) + "\n```"
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIncrementalPlanParser(unittest.TestCase):
+    def test_tasks_arrive_as_they_close(self):
+        """Each task is returned by the feed() call that delivers its closing brace, whatever the chunking."""
+        for size in (1, 3, 17, len(RESPONSE)):
+            parser = IncrementalPlanParser()
+            tasks = []
+            for text in chunks(RESPONSE, size):
+                tasks.extend(parser.feed(text))
+            self.assertEqual(tasks, PLAN, f"chunk size {size}")
+            self.assertTrue(parser.done)
+
+    def test_first_task_before_list_ends(self):
+        parser = IncrementalPlanParser()
+        first_end = RESPONSE.index("}\n    },") + len("}\n    }")
+        self.assertEqual(parser.feed(RESPONSE[:first_end]), PLAN[:1])
+        self.assertFalse(parser.done)
+        self.assertEqual(parser.feed(RESPONSE[first_end:]), PLAN[1:])
+
+    def test_ignores_text_after_list(self):
+        parser = IncrementalPlanParser()
+        self.assertEqual(parser.feed('[{"id": 0}] trailing {"id": 1}'), [{"id": 0}])
+        self.assertEqual(parser.feed('{"id": 2}'), [])
+
+    def test_skips_malformed_objects(self):
+        parser = IncrementalPlanParser()
+        self.assertEqual(parser.feed('[{"id": 0,}, {"id": 1}]'), [{"id": 1}])
+
+
+class TestFenceFilter(unittest.TestCase):
+    def filtered(self, text, size):
+        received = []
+        fence_filter = FenceFilter(received.append, "```json")
+        for piece in chunks(text, size):
+            fence_filter(piece)
+        return "".join(received)
+
+    def test_strips_fences(self):
+        for size in (1, 2, 5, len(RESPONSE)):
+            self.assertEqual(self.filtered(RESPONSE, size), json.dumps(PLAN, indent=4), f"chunk size {size}")
+
+    def test_unfenced_text_passes_through(self):
+        self.assertEqual(self.filtered('[{"id": 0}]', 1), '[{"id": 0}]')
+
+    def test_holds_back_possible_closing_fence(self):
+        received = []
+        fence_filter = FenceFilter(received.append, "```json")
+        fence_filter("```json\n[1, 2]\n``")
+        self.assertEqual(received, ["[1, 2]"])
+        fence_filter("`")
+        self.assertEqual(received, ["[1, 2]"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import unittest
+
+import pandas as pd
+
+from agents.result_store import ResultStore, SpilledFrame
+
+
+class TestResultStore(unittest.TestCase):
+    def test_frees_intermediates_once_all_consumers_finish(self):
+        # 0 feeds 1 and 2; 1 and 2 feed 3; 3 is the plan's output
+        graph = {0: [1, 2], 1: [3], 2: [3], 3: []}
+        with ResultStore(graph) as store:
+            store[0] = "stations"
+            store[1] = "buffers"
+            store.release_dependencies({"id": 1, "dep": [0]})
+            self.assertIn(0, store)
+            store[2] = "counts"
+            store.release_dependencies({"id": 2, "dep": [0]})
+            self.assertNotIn(0, store)
+            store[3] = "report"
+            store.release_dependencies({"id": 3, "dep": [1, 2]})
+            self.assertEqual(store.items(), [(3, "report")])
+
+    def test_small_frames_stay_in_memory(self):
+        frame = pd.DataFrame({"stop_id": [1, 2]})
+        with ResultStore({0: []}) as store:
+            store[0] = frame
+            self.assertIs(store[0], frame)
+
+    def test_spilled_frame_round_trips(self):
+        frame = pd.DataFrame({"stop_id": range(1000), "name": [f"Stop {i}" for i in range(1000)], "lat": 42.0})
+        with ResultStore({0: [1], 1: []}, spill_threshold=1024) as store:
+            store[0] = frame
+            spilled = store[0]
+            self.assertIsInstance(spilled, SpilledFrame)
+            self.assertTrue(os.path.exists(spilled.path))
+            self.assertEqual(spilled.shape, frame.shape)
+            pd.testing.assert_frame_equal(spilled.load(), frame)
+            pd.testing.assert_frame_equal(spilled.load(columns=["name"]), frame[["name"]])
+
+            store.release_dependencies({"id": 1, "dep": [0]})
+            self.assertFalse(os.path.exists(spilled.path))
+            with self.assertRaises(FileNotFoundError):
+                spilled.load()
+            spill_dir = store.spill_dir
+        self.assertFalse(os.path.exists(spill_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from agents import search_agent
+from agents.search_agent import afan_out_search, fan_out_search, merge_search_results
+
+
+def page(url, raw_content=None):
+    return {"url": url, "title": url, "raw_content": raw_content}
+
+
+class TestMergeSearchResults(unittest.TestCase):
+    def test_pages_found_by_several_queries_rank_first(self):
+        merged = merge_search_results([
+            [page("a"), page("b"), page("c")],
+            [page("c"), page("d")],
+            [page("e"), page("c"), page("b")],
+        ])
+        self.assertEqual([result["url"] for result in merged], ["c", "b", "a", "e", "d"])
+
+    def test_duplicates_keep_the_copy_with_most_content(self):
+        merged = merge_search_results([[page("a", "short")], [page("a", "the full page text")], [page("a")]])
+        self.assertEqual(merged, [page("a", "the full page text")])
+
+    def test_results_without_url_are_kept_last(self):
+        merged = merge_search_results([[{"content": "no url"}, page("a")], "not a list"])
+        self.assertEqual(merged, [page("a"), {"content": "no url"}])
+
+    def test_caps_merged_results(self):
+        merged = merge_search_results([[page(f"q{q}-{i}") for i in range(8)] for q in range(3)])
+        self.assertEqual(len(merged), search_agent.MAX_MERGED_RESULTS)
+
+
+class TestFanOutSearch(unittest.TestCase):
+    RESULTS = {"bike lanes": [page("a"), page("b")], "cycle tracks": [page("b"), page("c")]}
+
+    def search(self, query, backend=None):
+        if query not in self.RESULTS:
+            raise RuntimeError(f"no results for {query}")
+        return self.RESULTS[query]
+
+    async def asearch(self, query, backend=None):
+        return self.search(query, backend)
+
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(search_agent, "run_search", self.search),
+            mock.patch.object(search_agent, "arun_search", self.asearch),
+        ]
+        for patch in self.patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_merges_queries(self):
+        merged = fan_out_search(["bike lanes", "cycle tracks"])
+        self.assertEqual([result["url"] for result in merged], ["b", "a", "c"])
+        self.assertEqual(asyncio.run(afan_out_search(["bike lanes", "cycle tracks"])), merged)
+
+    def test_failed_query_is_skipped(self):
+        merged = fan_out_search(["bike lanes", "unknown"])
+        self.assertEqual([result["url"] for result in merged], ["a", "b"])
+        self.assertEqual(asyncio.run(afan_out_search(["bike lanes", "unknown"])), merged)
+
+    def test_all_queries_failing_raises(self):
+        with self.assertRaises(RuntimeError):
+            fan_out_search(["unknown", "missing"])
+        with self.assertRaises(RuntimeError):
+            asyncio.run(afan_out_search(["unknown", "missing"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from agents.search_cache import SearchCache
+
+
+OPTIONS = {"max_results": 5, "include_raw_content": True}
+
+
+class TestSearchCachePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SearchCache(path=os.path.join(self.tmp.name, "search_cache.sqlite"), ttl=60)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_query_variants_share_an_entry(self):
+        results = [{"url": "https://example.org/parks", "content": "Parks", "raw_content": "All parks"}]
+        self.cache.put("Parks in Boston", OPTIONS, results)
+        self.assertEqual(self.cache.get("  parks   in BOSTON ", OPTIONS), results)
+        self.assertIsNone(self.cache.get("Parks in Boston", {"max_results": 10}))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_overlapping_queries_share_pages(self):
+        """A later result for a known URL without raw content gets the stored page content."""
+        self.cache.put("Parks in Boston", OPTIONS, [
+            {"url": "https://example.org/parks", "content": "Parks", "raw_content": "All parks"},
+        ])
+        merged = self.cache.put("Boston green space", OPTIONS, [
+            {"url": "https://example.org/parks", "content": "Parks", "raw_content": None},
+            {"url": "https://example.org/commons", "content": "Commons", "raw_content": "The Common"},
+            {"url": "https://example.org/parks", "content": "Duplicate"},
+        ])
+        self.assertEqual([r["url"] for r in merged], ["https://example.org/parks", "https://example.org/commons"])
+        self.assertEqual(merged[0]["raw_content"], "All parks")
+        self.assertEqual(self.cache.pages_reused, 1)
+        self.assertEqual(self.cache.page("https://example.org/commons")["raw_content"], "The Common")
+        self.assertEqual(self.cache.get("Boston green space", OPTIONS), merged)
+
+    def test_expired_pages_miss(self):
+        self.cache.put("Parks in Boston", OPTIONS, [{"url": "https://example.org/parks", "content": "Parks"}])
+        with mock.patch("agents.search_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(self.cache.page("https://example.org/parks"))
+            self.assertIsNone(self.cache.get("Parks in Boston", OPTIONS))
+
+    def test_results_without_urls_are_not_indexed(self):
+        results = [{"content": "No URL"}]
+        self.assertEqual(self.cache.put("Parks in Boston", OPTIONS, results), results)
+        self.assertIsNone(self.cache.get("Parks in Boston", OPTIONS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from agents.task_cache import TaskCache, cache_key, is_cacheable
+
+
+class TestTaskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        self.clock = mock.patch("agents.task_cache.time.time", lambda: self.now)
+        self.clock.start()
+
+    def tearDown(self):
+        self.clock.stop()
+        self.tmp.cleanup()
+
+    def cache(self, **kwargs):
+        cache = TaskCache(path=os.path.join(self.tmp.name, "task_cache.sqlite"), **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = self.cache(ttls={"search_web": 60})
+        cache.put("key", "search_web", {"search_results": ["stop"]})
+        self.now += 59
+        self.assertEqual(cache.get("key", "search_web"), (True, {"search_results": ["stop"]}))
+        self.now += 2
+        self.assertEqual(cache.get("key", "search_web"), (False, None))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        value = "x" * 1000
+        cache = self.cache(max_bytes=2 * len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        for key in ("a", "b"):
+            cache.put(key, "code_writer", value)
+            self.now += 1
+        cache.get("a", "code_writer")  # "b" is now the least recently used
+        self.now += 1
+        cache.put("c", "code_writer", value)
+        self.assertTrue(cache.get("a", "code_writer")[0])
+        self.assertFalse(cache.get("b", "code_writer")[0])
+        self.assertTrue(cache.get("c", "code_writer")[0])
+
+    def test_oversized_results_are_skipped(self):
+        cache = self.cache(max_bytes=100)
+        cache.put("key", "code_writer", "x" * 1000)
+        self.assertEqual(cache.get("key", "code_writer"), (False, None))
+
+    def test_keys_ignore_cosmetic_differences(self):
+        task = {"task_type": "search_web", "args": {"query": "Bike  lanes\nin Boston", "focus_area": "transport"}}
+        reordered = {"task_type": "search_web", "args": {"focus_area": "transport", "query": "Bike lanes in Boston"}}
+        self.assertEqual(cache_key(task, ["dep"]), cache_key(reordered, ["dep"]))
+        self.assertNotEqual(cache_key(task, ["dep"]), cache_key(task, ["other dep"]))
+
+    def test_file_io_is_not_cached(self):
+        self.assertFalse(is_cacheable({"task_type": "file_io", "args": {"operation": "read"}}))
+        self.assertFalse(is_cacheable({"task_type": "file_io", "args": {"operation": "write"}}))
+        self.assertTrue(is_cacheable({"task_type": "llm_extraction", "args": {}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
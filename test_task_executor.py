@@ -1,6 +1,13 @@
 import unittest
+import asyncio
 import json
 import os
+import threading
+import time
+from unittest import mock
+
+from agents import task_executor
+from agents.latency_model import LatencyModel, critical_path_lengths
 from agents.router import router
 from agents.task_executor import main
 
@@ -63,5 +70,167 @@ class TestTaskExecutor(unittest.TestCase):
                 # Check if the shapefile exists and is not empty
                 self.assertTrue(os.path.getsize(expected_output) > 0, "Land use changes file is empty.")
 
+
+
+def stub_task(task_id, dep=(), task_type="search_web"):
+    return {"task_type": task_type, "id": task_id, "dep": list(dep), "args": {"query": f"query {task_id}"}}
+
+
+class StubbedTasksTestCase(unittest.TestCase):
+    """Replace every agent with a stub that records its calls, so the executors run offline."""
+
+    delay = 0.1
+
+    def setUp(self):
+        self.calls = []
+        self.inputs = {}
+        self.failing = set()
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        task_types = list(task_executor.TASK_FUNCTIONS)
+        self.patches = [
+            mock.patch.dict(task_executor.TASK_FUNCTIONS, {t: self.run_stub for t in task_types}),
+            mock.patch.dict(task_executor.ASYNC_TASK_FUNCTIONS, {t: self.arun_stub for t in task_types}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def started(self, state):
+        with self.lock:
+            self.calls.append(state["task_id"])
+            self.inputs[state["task_id"]] = list(state["dep_results"])
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+    def finished(self, state):
+        with self.lock:
+            self.running -= 1
+        if state["task_id"] in self.failing:
+            raise RuntimeError("stub failure")
+        return f"result {state['task_id']}"
+
+    def run_stub(self, state):
+        self.started(state)
+        time.sleep(self.delay)
+        return self.finished(state)
+
+    async def arun_stub(self, state):
+        self.started(state)
+        await asyncio.sleep(self.delay)
+        return self.finished(state)
+
+    def run_parallel(self, tasks, **kwargs):
+        graph, in_degree, task_map = task_executor.build_dependency_graph(tasks)
+        return task_executor.execute_tasks_parallel(graph, in_degree, task_map, **kwargs)
+
+    def run_async(self, tasks, **kwargs):
+        graph, in_degree, task_map = task_executor.build_dependency_graph(tasks)
+        return asyncio.run(task_executor.async_execute_tasks(graph, in_degree, task_map, **kwargs))
+
+    def run_sequential(self, tasks):
+        graph, in_degree, task_map = task_executor.build_dependency_graph(tasks)
+        return task_executor.execute_tasks(task_executor.topological_sort(graph, dict(in_degree)), task_map)
+
+
+class TestParallelExecutor(StubbedTasksTestCase):
+    def test_independent_roots_overlap(self):
+        results = self.run_parallel([stub_task(0), stub_task(1), stub_task(2, dep=[0, 1])])
+        self.assertEqual(self.max_running, 2)
+        self.assertEqual(results, {0: "result 0", 1: "result 1", 2: "result 2"})
+
+    def test_join_waits_for_every_dependency(self):
+        results = self.run_parallel([stub_task(0), stub_task(1, dep=[0]), stub_task(2), stub_task(3, dep=[1, 2])])
+        self.assertEqual(self.calls[-1], 3)
+        self.assertEqual(self.inputs[3], ["result 1", "result 2"])
+        self.assertEqual(results[3], "result 3")
+
+    def test_failure_stops_dependents(self):
+        """Tasks downstream of a failure are skipped; unrelated branches still run."""
+        self.failing = {0}
+        results = self.run_parallel([stub_task(0), stub_task(1, dep=[0]), stub_task(2, dep=[1]), stub_task(3)])
+        self.assertEqual(sorted(self.calls), [0, 3])
+        self.assertEqual(results, {0: None, 1: None, 2: None, 3: "result 3"})
+
+    def test_matches_sequential(self):
+        tasks = [stub_task(0), stub_task(1), stub_task(2, dep=[0]), stub_task(3, dep=[1, 2]), stub_task(4, dep=[1])]
+        self.failing = {1}
+        self.assertEqual(self.run_parallel(tasks), self.run_sequential(tasks))
+
+    def test_rejects_cycles(self):
+        with self.assertRaises(Exception):
+            self.run_parallel([stub_task(0, dep=[1]), stub_task(1, dep=[0])])
+        self.assertEqual(self.calls, [])
+
+
+class TestAsyncExecutor(StubbedTasksTestCase):
+    def test_independent_roots_overlap(self):
+        results = self.run_async([stub_task(0), stub_task(1), stub_task(2), stub_task(3, dep=[0, 1, 2])])
+        self.assertEqual(self.max_running, 3)
+        self.assertEqual(self.inputs[3], ["result 0", "result 1", "result 2"])
+        self.assertEqual(results[3], "result 3")
+
+    def test_matches_sequential(self):
+        """Results, including failures and the tasks skipped below them, match a sequential run."""
+        tasks = [stub_task(0), stub_task(1), stub_task(2, dep=[0]), stub_task(3, dep=[1, 2]), stub_task(4, dep=[1])]
+        self.failing = {2}
+        results = self.run_async(tasks)
+        self.assertEqual(results, self.run_sequential(tasks))
+        self.assertEqual(results, {0: "result 0", 1: "result 1", 2: None, 3: None, 4: "result 4"})
+
+    def test_finish_runs_off_the_event_loop(self):
+        """Checkpointing and spilling results happen on worker threads, not on the event loop."""
+        finish = task_executor.RunContext.finish
+        threads = []
+
+        def record_thread(run, *args, **kwargs):
+            threads.append(threading.get_ident())
+            return finish(run, *args, **kwargs)
+
+        with mock.patch.object(task_executor.RunContext, "finish", record_thread):
+            self.run_async([stub_task(0), stub_task(1, dep=[0])])
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+class TestCriticalPathOrder(StubbedTasksTestCase):
+    delay = 0.01
+
+    def setUp(self):
+        super().setUp()
+        # 1 -> 2 -> 3 is the longest chain (0.5 + 20 + 8 s with the default estimates)
+        self.tasks = [
+            stub_task(0, task_type="search_web"),
+            stub_task(1, task_type="file_io"),
+            stub_task(2, dep=[1], task_type="code_writer"),
+            stub_task(3, dep=[2], task_type="llm_extraction"),
+            stub_task(4, task_type="llm_extraction"),
+        ]
+
+    def test_remaining_path_lengths(self):
+        graph, _, task_map = task_executor.build_dependency_graph(self.tasks)
+        lengths = critical_path_lengths(graph, task_map, LatencyModel())
+        self.assertEqual(lengths, {0: 12.0, 1: 28.5, 2: 28.0, 3: 8.0, 4: 8.0})
+
+    def test_ready_tasks_start_longest_path_first(self):
+        """With one worker, the head of the longest chain runs first; ties start in the order they became ready."""
+        self.run_parallel(self.tasks, max_workers=1)
+        self.assertEqual(self.calls, [1, 2, 0, 4, 3])
+
+    def test_learned_latencies_change_the_order(self):
+        latency_model = LatencyModel()
+        latency_model.record(self.tasks[0], 60.0)
+        self.run_parallel(self.tasks, max_workers=1, latency_model=latency_model)
+        self.assertEqual(self.calls[0], 0)
+
+    def test_async_roots_start_in_priority_order(self):
+        self.run_async(self.tasks)
+        self.assertEqual(self.calls[:3], [1, 0, 4])
+
+
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
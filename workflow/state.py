@@ -1,3 +1,5 @@
+import reprlib
+from dataclasses import dataclass
 from typing import TypedDict, Union, Literal, Annotated, List, Dict, Any, Optional
 
 # Optional input for all tasks
@@ -9,6 +11,9 @@ class FileIOArgs(BaseTaskArgs):
     operation: Literal["read", "write"]
     file_path: str
     content: Optional[Union[str, Dict, List]]  # Only used for "write" operations
+    columns: Optional[List[str]]  # Only decode these columns on "read"
+    stream: bool  # Return a ChunkedDataset that is read batch_size rows at a time
+    batch_size: int
 
 class CodeWriterArgs(BaseTaskArgs):
     language: str
@@ -18,9 +23,15 @@ class CodeWriterArgs(BaseTaskArgs):
 class SearchWebArgs(BaseTaskArgs):
     focus_area: str
     instructions: str
+    queries: List[str]
+    query_variants: int
+    max_content_tokens: int  # Token budget for page content passed on to extraction
+    backend: str  # Search backend name ("tavily", "local"); defaults to CITYLLM_SEARCH_BACKEND
 
 class LLMExtractionArgs(BaseTaskArgs):
     instructions: str
+    chunk_tokens: int  # Chunk size for map-reduce extraction of large inputs
+    max_concurrency: int  # Chunks extracted at once
 
 # Task type literals
 TaskType = Literal["file_io", "code_writer", "search_web", "llm_extraction"]
@@ -34,4 +45,48 @@ class State(TypedDict):
     task_type: TaskType  # Type of the current task
     task_args: TaskArgs  # Task-specific arguments
     
-    dep_results: List[Any]  # List to store results from dependencies (can store files, code, strings, etc.)
\ No newline at end of file
+    dep_results: List[Any]  # List to store results from dependencies (can store files, code, strings, etc.)
+
+# Per-task state used by the task executor. Unlike State, which LangGraph threads through
+# the whole graph, a TaskState is built fresh for every task and only references the
+# results of that task's direct dependencies. It still supports the dict-style access
+# (state["task_args"], state.get(...)) the agents use.
+_state_repr = reprlib.Repr()
+_state_repr.maxstring = 200
+_state_repr.maxother = 200
+_state_repr.maxlist = 10
+_state_repr.maxdict = 10
+
+@dataclass
+class TaskState:
+    __slots__ = ("task_id", "task_type", "task_args", "messages", "dep_results")
+
+    task_id: Any
+    task_type: TaskType
+    task_args: TaskArgs
+    messages: List[Any]
+    dep_results: List[Any]  # References to the direct dependencies' results, in 'dep' order
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return (
+            f"TaskState(task_id={self.task_id!r}, task_type={self.task_type!r}, "
+            f"task_args={_state_repr.repr(self.task_args)}, "
+            f"messages={_state_repr.repr(self.messages)}, "
+            f"dep_results={_state_repr.repr(self.dep_results)})"
+        )